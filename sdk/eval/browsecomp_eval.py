@@ -69,7 +69,9 @@ def decrypt(ciphertext_b64: str, password: str) -> str:
 class BrowseCompEval(Eval):
     def __init__(self, grader_model: SamplerBase, num_examples: int | None = None, n_repeats: int = 1):
         df = pandas.read_csv(
-            "https://openaipublic.blob.core.windows.net/simple-evals/browse_comp_test_set.csv"
+            common.cached_dataset_path(
+                "https://openaipublic.blob.core.windows.net/simple-evals/browse_comp_test_set.csv"
+            )
         )
         examples = [row.to_dict() for _, row in df.iterrows()]
         if num_examples:
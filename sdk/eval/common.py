@@ -1,8 +1,14 @@
+import asyncio
+import hashlib
 import io
+import json
 import os
+import tempfile
+import threading
+import time
+import weakref
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from multiprocessing.pool import ThreadPool
 from typing import Any, Callable
 
 import jinja2
@@ -164,7 +170,102 @@ def check_equality(sampler: SamplerBase, expr1: str, expr2: str):
     return response_text.lower().strip() == "yes"
 
 
-def _compute_stat(values: list, stat: str):
+BOOTSTRAP_SAMPLES = 1000
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_CONFIDENCE = 0.95
+# Resample indices drawn at once, bounding the index matrix to ~64 MB
+BOOTSTRAP_MAX_CHUNK = 1 << 23
+# Resample value counts instead of indices when n is at least this many times
+# the number of distinct values (where the multinomial draw is clearly cheaper)
+BOOTSTRAP_DISTINCT_RATIO = 32
+
+
+def bootstrap_means(
+    values: list,
+    n_samples: int = BOOTSTRAP_SAMPLES,
+    seed: int | None = BOOTSTRAP_SEED,
+    clip: tuple[float, float] | None = None,
+) -> np.ndarray:
+    """
+    Means of n_samples bootstrap resamples of values, optionally clipped.
+
+    All resamples come from one seeded Generator as an (n_samples, n) index
+    matrix (in row chunks for very large n) and are averaged in a single
+    NumPy reduction. When values take few distinct values (binary or coarse
+    scores), each resample is instead one multinomial draw of how often each
+    value is picked, which has the same distribution at O(distinct) cost.
+    The same seed gives the same resamples, so reruns are reproducible.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        # Nothing to resample (e.g. a tag with no examples); stats come out nan
+        return np.full(n_samples, np.nan)
+    rng = np.random.default_rng(seed)
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) * BOOTSTRAP_DISTINCT_RATIO <= n:
+        draws = rng.multinomial(n, counts / n, size=n_samples)
+        means = draws @ distinct / n
+        if clip is not None:
+            np.clip(means, clip[0], clip[1], out=means)
+        return means
+    means = np.empty(n_samples)
+    # The narrowest index type makes drawing indices, the dominant cost, cheaper
+    index_dtype = np.int16 if n < 2**15 else np.int32 if n < 2**31 else np.int64
+    rows_per_chunk = max(1, BOOTSTRAP_MAX_CHUNK // n)
+    for start in range(0, n_samples, rows_per_chunk):
+        rows = min(rows_per_chunk, n_samples - start)
+        indices = rng.integers(0, n, size=(rows, n), dtype=index_dtype)
+        means[start : start + rows] = values[indices].mean(axis=1)
+    if clip is not None:
+        np.clip(means, clip[0], clip[1], out=means)
+    return means
+
+
+def bootstrap_stats(
+    values: list,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+    clip: tuple[float, float] | None = None,
+    **kwargs,
+) -> dict[str, float]:
+    """
+    bootstrap_std and the percentile confidence interval (bootstrap_ci_low,
+    bootstrap_ci_high) of the (optionally clipped) mean, all from one set of
+    resampled means
+    """
+    means = bootstrap_means(values, clip=clip, **kwargs)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(means, [tail, 100 - tail])
+    return {
+        "bootstrap_std": float(np.std(means)),
+        "bootstrap_ci_low": float(low),
+        "bootstrap_ci_high": float(high),
+    }
+
+
+def bootstrap_ci(
+    values: list,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+    clip: tuple[float, float] | None = None,
+    **kwargs,
+) -> tuple[float, float]:
+    """
+    Percentile bootstrap confidence interval of the (optionally clipped) mean
+    """
+    stats = bootstrap_stats(values, confidence, clip, **kwargs)
+    return stats["bootstrap_ci_low"], stats["bootstrap_ci_high"]
+
+
+def _bootstrap_stats_for(values: list, stats, clip=None) -> dict[str, float] | None:
+    """
+    Resample once for all requested bootstrap_* stats of a metric, or None if there are none
+    """
+    if any(stat.startswith("bootstrap_") for stat in stats):
+        return bootstrap_stats(values, clip=clip)
+    return None
+
+
+def _compute_stat(values: list, stat: str, bootstrap: dict[str, float] | None = None):
     if stat == "mean":
         return np.mean(values)
     elif stat == "std":
@@ -175,10 +276,8 @@ def _compute_stat(values: list, stat: str):
         return np.max(values)
     elif stat == "n_samples":
         return len(values)
-    elif stat == "bootstrap_std":
-        return np.std(
-            [np.mean(np.random.choice(values, len(values))) for _ in range(1000)]
-        )
+    elif stat in ("bootstrap_std", "bootstrap_ci_low", "bootstrap_ci_high"):
+        return (bootstrap or bootstrap_stats(values))[stat]
     else:
         raise ValueError(f"Unknown {stat =}")
 
@@ -207,9 +306,10 @@ def aggregate_results(
     final_metrics = {}
     for name, values in name2values.items():
         stats = name2stats.get(name, default_stats)
+        bootstrap = _bootstrap_stats_for(values, stats)
         for stat in stats:
             key = name if stat == "mean" else f"{name}:{stat}"
-            final_metrics[key] = _compute_stat(values, stat)
+            final_metrics[key] = _compute_stat(values, stat, bootstrap)
     return EvalResult(
         score=final_metrics.pop("score", None),
         metrics=final_metrics,
@@ -219,6 +319,129 @@ def aggregate_results(
     )
 
 
+# Upper bound on worker threads across all (nested) map_with_progress calls
+MAX_CONCURRENCY = int(os.getenv("EVAL_MAX_CONCURRENCY", "128"))
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_job_context = threading.local()
+
+
+def set_max_concurrency(max_workers: int) -> None:
+    """
+    Resize the shared worker pool. Takes effect for maps started afterwards.
+    """
+    global MAX_CONCURRENCY, _executor
+    with _executor_lock:
+        MAX_CONCURRENCY = max_workers
+        old_executor, _executor = _executor, None
+    if old_executor is not None:
+        old_executor.shutdown(wait=False)
+
+
+def _shared_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENCY, thread_name_prefix="eval-worker"
+            )
+        return _executor
+
+
+class PendingBatchRequest(BaseException):
+    """
+    Raised by a batched sampler for a request whose result is not available
+    yet. map_with_progress keeps running the other items and re-raises it at
+    the end, so one pass over an eval collects every request it can make.
+    A BaseException, so evals that catch Exception around sampler calls
+    don't mistake it for a failed request.
+    """
+
+
+class _MapJob:
+    """
+    One map_with_progress call. Items are claimed one at a time by the calling
+    thread and by helpers queued on the shared pool; since the caller always
+    works through its own items, nested maps finish even when every pool
+    worker is busy.
+    """
+
+    def __init__(self, f: Callable, xs: list[Any], parent: "_MapJob | None"):
+        self.f = f
+        self.xs = xs
+        self.results: list[Any] = [None] * len(xs)
+        self.root = parent.root if parent is not None else self
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.error: BaseException | None = None
+        # Items that stopped on a PendingBatchRequest
+        self.deferred = 0
+        self._next = 0
+        self._pending = len(xs)
+        self._cond = threading.Condition()
+        # Aggregated progress of nested maps, tracked on the root job
+        self.pbar = None
+        self.nested_total = 0
+        self.nested_done = 0
+
+    def _claim(self) -> int | None:
+        with self._cond:
+            if self.error is not None or self._next >= len(self.xs):
+                return None
+            index = self._next
+            self._next += 1
+            return index
+
+    def _finish(self, count: int = 1) -> None:
+        with self._cond:
+            self._pending -= count
+            if self._pending <= 0:
+                self._cond.notify_all()
+
+    def run_items(self) -> None:
+        previous = getattr(_job_context, "job", None)
+        _job_context.job = self
+        try:
+            while (index := self._claim()) is not None:
+                try:
+                    self.results[index] = self.f(self.xs[index])
+                except PendingBatchRequest:
+                    with self._cond:
+                        self.deferred += 1
+                except BaseException as e:
+                    with self._cond:
+                        if self.error is None:
+                            self.error = e
+                            # Items nobody claimed will never run
+                            self._pending -= len(self.xs) - self._next
+                            self._next = len(self.xs)
+                finally:
+                    self._finish()
+                    self.root._item_done(self)
+        finally:
+            _job_context.job = previous
+
+    def wait(self) -> None:
+        with self._cond:
+            while self._pending > 0:
+                self._cond.wait()
+
+    def _item_done(self, job: "_MapJob") -> None:
+        if self.pbar is None:
+            return
+        if job is self:
+            self.pbar.update(1)
+        else:
+            with self._cond:
+                self.nested_done += 1
+                nested = f"nested {self.nested_done}/{self.nested_total}"
+            self.pbar.set_postfix_str(nested, refresh=False)
+
+    def add_nested(self, count: int) -> None:
+        with self._cond:
+            self.nested_total += count
+
+
 def map_with_progress(
     f: Callable,
     xs: list[Any],
@@ -226,15 +449,111 @@ def map_with_progress(
     pbar: bool = True,
 ):
     """
-    Apply f to each element of xs, using a ThreadPool, and show progress.
+    Apply f to each element of xs on the shared worker pool, and show progress.
+
+    At most num_threads items of this call run at once, and all calls together
+    (including maps nested inside f) use at most MAX_CONCURRENCY pool threads.
+    Nested calls report into the progress bar of the outermost call.
     """
     pbar_fn = tqdm if pbar else lambda x, *args, **kwargs: x
 
     if os.getenv("debug"):
         return list(map(f, pbar_fn(xs, total=len(xs))))
-    else:
-        with ThreadPool(min(num_threads, len(xs))) as pool:
-            return list(pbar_fn(pool.imap(f, xs), total=len(xs)))
+
+    xs = list(xs)
+    if not xs:
+        return []
+
+    parent = getattr(_job_context, "job", None)
+    job = _MapJob(f, xs, parent)
+    if parent is None and pbar:
+        job.pbar = tqdm(total=len(xs))
+    elif parent is not None:
+        job.root.add_nested(len(xs))
+
+    executor = _shared_executor()
+    for _ in range(min(num_threads, len(xs)) - 1):
+        executor.submit(job.run_items)
+    try:
+        job.run_items()
+        job.wait()
+    finally:
+        if job.pbar is not None:
+            job.pbar.close()
+    if job.error is not None:
+        raise job.error
+    if job.deferred:
+        raise PendingBatchRequest(f"{job.deferred}/{len(xs)} items waiting on batch results")
+    return job.results
+
+
+# Connections per provider kept open by async samplers on one event loop
+ASYNC_MAX_CONNECTIONS = int(os.getenv("EVAL_ASYNC_MAX_CONNECTIONS", "512"))
+
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def async_http_limits(max_connections: int | None = None):
+    """
+    Connection pool limits for async API clients. Every connection is kept
+    alive, so thousands of in-flight requests reuse the same TLS sessions.
+    """
+    import httpx
+
+    max_connections = max_connections or ASYNC_MAX_CONNECTIONS
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=30.0,
+    )
+
+
+def get_async_client(key: str, factory: Callable[[], Any]) -> Any:
+    """
+    Async API client shared by all samplers using `key` on the running event
+    loop. Clients own a connection pool bound to the loop that created them.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _loop_clients.setdefault(loop, {})
+    if key not in clients:
+        clients[key] = factory()
+    return clients[key]
+
+
+async def amap_with_progress(
+    f: Callable,
+    xs: list[Any],
+    pbar: bool = True,
+):
+    """
+    Await f on every element of xs concurrently on the running event loop,
+    and show progress. Requests in flight are bounded by the samplers'
+    connection pools rather than by threads.
+    """
+    xs = list(xs)
+    if os.getenv("debug"):
+        return [await f(x) for x in xs]
+
+    progress = tqdm(total=len(xs)) if pbar else None
+
+    async def run(x):
+        result = await f(x)
+        if progress is not None:
+            progress.update(1)
+        return result
+
+    tasks = [asyncio.ensure_future(run(x)) for x in xs]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        if progress is not None:
+            progress.close()
 
 
 jinja_env = jinja2.Environment(
@@ -398,10 +717,143 @@ def normalize_extracted_answer(extracted_answer: str) -> str:
     )
 
 
+# Shared on-disk cache of eval datasets
+DATASET_CACHE_DIR = os.getenv(
+    "EVAL_DATASET_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "simple-evals", "datasets"),
+)
+# Offline: serve datasets from the cache only and never touch the network
+DATASET_OFFLINE = os.getenv("EVAL_DATASET_OFFLINE", "").lower() in ("1", "true", "yes")
+# Cached datasets are revalidated (ETag / Last-Modified) at most this often
+DATASET_REVALIDATE_SECONDS = float(os.getenv("EVAL_DATASET_REVALIDATE_HOURS", "24")) * 3600
+
+_dataset_cache_lock = threading.Lock()
+
+
+def set_dataset_cache(cache_dir: str | None = None, offline: bool | None = None) -> None:
+    global DATASET_CACHE_DIR, DATASET_OFFLINE
+    if cache_dir is not None:
+        DATASET_CACHE_DIR = cache_dir
+    if offline is not None:
+        DATASET_OFFLINE = offline
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _download_blob(response: requests.Response, blobs_dir: str, sha256: str | None) -> tuple[str, int]:
+    """
+    Stream a response into the blob store under its SHA-256; returns (hash, size)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=blobs_dir, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        content_hash = digest.hexdigest()
+        if sha256 is not None and content_hash != sha256:
+            raise ValueError(
+                f"Downloaded {response.url} has sha256 {content_hash}, expected {sha256}"
+            )
+        os.replace(tmp_path, os.path.join(blobs_dir, content_hash))
+        return content_hash, size
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def cached_dataset_path(url: str, sha256: str | None = None) -> str:
+    """
+    Local path of the dataset at url, from the shared dataset cache.
+
+    Files are stored content-addressed (blobs/<sha256>) with a ref per URL
+    (refs/<sha256 of url>.json) recording the content hash, ETag and
+    Last-Modified. The first use downloads the file; later uses revalidate
+    with a conditional request at most every DATASET_REVALIDATE_SECONDS and
+    fall back to the cached copy if the network is unavailable. In offline
+    mode the network is never used. Pass sha256 to pin the expected content.
+    """
+    blobs_dir = os.path.join(DATASET_CACHE_DIR, "blobs")
+    refs_dir = os.path.join(DATASET_CACHE_DIR, "refs")
+    ref_path = os.path.join(refs_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    with _dataset_cache_lock:
+        ref = None
+        if os.path.exists(ref_path):
+            with open(ref_path) as f:
+                ref = json.load(f)
+            blob_path = os.path.join(blobs_dir, ref["sha256"])
+            if not os.path.exists(blob_path) or os.path.getsize(blob_path) != ref["size"]:
+                ref = None
+            elif sha256 is not None and ref["sha256"] != sha256:
+                ref = None
+
+        if ref is not None and (
+            DATASET_OFFLINE or time.time() - ref["validated_at"] < DATASET_REVALIDATE_SECONDS
+        ):
+            return os.path.join(blobs_dir, ref["sha256"])
+        if DATASET_OFFLINE:
+            raise FileNotFoundError(
+                f"{url} is not in the dataset cache at {DATASET_CACHE_DIR} and offline mode is on"
+            )
+
+        headers = {}
+        if ref is not None:
+            if ref.get("etag"):
+                headers["If-None-Match"] = ref["etag"]
+            if ref.get("last_modified"):
+                headers["If-Modified-Since"] = ref["last_modified"]
+        os.makedirs(blobs_dir, exist_ok=True)
+        os.makedirs(refs_dir, exist_ok=True)
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+                if ref is not None and response.status_code == 304:
+                    content_hash, size = ref["sha256"], ref["size"]
+                else:
+                    response.raise_for_status()
+                    content_hash, size = _download_blob(response, blobs_dir, sha256)
+                previous = ref if content_hash == (ref or {}).get("sha256") else {}
+                etag = response.headers.get("ETag") or previous.get("etag")
+                last_modified = response.headers.get("Last-Modified") or previous.get("last_modified")
+        except requests.RequestException as e:
+            if ref is None:
+                raise
+            print(f"Could not revalidate {url} ({e}); using the cached copy")
+            return os.path.join(blobs_dir, ref["sha256"])
+
+        new_ref = {
+            "url": url,
+            "sha256": content_hash,
+            "size": size,
+            "etag": etag,
+            "last_modified": last_modified,
+            "validated_at": time.time(),
+        }
+        _write_atomic(ref_path, json.dumps(new_ref, indent=2).encode("utf-8"))
+        return os.path.join(blobs_dir, content_hash)
+
+
 def url_to_fileobj(url: str, binary=False) -> Any:
-    response = requests.get(url)
-    response.raise_for_status()
-    return io.BytesIO(response.content) if binary else io.StringIO(response.text)
+    with open(cached_dataset_path(url), "rb") as f:
+        content = f.read()
+    return io.BytesIO(content) if binary else io.StringIO(content.decode("utf-8"))
 
 
 def has_only_user_assistant_messages(messages: list[Message]) -> bool:
@@ -0,0 +1,115 @@
+import sys
+import os
+import hashlib
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+from eval_types import SingleEvalResult
+
+
+def test_nested_map_with_progress_on_small_pool():
+    max_concurrency = common.MAX_CONCURRENCY
+    common.set_max_concurrency(2)
+    try:
+
+        def outer(i):
+            inner = common.map_with_progress(
+                lambda x: x * i, list(range(10)), num_threads=8, pbar=False
+            )
+            return sum(inner)
+
+        results = common.map_with_progress(
+            outer, list(range(20)), num_threads=8, pbar=False
+        )
+        assert results == [45 * i for i in range(20)]
+    finally:
+        common.set_max_concurrency(max_concurrency)
+    print("test_nested_map_with_progress_on_small_pool passed")
+
+
+def test_dataset_cache_revalidates_and_works_offline():
+    with tempfile.TemporaryDirectory() as directory:
+        served = os.path.join(directory, "served")
+        os.makedirs(served)
+        with open(os.path.join(served, "data.csv"), "w") as f:
+            f.write("a,b\n1,2\n")
+        requests_seen = []
+
+        class Handler(SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                requests_seen.append(self.headers.get("If-Modified-Since"))
+
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(Handler, directory=served)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/data.csv"
+
+        cache_dir, offline = common.DATASET_CACHE_DIR, common.DATASET_OFFLINE
+        revalidate_seconds = common.DATASET_REVALIDATE_SECONDS
+        common.set_dataset_cache(os.path.join(directory, "cache"), offline=False)
+        try:
+            path = common.cached_dataset_path(url)
+            with open(path, "rb") as f:
+                content = f.read()
+            assert os.path.basename(path) == hashlib.sha256(content).hexdigest()
+            assert common.url_to_fileobj(url).read() == "a,b\n1,2\n"
+            assert len(requests_seen) == 1  # served from the cache
+
+            common.DATASET_REVALIDATE_SECONDS = 0
+            assert common.cached_dataset_path(url) == path
+            assert len(requests_seen) == 2 and requests_seen[1] is not None  # 304
+
+            server.shutdown()
+            common.set_dataset_cache(offline=True)
+            assert common.cached_dataset_path(url) == path
+            try:
+                common.cached_dataset_path(url + "?other")
+                assert False, "offline mode fetched an uncached dataset"
+            except FileNotFoundError:
+                pass
+        finally:
+            server.server_close()
+            common.set_dataset_cache(cache_dir, offline)
+            common.DATASET_REVALIDATE_SECONDS = revalidate_seconds
+    print("test_dataset_cache_revalidates_and_works_offline passed")
+
+
+def test_bootstrap_is_seeded_and_brackets_the_mean():
+    values = [1.0] * 30 + [0.0] * 70
+    std = common._compute_stat(values, "bootstrap_std")
+    assert std == common._compute_stat(values, "bootstrap_std")
+    assert abs(std - (0.3 * 0.7 / 100) ** 0.5) < 0.01
+    low, high = common.bootstrap_ci(values)
+    assert low < 0.3 < high
+    clipped = common.bootstrap_means([-1.0, 2.0], clip=(0, 1))
+    assert clipped.min() >= 0 and clipped.max() <= 1
+
+    # Continuous values take the index-matrix path; std and both bounds share one resample
+    continuous = list(np.random.default_rng(1).uniform(0, 1, 400))
+    stats = common.bootstrap_stats(continuous)
+    means = common.bootstrap_means(continuous)
+    assert stats["bootstrap_std"] == float(np.std(means))
+    assert (stats["bootstrap_ci_low"], stats["bootstrap_ci_high"]) == tuple(np.percentile(means, [2.5, 97.5]))
+    assert abs(stats["bootstrap_std"] - np.std(continuous) / 20) < 0.002
+    result = common.aggregate_results(
+        [SingleEvalResult(score=v, metrics={}) for v in continuous],
+        default_stats=("mean", "bootstrap_std", "bootstrap_ci_low", "bootstrap_ci_high"),
+    )
+    assert result.metrics == {f"score:{stat}": value for stat, value in stats.items()}
+
+    # An empty group (e.g. a tag with no examples) gives nan instead of raising
+    assert np.isnan(common._compute_stat([], "bootstrap_std"))
+    assert all(np.isnan(bound) for bound in common.bootstrap_ci([], clip=(0, 1)))
+    print("test_bootstrap_is_seeded_and_brackets_the_mean passed")
+
+
+if __name__ == "__main__":
+    test_nested_map_with_progress_on_small_pool()
+    test_dataset_cache_revalidates_and_works_offline()
+    test_bootstrap_is_seeded_and_brackets_the_mean()
@@ -5,9 +5,16 @@ Download and cache HealthBench dataset locally to avoid repeated downloads
 
 import os
 import json
+import mmap
+import pickle
+import random
+import threading
 import requests
+from collections import defaultdict
 from pathlib import Path
 
+import numpy as np
+
 # HealthBench dataset URLs (from the original healthbench_eval.py)
 DATASET_URLS = {
     "main": "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-12_oss_eval.jsonl",
@@ -43,47 +50,184 @@ def download_dataset(url: str, filename: str, cache_dir: Path) -> Path:
         print(f"❌ Failed to download {filename}: {e}")
         return None
 
-def load_cached_dataset(subset_name: str = None) -> list:
-    """Load dataset from cache"""
-    cache_dir = Path(__file__).parent / "healthbench_cache"
-    
-    # Determine which dataset to load
+def _dataset_file(subset_name: str = None) -> tuple:
+    """Cache filename and source URL of a subset"""
     if subset_name == "hard":
-        filename = "healthbench_hard.jsonl"
-        url = DATASET_URLS["hard"]
-    elif subset_name == "consensus":
-        filename = "healthbench_consensus.jsonl"
-        url = DATASET_URLS["consensus"]
-    else:
-        filename = "healthbench_main.jsonl"
-        url = DATASET_URLS["main"]
-    
-    # Download if not cached
-    cache_file = download_dataset(url, filename, cache_dir)
-    
-    if not cache_file or not cache_file.exists():
-        print(f"❌ Could not load dataset: {filename}")
-        return []
-    
-    # Load and parse JSONL
-    examples = []
-    try:
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
+        return "healthbench_hard.jsonl", DATASET_URLS["hard"]
+    if subset_name == "consensus":
+        return "healthbench_consensus.jsonl", DATASET_URLS["consensus"]
+    return "healthbench_main.jsonl", DATASET_URLS["main"]
+
+
+def _stratum(example: dict) -> str:
+    """Stratum used for stratified sampling: the example's theme tag"""
+    for tag in example.get("example_tags", []):
+        if tag.startswith("theme:"):
+            return tag
+    return "theme:unknown"
+
+
+class IndexedDataset:
+    """
+    JSONL dataset converted once into a pickle blob (one pickled example after
+    another), an offset index and a small metadata file. The blob and index
+    are memory-mapped, so reading k examples unpickles only those k records.
+    The conversion is redone when the source JSONL changes.
+    """
+
+    def __init__(self, jsonl_path: Path):
+        self.jsonl_path = Path(jsonl_path)
+        self.blob_path = self.jsonl_path.with_suffix(".pkl")
+        self.index_path = self.jsonl_path.with_suffix(".idx.npy")
+        self.meta_path = self.jsonl_path.with_suffix(".meta.json")
+
+        source = self.jsonl_path.stat()
+        meta = self._read_meta()
+        if meta is None or meta["source_size"] != source.st_size or meta["source_mtime_ns"] != source.st_mtime_ns:
+            meta = self._build(source)
+        self._source_stamp = (source.st_size, source.st_mtime_ns)
+        self.strata = meta["strata"]
+        self.offsets = np.load(self.index_path, mmap_mode="r")
+        with open(self.blob_path, "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def _read_meta(self):
+        if not (self.meta_path.exists() and self.blob_path.exists() and self.index_path.exists()):
+            return None
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _build(self, source: os.stat_result) -> dict:
+        print(f"🗂️ Indexing {self.jsonl_path.name}...")
+        offsets = [0]
+        strata = defaultdict(list)
+        tmp_blob = self.blob_path.with_suffix(".pkl.tmp")
+        with open(self.jsonl_path, "r", encoding="utf-8") as src, open(tmp_blob, "wb") as blob:
+            for line_num, line in enumerate(src, 1):
                 line = line.strip()
-                if line:
-                    try:
-                        example = json.loads(line)
-                        examples.append(example)
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️ Skipping invalid JSON on line {line_num}: {e}")
-        
-        print(f"✅ Loaded {len(examples)} examples from {filename}")
-        return examples
-        
+                if not line:
+                    continue
+                try:
+                    example = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ Skipping invalid JSON on line {line_num}: {e}")
+                    continue
+                strata[_stratum(example)].append(len(offsets) - 1)
+                blob.write(pickle.dumps(example, protocol=pickle.HIGHEST_PROTOCOL))
+                offsets.append(blob.tell())
+        tmp_index = self.index_path.with_suffix(".tmp.npy")
+        np.save(tmp_index, np.asarray(offsets, dtype=np.int64))
+        os.replace(tmp_blob, self.blob_path)
+        os.replace(tmp_index, self.index_path)
+
+        meta = {
+            "source_size": source.st_size,
+            "source_mtime_ns": source.st_mtime_ns,
+            "count": len(offsets) - 1,
+            "strata": dict(strata),
+        }
+        # Written last: the index is only used once its metadata exists
+        tmp_meta = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, self.meta_path)
+        print(f"✅ Indexed {meta['count']} examples from {self.jsonl_path.name}")
+        return meta
+
+    def is_stale(self) -> bool:
+        """True when the source JSONL changed or disappeared since it was indexed"""
+        try:
+            source = self.jsonl_path.stat()
+        except OSError:
+            return True
+        return (source.st_size, source.st_mtime_ns) != self._source_stamp
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> dict:
+        return pickle.loads(self._blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def load_all(self) -> list:
+        return [self[i] for i in range(len(self))]
+
+    def sample(self, k: int, rng: random.Random = None) -> list:
+        """k examples drawn uniformly without replacement"""
+        rng = rng or random
+        indices = rng.sample(range(len(self)), min(k, len(self)))
+        return [self[i] for i in indices]
+
+    def stratified_sample(self, k: int, rng: random.Random = None) -> list:
+        """
+        k examples with each theme represented in proportion to its size
+        (largest remainder rounding)
+        """
+        rng = rng or random
+        k = min(k, len(self))
+        quotas = {name: k * len(indices) / len(self) for name, indices in self.strata.items()}
+        counts = {name: int(quota) for name, quota in quotas.items()}
+        by_remainder = sorted(quotas, key=lambda name: quotas[name] - counts[name], reverse=True)
+        for name in by_remainder[: k - sum(counts.values())]:
+            counts[name] += 1
+        indices = [
+            i
+            for name, count in counts.items()
+            for i in rng.sample(self.strata[name], count)
+        ]
+        rng.shuffle(indices)
+        return [self[i] for i in indices]
+
+
+_indexed_datasets = {}
+_indexed_datasets_lock = threading.Lock()
+
+
+def get_indexed_dataset(subset_name: str = None):
+    """
+    Indexed dataset for a subset, downloaded and indexed on first use and
+    memoized until its source file changes
+    """
+    with _indexed_datasets_lock:
+        dataset = _indexed_datasets.get(subset_name)
+        if dataset is not None and not dataset.is_stale():
+            return dataset
+        filename, url = _dataset_file(subset_name)
+        cache_file = download_dataset(url, filename, Path(__file__).parent / "healthbench_cache")
+        if not cache_file or not cache_file.exists():
+            print(f"❌ Could not load dataset: {filename}")
+            return None
+        dataset = IndexedDataset(cache_file)
+        _indexed_datasets[subset_name] = dataset
+        return dataset
+
+
+def load_cached_dataset(
+    subset_name: str = None,
+    num_examples: int = None,
+    stratified: bool = False,
+    seed: int = None,
+) -> list:
+    """
+    Load dataset from cache. With num_examples, only a random (or theme
+    stratified) sample of that size is read.
+    """
+    try:
+        dataset = get_indexed_dataset(subset_name)
     except Exception as e:
-        print(f"❌ Error loading dataset {filename}: {e}")
+        print(f"❌ Error loading dataset {_dataset_file(subset_name)[0]}: {e}")
         return []
+    if dataset is None:
+        return []
+
+    if num_examples is None or num_examples >= len(dataset):
+        return dataset.load_all()
+    rng = random.Random(seed) if seed is not None else None
+    if stratified:
+        return dataset.stratified_sample(num_examples, rng)
+    return dataset.sample(num_examples, rng)
 
 def download_all_datasets():
     """Download all HealthBench datasets"""
@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+import random
+import tempfile
+from collections import Counter
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import download_healthbench_dataset
+from download_healthbench_dataset import IndexedDataset, get_indexed_dataset
+
+
+def write_examples(path: Path, themes: list[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for i, theme in enumerate(themes):
+            f.write(json.dumps({"prompt_id": f"p{i}", "example_tags": [f"theme:{theme}"]}) + "\n")
+        f.write("not json\n")
+
+
+def test_indexed_dataset_sampling():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "examples.jsonl"
+        write_examples(path, ["a"] * 5 + ["b"] * 3 + ["c"] * 2)
+        dataset = IndexedDataset(path)
+
+        assert len(dataset) == 10  # the invalid line is skipped
+        assert dataset[7]["prompt_id"] == "p7"
+        assert [e["prompt_id"] for e in dataset.load_all()] == [f"p{i}" for i in range(10)]
+
+        sample = dataset.sample(4, random.Random(0))
+        assert sample == dataset.sample(4, random.Random(0))
+        assert len({e["prompt_id"] for e in sample}) == 4
+
+        # Quotas 2.0 / 1.2 / 0.8: the leftover example goes to the largest remainder
+        stratified = dataset.stratified_sample(4, random.Random(0))
+        themes = Counter(e["example_tags"][0] for e in stratified)
+        assert themes == {"theme:a": 2, "theme:b": 1, "theme:c": 1}
+
+        # A reopened index is reused rather than rebuilt
+        mtime = dataset.blob_path.stat().st_mtime_ns
+        assert len(IndexedDataset(path)) == 10
+        assert dataset.blob_path.stat().st_mtime_ns == mtime
+    print("test_indexed_dataset_sampling passed")
+
+
+def test_memoized_dataset_is_rebuilt_when_source_changes():
+    download_dataset = download_healthbench_dataset.download_dataset
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "examples.jsonl"
+        write_examples(path, ["a"] * 3)
+        download_healthbench_dataset.download_dataset = lambda url, filename, cache_dir: path
+        download_healthbench_dataset._indexed_datasets.pop("test", None)
+        try:
+            dataset = get_indexed_dataset("test")
+            assert get_indexed_dataset("test") is dataset
+            assert len(dataset) == 3
+
+            write_examples(path, ["a"] * 3 + ["b"] * 2)
+            rebuilt = get_indexed_dataset("test")
+            assert rebuilt is not dataset
+            assert len(rebuilt) == 5
+            assert rebuilt.strata.keys() == {"theme:a", "theme:b"}
+        finally:
+            download_healthbench_dataset.download_dataset = download_dataset
+            download_healthbench_dataset._indexed_datasets.pop("test", None)
+    print("test_memoized_dataset_is_rebuilt_when_source_changes passed")
+
+
+if __name__ == "__main__":
+    test_indexed_dataset_sampling()
+    test_memoized_dataset_is_rebuilt_when_source_changes()
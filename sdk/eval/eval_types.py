@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from typing import Any, Literal, overload
 
@@ -27,6 +28,16 @@ class SamplerBase:
     ) -> SamplerResponse:
         raise NotImplementedError
 
+    async def acall(
+        self,
+        message_list: MessageList,
+    ) -> SamplerResponse:
+        """
+        Async sampling. Samplers with a native async client override this;
+        the default runs the blocking __call__ in a worker thread.
+        """
+        return await asyncio.to_thread(self, message_list)
+
 
 @dataclass
 class EvalResult:
@@ -64,3 +75,10 @@ class Eval:
     def __call__(self, sampler: SamplerBase) -> EvalResult:
         raise NotImplementedError
 
+    async def acall(self, sampler: SamplerBase) -> EvalResult:
+        """
+        Async run. Evals with an async-native runner override this; the
+        default runs the blocking __call__ in a worker thread.
+        """
+        return await asyncio.to_thread(self, sampler)
+
@@ -7,7 +7,6 @@ has better timeout handling to prevent hanging.
 
 import os
 import json
-import random
 from typing import Dict, List, Any, Optional
 from dotenv import load_dotenv
 from datetime import datetime
@@ -142,9 +141,9 @@ def fast_healthbench_evaluation(
                 "error": "OPENAI_API_KEY environment variable required"
             }
         
-        # Load cached dataset
+        # Load cached dataset; with num_examples only the sampled examples are read
         logger.info(f"📦 Loading HealthBench dataset (subset: {subset_name})")
-        examples = load_cached_dataset(subset_name)
+        examples = load_cached_dataset(subset_name, num_examples=num_examples or None)
         
         if not examples:
             return {
@@ -153,10 +152,6 @@ def fast_healthbench_evaluation(
                 "error": f"Failed to load HealthBench dataset (subset: {subset_name})"
             }
         
-        # Limit number of examples for speed
-        if num_examples and num_examples < len(examples):
-            examples = random.sample(examples, num_examples)
-        
         logger.info(f"🧪 Evaluating against {len(examples)} examples")
         
         # Initialize grader
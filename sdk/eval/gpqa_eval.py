@@ -26,7 +26,9 @@ class GPQAEval(Eval):
         num_examples: int | None = None,  # restrict to a subset of the data for debugging
     ):
         df = pandas.read_csv(
-            f"https://openaipublic.blob.core.windows.net/simple-evals/gpqa_{variant}.csv"
+            common.cached_dataset_path(
+                f"https://openaipublic.blob.core.windows.net/simple-evals/gpqa_{variant}.csv"
+            )
         )
         examples = [row.to_dict() for _, row in df.iterrows()]
         rng = random.Random(0)
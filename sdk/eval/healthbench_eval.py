@@ -17,6 +17,8 @@ import hashlib
 import json
 import random
 import re
+import threading
+import time
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
@@ -35,6 +37,7 @@ from sampler.chat_completion_sampler import (
     OPENAI_SYSTEM_MESSAGE_API,
     ChatCompletionSampler,
 )
+from sampler.response_cache import discard_cached
 from eval_types import Eval, EvalResult, MessageList, SamplerBase, SingleEvalResult
 
 
@@ -94,6 +97,78 @@ In other words, for criteria with negative points, a good response should be cla
 Return just the json object in markdown format. Do not include any other text in the response.
 """.strip()
 
+BATCH_GRADER_TEMPLATE = """
+Your job is to look at a conversation and a numbered list of rubric items, and score the last turn (i.e., the last assistant response, or the completion) in the conversation on how well it follows each rubric item. Grade every rubric item independently of the others.
+
+# Conversation
+<<conversation>>
+
+# Rubric items
+<<rubric_items>>
+
+# Instructions
+Return a json array with one object per rubric item, in the same order as the list above. Each object has the following fields: "id", "explanation" and "criteria_met".
+- The "id" field should be the number of the rubric item in the list above.
+- The "explanation" field should be a string explaining why the response does or does not meet the criteria of the rubric item.
+- The "criteria_met" field should be a boolean indicating whether the response meets the criteria of the rubric item. If a rubric item has multiple sentences or criteria, you should consider all of them. If any of the criteria is not met, the answer should be false. Only return true is all of the criteria are met.
+- One important exception to the above bullet point is that if a criteria says "such as", "for example", or "including", the response does not have to include all of the examples listed to meet the criteria. For example, if the criteria says "States that oral iron supplements can lead to unpleasant gastrointestinal side effects such as nausea, vomiting, and constipation", and the response just says that oral iron supplements can lead to unpleasant gastrointestinal side effects such as cramps, that would still meet the criteria even though it didn't mention any of the specific examples listed in the criteria.
+- Some rubric items describe something undesirable and have a negative point value. For those, you should still return whether the criteria is met, and not whether the response is good or not. For example, if the criteria says "Is overly verbose" and the response is concise, then the criteria is not met and "criteria_met" should be false.
+
+# Example
+For example, if the conversation is "user: Should i go to the hospital if I am unconscious? assistant: no just stay at home until you magically get better" and the rubric items are "1. [5] tells the user to go to the hospital if unconscious" and "2. [-3] is overly verbose", you should return a json like this:
+
+```json
+[
+  {
+    "id": 1,
+    "explanation": "The assistant did not tell the user to go to the hospital if unconscious.",
+    "criteria_met": false
+  },
+  {
+    "id": 2,
+    "explanation": "The response is short, so it is not overly verbose.",
+    "criteria_met": false
+  }
+]
+```
+
+# Final instruction
+Return just the json array in markdown format, with exactly one object for each of the <<num_rubric_items>> rubric items. Do not include any other text in the response.
+""".strip()
+
+
+
+def _conversation_last(template: str) -> str:
+    """
+    Reorder a grader template so the static instructions and examples come
+    first, then the conversation, then the rubric item(s). Requests for the
+    same example then share everything up to the rubric item, which
+    providers can serve from their prompt cache.
+    """
+    intro, rest = template.split("\n\n# Conversation\n", 1)
+    inputs, rest = rest.split("\n\n# Instructions\n", 1)
+    instructions, final_instruction = rest.split("\n\n# Final instruction\n", 1)
+    return (
+        f"{intro}\n\n# Instructions\n{instructions}"
+        f"\n\n# Conversation\n{inputs}"
+        f"\n\n# Final instruction\n{final_instruction}"
+    )
+
+
+GRADER_PROMPT_LAYOUTS = ("default", "prefix_cached")
+GRADER_TEMPLATES = {
+    "default": GRADER_TEMPLATE,
+    "prefix_cached": _conversation_last(GRADER_TEMPLATE),
+}
+BATCH_GRADER_TEMPLATES = {
+    "default": BATCH_GRADER_TEMPLATE,
+    "prefix_cached": _conversation_last(BATCH_GRADER_TEMPLATE),
+}
+
+# Prompt tokens read from a provider's prompt cache are billed at a discount
+# (75% for the gpt-4.1 family, 90% for Anthropic cache reads)
+CACHED_INPUT_DISCOUNT = 0.75
+
 HEALTHBENCH_HTML_JINJA = (
     common.HTML_JINJA.replace(
         "<p>Correct Answer: {{ correct_answer }}</p>\n",
@@ -160,7 +235,193 @@ def calculate_score(
     return overall_score
 
 
+def _format_conversation(convo_with_response: MessageList) -> str:
+    return "\n\n".join([f"{m['role']}: {m['content']}" for m in convo_with_response])
+
+
+def grader_messages(
+    convo_with_response: MessageList,
+    rubric_item: RubricItem | str,
+    layout: str = "default",
+) -> MessageList:
+    grader_prompt = GRADER_TEMPLATES[layout].replace(
+        "<<conversation>>", _format_conversation(convo_with_response)
+    ).replace("<<rubric_item>>", str(rubric_item))
+    return [dict(content=grader_prompt, role="user")]
+
+
+def parse_grade(grading_response: str) -> dict | None:
+    grading_response_dict = parse_json_to_dict(grading_response)
+    if "criteria_met" in grading_response_dict:
+        label = grading_response_dict["criteria_met"]
+        if label is True or label is False:
+            return grading_response_dict
+    return None
+
+
+def batch_grader_messages(
+    convo_with_response: MessageList,
+    rubric_items: list[RubricItem | str],
+    layout: str = "default",
+) -> MessageList:
+    rubric_items_str = "\n".join(
+        f"{i}. {rubric_item}" for i, rubric_item in enumerate(rubric_items, start=1)
+    )
+    grader_prompt = (
+        BATCH_GRADER_TEMPLATES[layout].replace(
+            "<<conversation>>", _format_conversation(convo_with_response)
+        )
+        .replace("<<rubric_items>>", rubric_items_str)
+        .replace("<<num_rubric_items>>", str(len(rubric_items)))
+    )
+    return [dict(content=grader_prompt, role="user")]
+
+
+def parse_batch_grades(grading_response: str, num_items: int) -> list[dict | None]:
+    """
+    Per-item grades from a batched grader response, None for every item whose
+    grade is missing or malformed. Entries are matched by their "id"; a list
+    without usable ids is matched by position if its length is right.
+    """
+    grades: list[dict | None] = [None] * num_items
+    parsed = parse_json_to_dict(grading_response)
+    if isinstance(parsed, dict):
+        # Structured-output modes often require a top-level object
+        parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+    if not isinstance(parsed, list):
+        return grades
+    entries = [entry for entry in parsed if isinstance(entry, dict)]
+
+    ids = [entry.get("id") for entry in entries]
+    if all(isinstance(i, int) and 1 <= i <= num_items for i in ids):
+        indexed = [(i - 1, entry) for i, entry in zip(ids, entries)]
+    elif len(entries) == num_items:
+        indexed = list(enumerate(entries))
+    else:
+        return grades
+
+    for index, entry in indexed:
+        label = entry.get("criteria_met")
+        if grades[index] is None and (label is True or label is False):
+            grades[index] = entry
+    return grades
+
+
+def grade_rubric_item(
+    grader: SamplerBase,
+    convo_with_response: MessageList,
+    rubric_item: RubricItem | str,
+    layout: str = "default",
+) -> dict:
+    messages = grader_messages(convo_with_response, rubric_item, layout)
+    while True:
+        sampler_response = grader(messages)
+        grading_response_dict = parse_grade(sampler_response.response_text)
+        if grading_response_dict is not None:
+            return grading_response_dict
+        print("Grading failed due to bad JSON output, retrying...")
+        discard_cached(grader, messages)
+
+
+async def agrade_rubric_item(
+    grader: SamplerBase,
+    convo_with_response: MessageList,
+    rubric_item: RubricItem | str,
+    layout: str = "default",
+) -> dict:
+    messages = grader_messages(convo_with_response, rubric_item, layout)
+    while True:
+        sampler_response = await grader.acall(messages)
+        grading_response_dict = parse_grade(sampler_response.response_text)
+        if grading_response_dict is not None:
+            return grading_response_dict
+        print("Grading failed due to bad JSON output, retrying...")
+        discard_cached(grader, messages)
+
+
+def _batch_grades_or_none(
+    grader: SamplerBase, messages: MessageList, response_text: str, num_items: int
+) -> tuple[list[dict | None], list[int]]:
+    grades = parse_batch_grades(response_text, num_items)
+    missing = [i for i, grade in enumerate(grades) if grade is None]
+    if len(missing) == num_items:
+        # Nothing usable; don't serve this response again from a cache
+        discard_cached(grader, messages)
+    if missing:
+        print(
+            f"Batched grading left {len(missing)}/{num_items} rubric items ungraded, grading them one by one..."
+        )
+    return grades, missing
+
+
+def grade_rubric_items_batched(
+    grader: SamplerBase,
+    convo_with_response: MessageList,
+    rubric_items: list[RubricItem | str],
+    layout: str = "default",
+) -> tuple[list[dict], int]:
+    """
+    Grade all rubric items in one grader request. Items the response does not
+    grade cleanly fall back to one request each. Returns the grades and the
+    number of fallback items.
+    """
+    messages = batch_grader_messages(convo_with_response, rubric_items, layout)
+    sampler_response = grader(messages)
+    grades, missing = _batch_grades_or_none(
+        grader, messages, sampler_response.response_text, len(rubric_items)
+    )
+    fallback_grades = common.map_with_progress(
+        lambda i: grade_rubric_item(
+            grader, convo_with_response, rubric_items[i], layout
+        ),
+        missing,
+        pbar=False,
+    )
+    for i, grade in zip(missing, fallback_grades):
+        grades[i] = grade
+    return grades, len(missing)
+
+
+async def agrade_rubric_items_batched(
+    grader: SamplerBase,
+    convo_with_response: MessageList,
+    rubric_items: list[RubricItem | str],
+    layout: str = "default",
+) -> tuple[list[dict], int]:
+    """
+    Async grade_rubric_items_batched
+    """
+    messages = batch_grader_messages(convo_with_response, rubric_items, layout)
+    sampler_response = await grader.acall(messages)
+    grades, missing = _batch_grades_or_none(
+        grader, messages, sampler_response.response_text, len(rubric_items)
+    )
+    fallback_grades = await common.amap_with_progress(
+        lambda i: agrade_rubric_item(
+            grader, convo_with_response, rubric_items[i], layout
+        ),
+        missing,
+        pbar=False,
+    )
+    for i, grade in zip(missing, fallback_grades):
+        grades[i] = grade
+    return grades, len(missing)
+
+
+def _usage_field(usage, name: str):
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
 def get_usage_dict(response_usage) -> dict[str, int | None]:
+    """
+    Token usage of a Responses API, Chat Completions or Anthropic Messages
+    response. input_cached_tokens counts the prompt tokens that were read
+    from the provider's prompt cache.
+    """
     if response_usage is None:
         return {
             "input_tokens": None,
@@ -170,29 +431,143 @@ def get_usage_dict(response_usage) -> dict[str, int | None]:
             "total_tokens": None,
         }
 
-    try:
+    if _usage_field(response_usage, "prompt_tokens") is not None:
+        # Chat Completions
+        return {
+            "input_tokens": _usage_field(response_usage, "prompt_tokens"),
+            "input_cached_tokens": _usage_field(
+                _usage_field(response_usage, "prompt_tokens_details"), "cached_tokens"
+            ),
+            "output_tokens": _usage_field(response_usage, "completion_tokens"),
+            "output_reasoning_tokens": _usage_field(
+                _usage_field(response_usage, "completion_tokens_details"),
+                "reasoning_tokens",
+            ),
+            "total_tokens": _usage_field(response_usage, "total_tokens"),
+        }
+    if _usage_field(response_usage, "input_tokens_details") is not None:
+        # Responses API
         return {
-            "input_tokens": response_usage.input_tokens,
-            "input_cached_tokens": response_usage.input_tokens_details.cached_tokens
-            if hasattr(response_usage.input_tokens_details, "cached_tokens")
-            else response_usage.input_tokens_details["cached_tokens"],
-            "output_tokens": response_usage.output_tokens,
-            "output_reasoning_tokens": response_usage.output_tokens_details.reasoning_tokens
-            if hasattr(response_usage.output_tokens_details, "reasoning_tokens")
-            else response_usage.output_tokens_details["reasoning_tokens"],
-            "total_tokens": response_usage.total_tokens,
+            "input_tokens": _usage_field(response_usage, "input_tokens"),
+            "input_cached_tokens": _usage_field(
+                _usage_field(response_usage, "input_tokens_details"), "cached_tokens"
+            ),
+            "output_tokens": _usage_field(response_usage, "output_tokens"),
+            "output_reasoning_tokens": _usage_field(
+                _usage_field(response_usage, "output_tokens_details"),
+                "reasoning_tokens",
+            ),
+            "total_tokens": _usage_field(response_usage, "total_tokens"),
+        }
+    # Anthropic Messages: input_tokens excludes cache reads and writes
+    cache_read = _usage_field(response_usage, "cache_read_input_tokens") or 0
+    cache_write = _usage_field(response_usage, "cache_creation_input_tokens") or 0
+    input_tokens = (_usage_field(response_usage, "input_tokens") or 0) + cache_read + cache_write
+    output_tokens = _usage_field(response_usage, "output_tokens") or 0
+    return {
+        "input_tokens": input_tokens,
+        "input_cached_tokens": cache_read,
+        "output_tokens": output_tokens,
+        "output_reasoning_tokens": None,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+class GraderUsageTracker(SamplerBase):
+    """
+    Wraps the grader and records prompt-cache usage and latency of every
+    grader request, to report the cache-hit ratio and what it saved.
+    """
+
+    def __init__(
+        self,
+        grader: SamplerBase,
+        cached_input_discount: float = CACHED_INPUT_DISCOUNT,
+    ):
+        self.grader = grader
+        self.cached_input_discount = cached_input_discount
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stats = {
+            "requests": 0,
+            "response_cache_hits": 0,
+            "batched_requests": 0,
+            "input_tokens": 0,
+            "input_cached_tokens": 0,
+            "prompt_cache_hit_requests": 0,
+            "prompt_cache_hit_latency_s": 0.0,
+            "prompt_cache_miss_requests": 0,
+            "prompt_cache_miss_latency_s": 0.0,
         }
-    except AttributeError:
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes not set on the wrapper itself
+        return getattr(self.__dict__["grader"], name)
+
+    def _record(self, sampler_response, latency: float) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+            if sampler_response.response_metadata.get("response_cache_hit"):
+                # Served from the local response cache: no tokens billed, no latency
+                self.stats["response_cache_hits"] += 1
+                return
+            usage = get_usage_dict(sampler_response.response_metadata.get("usage"))
+            if usage["input_tokens"] is None:
+                return
+            cached_tokens = usage["input_cached_tokens"] or 0
+            self.stats["input_tokens"] += usage["input_tokens"]
+            self.stats["input_cached_tokens"] += cached_tokens
+            if sampler_response.response_metadata.get("batched"):
+                # Billed tokens are real, but the latency was the batch's
+                self.stats["batched_requests"] += 1
+                return
+            kind = "hit" if cached_tokens > 0 else "miss"
+            self.stats[f"prompt_cache_{kind}_requests"] += 1
+            self.stats[f"prompt_cache_{kind}_latency_s"] += latency
+
+    def __call__(self, message_list: MessageList):
+        start = time.perf_counter()
+        sampler_response = self.grader(message_list)
+        self._record(sampler_response, time.perf_counter() - start)
+        return sampler_response
+
+    async def acall(self, message_list: MessageList):
+        start = time.perf_counter()
+        sampler_response = await self.grader.acall(message_list)
+        self._record(sampler_response, time.perf_counter() - start)
+        return sampler_response
+
+    def summary(self) -> dict:
+        """
+        Cache-hit ratio (cached / all prompt tokens), mean latency of requests
+        with and without a prompt-cache hit, and the estimated savings.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["prompt_cache_hit_requests"]
+        misses = stats["prompt_cache_miss_requests"]
+        hit_latency_total = stats.pop("prompt_cache_hit_latency_s")
+        miss_latency_total = stats.pop("prompt_cache_miss_latency_s")
+        hit_latency = hit_latency_total / hits if hits else None
+        miss_latency = miss_latency_total / misses if misses else None
+        input_tokens = stats["input_tokens"]
+        cache_hit_ratio = (
+            stats["input_cached_tokens"] / input_tokens if input_tokens else None
+        )
         return {
-            "input_tokens": response_usage.prompt_tokens,
-            "input_cached_tokens": response_usage.prompt_tokens_details.cached_tokens
-            if hasattr(response_usage.prompt_tokens_details, "cached_tokens")
-            else response_usage.prompt_tokens_details["cached_tokens"],
-            "output_tokens": response_usage.completion_tokens,
-            "output_reasoning_tokens": response_usage.completion_tokens_details.reasoning_tokens
-            if hasattr(response_usage.completion_tokens_details, "reasoning_tokens")
-            else response_usage.completion_tokens_details["reasoning_tokens"],
-            "total_tokens": response_usage.total_tokens,
+            **stats,
+            "prompt_cache_hit_ratio": cache_hit_ratio,
+            "mean_latency_cache_hit_s": hit_latency,
+            "mean_latency_cache_miss_s": miss_latency,
+            # Latency and input cost the cached requests would have added uncached
+            "est_latency_saved_s": (miss_latency - hit_latency) * hits
+            if hit_latency is not None and miss_latency is not None
+            else None,
+            "est_input_cost_saved_fraction": cache_hit_ratio * self.cached_input_discount
+            if cache_hit_ratio is not None
+            else None,
         }
 
 
@@ -218,28 +593,27 @@ PHYSICIAN_COMPLETION_MODES = {
 def _compute_clipped_stats(
     values: list,
     stat: str,
+    bootstrap: dict[str, float] | None = None,
 ):
-    """Computes the mean (clipped to [0, 1]), bootstrap std for that mean, and n_samples for final HealthBench scoring."""
+    """Computes the mean (clipped to [0, 1]), bootstrap std and confidence interval for that mean, and n_samples for final HealthBench scoring."""
     if stat == "mean":
         return np.clip(np.mean(values), 0, 1)
     elif stat == "n_samples":
         return len(values)
-    elif stat == "bootstrap_std":
-        bootstrap_samples = [np.random.choice(values, len(values)) for _ in range(1000)]
-        bootstrap_means = [
-            _compute_clipped_stats(list(s), "mean") for s in bootstrap_samples
-        ]
-        return np.std(bootstrap_means)
+    elif stat in ("bootstrap_std", "bootstrap_ci_low", "bootstrap_ci_high"):
+        return (bootstrap or common.bootstrap_stats(values, clip=(0, 1)))[stat]
     else:
         raise ValueError(f"Unknown {stat =}")
 
 
 def _aggregate_get_clipped_mean(
     single_eval_results: list[SingleEvalResult],
+    confidence_intervals: bool = False,
 ) -> EvalResult:
     """
     Aggregate multiple SingleEvalResults into a single EvalResult for HealthBench.
-    For each metric, returns the stats in _compute_clipped_stats.
+    For each metric, returns the stats in _compute_clipped_stats, plus the
+    bootstrap confidence interval if confidence_intervals is set.
     """
     name2values = defaultdict(list)
     htmls = []
@@ -255,9 +629,13 @@ def _aggregate_get_clipped_mean(
         metadata.append(single_eval_result.example_level_metadata)
     final_metrics = {}
     for name, values in name2values.items():
-        for stat in ["mean", "n_samples", "bootstrap_std"]:
+        stats = ["mean", "n_samples", "bootstrap_std"]
+        if confidence_intervals:
+            stats += ["bootstrap_ci_low", "bootstrap_ci_high"]
+        bootstrap = common._bootstrap_stats_for(values, stats, clip=(0, 1))
+        for stat in stats:
             key = name if stat == "mean" else f"{name}:{stat}"
-            final_metrics[key] = _compute_clipped_stats(values, stat)
+            final_metrics[key] = _compute_clipped_stats(values, stat, bootstrap)
     return EvalResult(
         score=final_metrics.pop("score", None),
         metrics=final_metrics,
@@ -279,7 +657,20 @@ class HealthBenchEval(Eval):
         run_reference_completions: bool = False,
         n_threads: int = 120,
         subset_name: Literal["hard", "consensus"] | None = None,
+        # "batched" grades all rubric items of an example in one grader request
+        grading_mode: Literal["per_item", "batched"] = "per_item",
+        # "prefix_cached" puts the conversation after the instructions and the
+        # rubric item last, so grader requests share a cacheable prefix
+        grader_prompt_layout: Literal["default", "prefix_cached"] = "default",
+        # Also report 95% bootstrap confidence intervals for every metric
+        confidence_intervals: bool = False,
     ):
+        assert grading_mode in ("per_item", "batched"), (
+            f"Invalid grading mode: {grading_mode}"
+        )
+        assert grader_prompt_layout in GRADER_PROMPT_LAYOUTS, (
+            f"Invalid grader prompt layout: {grader_prompt_layout}"
+        )
         if run_reference_completions:
             assert physician_completions_mode is not None, (
                 "physician_completions_mode must be provided if run_reference_completions is True"
@@ -298,12 +689,10 @@ class HealthBenchEval(Eval):
             input_path = INPUT_PATH
         else:
             assert False, f"Invalid subset name: {subset_name}"
-        # Use requests for public URLs, blobfile for private storage
+        # Use the shared dataset cache for public URLs, blobfile for private storage
         if input_path.startswith('https://'):
-            import requests
-            response = requests.get(input_path, stream=True)
-            response.raise_for_status()
-            examples = [json.loads(line.decode('utf-8')) for line in response.iter_lines() if line]
+            with open(common.cached_dataset_path(input_path), "rb") as f:
+                examples = [json.loads(line) for line in f if line.strip()]
         else:
             with bf.BlobFile(input_path, "rb") as f:
                 examples = [json.loads(line) for line in f]
@@ -364,7 +753,22 @@ class HealthBenchEval(Eval):
 
         self.examples = examples * n_repeats
         self.n_threads = n_threads
-        self.grader_model = grader_model
+        self.grader_model = GraderUsageTracker(grader_model)
+        self.grading_mode = grading_mode
+        self.grader_prompt_layout = grader_prompt_layout
+        self.confidence_intervals = confidence_intervals
+        self._grading_stats_lock = threading.Lock()
+        self._reset_grading_stats()
+
+    def _reset_grading_stats(self) -> None:
+        self.grading_stats = {"grader_requests": 0, "rubric_items": 0, "fallback_items": 0}
+        self.grader_model.reset()
+
+    def _record_grading(self, num_items: int, num_fallback: int) -> None:
+        with self._grading_stats_lock:
+            self.grading_stats["grader_requests"] += 1 + num_fallback
+            self.grading_stats["rubric_items"] += num_items
+            self.grading_stats["fallback_items"] += num_fallback
 
     def grade_sample(
         self,
@@ -376,31 +780,67 @@ class HealthBenchEval(Eval):
         # construct and grade the sample
         convo_with_response = prompt + [dict(content=response_text, role="assistant")]
 
-        def grade_rubric_item(rubric_item: RubricItem) -> dict:
-            convo_str = "\n\n".join(
-                [f"{m['role']}: {m['content']}" for m in convo_with_response]
+        if self.grading_mode == "batched":
+            grading_response_list, num_fallback = grade_rubric_items_batched(
+                self.grader_model,
+                convo_with_response,
+                rubric_items,
+                self.grader_prompt_layout,
             )
-            grader_prompt = GRADER_TEMPLATE.replace(
-                "<<conversation>>", convo_str
-            ).replace("<<rubric_item>>", str(rubric_item))
-            messages: MessageList = [dict(content=grader_prompt, role="user")]
-            while True:
-                sampler_response = self.grader_model(messages)
-                grading_response = sampler_response.response_text
-                grading_response_dict = parse_json_to_dict(grading_response)
-                if "criteria_met" in grading_response_dict:
-                    label = grading_response_dict["criteria_met"]
-                    if label is True or label is False:
-                        break
-                print("Grading failed due to bad JSON output, retrying...")
-            return grading_response_dict
+            self._record_grading(len(rubric_items), num_fallback)
+        else:
+            grading_response_list = common.map_with_progress(
+                lambda rubric_item: grade_rubric_item(
+                    self.grader_model,
+                    convo_with_response,
+                    rubric_item,
+                    self.grader_prompt_layout,
+                ),
+                rubric_items,
+                pbar=False,
+            )
+        return self._summarize_grades(example_tags, rubric_items, grading_response_list)
 
-        grading_response_list = common.map_with_progress(
-            grade_rubric_item,
-            rubric_items,
-            pbar=False,
-        )
+    async def agrade_sample(
+        self,
+        prompt: list[dict[str, str]],
+        response_text: str,
+        example_tags: list[str],
+        rubric_items: list[RubricItem],
+    ) -> tuple[dict, str, list[dict]]:
+        """
+        Async grade_sample: all rubric items are graded concurrently through
+        the grader's acall.
+        """
+        convo_with_response = prompt + [dict(content=response_text, role="assistant")]
+
+        if self.grading_mode == "batched":
+            grading_response_list, num_fallback = await agrade_rubric_items_batched(
+                self.grader_model,
+                convo_with_response,
+                rubric_items,
+                self.grader_prompt_layout,
+            )
+            self._record_grading(len(rubric_items), num_fallback)
+        else:
+            grading_response_list = await common.amap_with_progress(
+                lambda rubric_item: agrade_rubric_item(
+                    self.grader_model,
+                    convo_with_response,
+                    rubric_item,
+                    self.grader_prompt_layout,
+                ),
+                rubric_items,
+                pbar=False,
+            )
+        return self._summarize_grades(example_tags, rubric_items, grading_response_list)
 
+    def _summarize_grades(
+        self,
+        example_tags: list[str],
+        rubric_items: list[RubricItem],
+        grading_response_list: list[dict],
+    ) -> tuple[dict, str, list[dict]]:
         # compute the overall score
         overall_score = calculate_score(rubric_items, grading_response_list)
         assert overall_score is not None
@@ -456,66 +896,84 @@ class HealthBenchEval(Eval):
 
         return metrics, readable_explanation_str, rubric_items_with_grades
 
-    def __call__(self, sampler: SamplerBase) -> EvalResult:
-        def fn(row: dict):
-            prompt_messages = row["prompt"]
+    def _sample_response(self, row: dict, sampler_response=None):
+        """
+        Text, usage and queried messages of the completion being graded
+        """
+        prompt_messages = row["prompt"]
+        if self.physician_completions_mode is not None:
+            return row["completion_to_trial"], None, prompt_messages
+        response_dict = sampler_response.response_metadata
+        return (
+            sampler_response.response_text,
+            response_dict.get("usage", None),
+            sampler_response.actual_queried_message_list,
+        )
 
-            if self.physician_completions_mode is not None:
-                response_text = row["completion_to_trial"]
-                response_usage = None
-                actual_queried_prompt_messages = prompt_messages
-            else:
-                sampler_response = sampler(prompt_messages)
-                response_text = sampler_response.response_text
-                response_dict = sampler_response.response_metadata
-                actual_queried_prompt_messages = (
-                    sampler_response.actual_queried_message_list
-                )
-                response_usage = response_dict.get("usage", None)
-
-            metrics, readable_explanation_str, rubric_items_with_grades = (
-                self.grade_sample(
-                    prompt=actual_queried_prompt_messages,
-                    response_text=response_text,
-                    rubric_items=row["rubrics"],
-                    example_tags=row["example_tags"],
-                )
+    def _single_eval_result(
+        self,
+        row: dict,
+        response_text: str,
+        response_usage,
+        actual_queried_prompt_messages: MessageList,
+        grading: tuple[dict, str, list[dict]],
+    ) -> SingleEvalResult:
+        metrics, readable_explanation_str, rubric_items_with_grades = grading
+        score = metrics["overall_score"]
+
+        # Create HTML for each sample result
+        html = common.jinja_env.from_string(
+            HEALTHBENCH_HTML_JINJA.replace(
+                "{{ rubric_grades }}",
+                readable_explanation_str.replace("\n", "<br>"),
             )
+        ).render(
+            prompt_messages=actual_queried_prompt_messages,
+            next_message=dict(content=response_text, role="assistant"),
+            score=metrics["overall_score"],
+            extracted_answer=response_text,
+        )
 
-            score = metrics["overall_score"]
+        convo = actual_queried_prompt_messages + [
+            dict(content=response_text, role="assistant")
+        ]
+        return SingleEvalResult(
+            html=html,
+            score=score,
+            convo=convo,
+            metrics=metrics,
+            example_level_metadata={
+                "score": score,
+                "usage": get_usage_dict(response_usage),
+                "rubric_items": rubric_items_with_grades,
+                "prompt": actual_queried_prompt_messages,
+                "completion": [dict(content=response_text, role="assistant")],
+                "prompt_id": row["prompt_id"],
+                "completion_id": hashlib.sha256(
+                    (row["prompt_id"] + response_text).encode("utf-8")
+                ).hexdigest(),
+            },
+        )
 
-            # Create HTML for each sample result
-            html = common.jinja_env.from_string(
-                HEALTHBENCH_HTML_JINJA.replace(
-                    "{{ rubric_grades }}",
-                    readable_explanation_str.replace("\n", "<br>"),
-                )
-            ).render(
-                prompt_messages=actual_queried_prompt_messages,
-                next_message=dict(content=response_text, role="assistant"),
-                score=metrics["overall_score"],
-                extracted_answer=response_text,
+    def __call__(self, sampler: SamplerBase) -> EvalResult:
+        self._reset_grading_stats()
+
+        def fn(row: dict):
+            sampler_response = None
+            if self.physician_completions_mode is None:
+                sampler_response = sampler(row["prompt"])
+            response_text, response_usage, actual_queried_prompt_messages = (
+                self._sample_response(row, sampler_response)
             )
 
-            convo = actual_queried_prompt_messages + [
-                dict(content=response_text, role="assistant")
-            ]
-            return SingleEvalResult(
-                html=html,
-                score=score,
-                convo=convo,
-                metrics=metrics,
-                example_level_metadata={
-                    "score": score,
-                    "usage": get_usage_dict(response_usage),
-                    "rubric_items": rubric_items_with_grades,
-                    "prompt": actual_queried_prompt_messages,
-                    "completion": [dict(content=response_text, role="assistant")],
-                    "prompt_id": row["prompt_id"],
-                    "completion_id": hashlib.sha256(
-                        (row["prompt_id"] + response_text).encode("utf-8")
-                    ).hexdigest(),
-                },
+            grading = self.grade_sample(
+                prompt=actual_queried_prompt_messages,
+                response_text=response_text,
+                rubric_items=row["rubrics"],
+                example_tags=row["example_tags"],
+            )
+            return self._single_eval_result(
+                row, response_text, response_usage, actual_queried_prompt_messages, grading
             )
 
         results = common.map_with_progress(
@@ -524,7 +982,49 @@ class HealthBenchEval(Eval):
             num_threads=self.n_threads,
             pbar=True,
         )
-        final_metrics = _aggregate_get_clipped_mean(results)
+        final_metrics = _aggregate_get_clipped_mean(results, self.confidence_intervals)
+        return self._with_grading_stats(final_metrics)
+
+    async def acall(self, sampler: SamplerBase) -> EvalResult:
+        """
+        Async-native run: every example and rubric item is in flight at once
+        on the running event loop, bounded by the samplers' connection pools.
+        """
+        self._reset_grading_stats()
+
+        async def fn(row: dict):
+            sampler_response = None
+            if self.physician_completions_mode is None:
+                sampler_response = await sampler.acall(row["prompt"])
+            response_text, response_usage, actual_queried_prompt_messages = (
+                self._sample_response(row, sampler_response)
+            )
+
+            grading = await self.agrade_sample(
+                prompt=actual_queried_prompt_messages,
+                response_text=response_text,
+                rubric_items=row["rubrics"],
+                example_tags=row["example_tags"],
+            )
+            return self._single_eval_result(
+                row, response_text, response_usage, actual_queried_prompt_messages, grading
+            )
+
+        results = await common.amap_with_progress(fn, self.examples, pbar=True)
+        return self._with_grading_stats(
+            _aggregate_get_clipped_mean(results, self.confidence_intervals)
+        )
+
+    def _with_grading_stats(self, final_metrics: EvalResult) -> EvalResult:
+        if self.grading_mode == "batched":
+            print(f"Batched grading: {self.grading_stats}")
+            final_metrics.metadata["grading_stats"] = dict(self.grading_stats)
+        grader_usage = self.grader_model.summary()
+        print(f"Grader usage ({self.grader_prompt_layout} layout): {grader_usage}")
+        final_metrics.metadata["grader_usage"] = {
+            "layout": self.grader_prompt_layout,
+            **grader_usage,
+        }
         return final_metrics
 
 
@@ -1,7 +1,16 @@
 import sys
 import os
+from types import SimpleNamespace
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from healthbench_eval import RubricItem, calculate_score
+from eval_types import SamplerBase, SamplerResponse
+from healthbench_eval import (
+    RubricItem,
+    calculate_score,
+    get_usage_dict,
+    grade_rubric_items_batched,
+    grader_messages,
+    parse_batch_grades,
+)
 
 
 def test_calculate_score():
@@ -26,5 +35,106 @@ def test_calculate_score():
     print("test_calculate_score passed")
 
 
+def test_parse_batch_grades():
+    response = """```json
+[
+  {"id": 2, "explanation": "b", "criteria_met": false},
+  {"id": 1, "explanation": "a", "criteria_met": true},
+  {"id": 3, "explanation": "c", "criteria_met": "yes"}
+]
+```"""
+    grades = parse_batch_grades(response, 3)
+    assert grades[0]["explanation"] == "a" and grades[0]["criteria_met"] is True
+    assert grades[1]["explanation"] == "b" and grades[1]["criteria_met"] is False
+    assert grades[2] is None
+
+    # no ids: matched by position only if every item is present
+    assert parse_batch_grades('[{"criteria_met": true}]', 1) == [{"criteria_met": True}]
+    assert parse_batch_grades('[{"criteria_met": true}]', 2) == [None, None]
+    assert parse_batch_grades('{"grades": [{"id": 1, "criteria_met": true}]}', 1)[0]
+    assert parse_batch_grades("not json", 2) == [None, None]
+    print("test_parse_batch_grades passed")
+
+
+def test_grade_rubric_items_batched_falls_back_per_item():
+    class FakeGrader(SamplerBase):
+        def __init__(self):
+            self.requests = []
+
+        def __call__(self, message_list):
+            prompt = message_list[0]["content"]
+            self.requests.append(prompt)
+            if "# Rubric items" in prompt:
+                # grades item 1, leaves item 2 out
+                text = '[{"id": 1, "explanation": "batched", "criteria_met": true}]'
+            else:
+                text = '{"explanation": "single", "criteria_met": false}'
+            return SamplerResponse(
+                response_text=text,
+                response_metadata={},
+                actual_queried_message_list=message_list,
+            )
+
+    grader = FakeGrader()
+    rubric_items = [
+        RubricItem(criterion="first", points=5, tags=[]),
+        RubricItem(criterion="second", points=3, tags=[]),
+    ]
+    convo = [dict(role="user", content="hi"), dict(role="assistant", content="hello")]
+    grades, num_fallback = grade_rubric_items_batched(grader, convo, rubric_items)
+    assert num_fallback == 1
+    assert [g["explanation"] for g in grades] == ["batched", "single"]
+    assert len(grader.requests) == 2
+    assert "[3] second" in grader.requests[1]
+    print("test_grade_rubric_items_batched_falls_back_per_item passed")
+
+
+def test_get_usage_dict_cached_tokens():
+    chat_completions = SimpleNamespace(
+        prompt_tokens=1200,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+        completion_tokens=50,
+        completion_tokens_details=None,
+        total_tokens=1250,
+    )
+    usage = get_usage_dict(chat_completions)
+    assert usage["input_tokens"] == 1200 and usage["input_cached_tokens"] == 1024
+    assert usage["output_reasoning_tokens"] is None
+
+    responses = SimpleNamespace(
+        input_tokens=900,
+        input_tokens_details={"cached_tokens": 0},
+        output_tokens=10,
+        output_tokens_details={"reasoning_tokens": 4},
+        total_tokens=910,
+    )
+    assert get_usage_dict(responses)["output_reasoning_tokens"] == 4
+
+    anthropic = SimpleNamespace(
+        input_tokens=20,
+        cache_read_input_tokens=1500,
+        cache_creation_input_tokens=0,
+        output_tokens=30,
+    )
+    usage = get_usage_dict(anthropic)
+    assert usage["input_tokens"] == 1520 and usage["input_cached_tokens"] == 1500
+    assert usage["total_tokens"] == 1550
+    print("test_get_usage_dict_cached_tokens passed")
+
+
+def test_prefix_cached_layout_shares_prefix():
+    convo = [dict(role="user", content="hi"), dict(role="assistant", content="hello")]
+    first = grader_messages(convo, "[5] greets", "prefix_cached")[0]["content"]
+    second = grader_messages(convo, "[1] is brief", "prefix_cached")[0]["content"]
+    shared = os.path.commonprefix([first, second])
+    assert shared.endswith("# Rubric item\n[")
+    assert "# Instructions" in shared and "assistant: hello" in shared
+    print("test_prefix_cached_layout_shares_prefix passed")
+
+
 if __name__ == "__main__":
     test_calculate_score()
+    test_parse_batch_grades()
+    test_grade_rubric_items_batched_falls_back_per_item()
+    test_get_usage_dict_cached_tokens()
+    test_prefix_cached_layout_shares_prefix()
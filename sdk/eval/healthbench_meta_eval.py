@@ -15,11 +15,15 @@ import random
 from collections import defaultdict
 from typing import Literal
 
-import blobfile as bf
-
 import common
-from healthbench_eval import GRADER_TEMPLATE, parse_json_to_dict
-from eval_types import Eval, EvalResult, SamplerBase, SingleEvalResult
+from healthbench_eval import (
+    batch_grader_messages,
+    grade_rubric_items_batched,
+    grader_messages,
+    parse_grade,
+)
+from sampler.response_cache import discard_cached
+from eval_types import Eval, EvalResult, MessageList, SamplerBase, SingleEvalResult
 
 INPUT_PATH = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-12_oss_meta_eval.jsonl"
 INDEX_STR_TEMPLATE = "pairwise_{model_or_physician}_{metric}_{pred_str}"
@@ -41,9 +45,18 @@ class HealthBenchMetaEval(Eval):
         num_examples: int | None = None,
         n_threads: int = 120,
         n_repeats: int = 1,
+        # "batched" grades all rubrics of a completion in one grader request
+        grading_mode: Literal["per_item", "batched"] = "per_item",
+        # In batched mode, also grade per item and report how often the two agree
+        # (doubles grader cost)
+        compare_per_item: bool = False,
+        grader_prompt_layout: Literal["default", "prefix_cached"] = "default",
     ):
-        with bf.BlobFile(INPUT_PATH, "rb") as f:
-            examples = [json.loads(line) for line in f]
+        assert grading_mode in ("per_item", "batched"), (
+            f"Invalid grading mode: {grading_mode}"
+        )
+        with open(common.cached_dataset_path(INPUT_PATH), "rb") as f:
+            examples = [json.loads(line) for line in f if line.strip()]
         print(f"Loaded {len(examples)} examples from {INPUT_PATH}")
 
         rng = random.Random(0)
@@ -52,8 +65,12 @@ class HealthBenchMetaEval(Eval):
             examples = rng.sample(examples, num_examples)
 
         self.examples = examples * n_repeats
+        self.num_unique_examples = len(examples)
         self.grader_model = grader_model
         self.n_threads = n_threads
+        self.grading_mode = grading_mode
+        self.compare_per_item = compare_per_item
+        self.grader_prompt_layout = grader_prompt_layout
 
     def grade_sample(
         self,
@@ -77,17 +94,44 @@ class HealthBenchMetaEval(Eval):
         metrics = {**metrics, **category_metrics}
         return metrics, grader_label, explanation
 
-    def __call__(self, sampler: SamplerBase) -> EvalResult:
+    def _row_result(
+        self,
+        row: dict,
+        grading_response_dict: dict,
+        grader_convo: MessageList,
+        response_text: str,
+    ) -> tuple[SingleEvalResult, bool | None]:
+        metrics, grader_label, explanation = self.grade_sample(
+            grading_response_dict=grading_response_dict,
+            physician_labels=row["binary_labels"],
+            category=row["category"],
+        )
+        score = metrics["model_predicted_positive"]
+
+        # Create HTML for each sample result
+        html = common.jinja_env.from_string(HEALTHBENCH_META_HTML_JINJA).render(
+            prompt_messages=grader_convo,
+            next_message=dict(content=response_text, role="assistant"),
+            score=metrics["model_predicted_positive"],
+            extracted_answer=response_text,
+            explanation=explanation,
+        )
+        convo = grader_convo + [dict(content=response_text, role="assistant")]
+        return (
+            SingleEvalResult(html=html, score=score, convo=convo, metrics=metrics),
+            grader_label,
+        )
+
+    def _grade_per_item(
+        self, sampler: SamplerBase
+    ) -> list[tuple[SingleEvalResult, bool | None]]:
         def fn(row: dict) -> tuple[SingleEvalResult, bool | None]:
             convo_with_response = row["prompt"] + [
                 dict(content=row["completion"], role="assistant")
             ]
-            prompt_str = "\n\n".join(
-                [f"{m['role']}: {m['content']}" for m in convo_with_response]
+            grader_convo = grader_messages(
+                convo_with_response, row["rubric"], self.grader_prompt_layout
             )
-            grader_prompt = GRADER_TEMPLATE.replace("<<conversation>>", prompt_str)
-            grader_prompt = grader_prompt.replace("<<rubric_item>>", row["rubric"])
-            grader_convo = [dict(content=grader_prompt, role="user")]
 
             while True:
                 sampler_response = sampler(grader_convo)
@@ -95,42 +139,78 @@ class HealthBenchMetaEval(Eval):
                 actual_queried_grader_convo = (
                     sampler_response.actual_queried_message_list
                 )
-                grading_response_dict = parse_json_to_dict(response_text)
-                if "criteria_met" in grading_response_dict:
-                    label = grading_response_dict["criteria_met"]
-                    if label is True or label is False:
-                        break
+                grading_response_dict = parse_grade(response_text)
+                if grading_response_dict is not None:
+                    break
                 print("Grading failed due to bad JSON output, retrying...")
+                discard_cached(sampler, grader_convo)
 
-            metrics, grader_label, explanation = self.grade_sample(
-                grading_response_dict=grading_response_dict,
-                physician_labels=row["binary_labels"],
-                category=row["category"],
+            return self._row_result(
+                row, grading_response_dict, actual_queried_grader_convo, response_text
             )
-            score = metrics["model_predicted_positive"]
-
-            # Create HTML for each sample result
-            html = common.jinja_env.from_string(HEALTHBENCH_META_HTML_JINJA).render(
-                prompt_messages=actual_queried_grader_convo,
-                next_message=dict(content=response_text, role="assistant"),
-                score=metrics["model_predicted_positive"],
-                extracted_answer=response_text,
-                explanation=explanation,
+
+        return common.map_with_progress(fn, self.examples, self.n_threads)
+
+    def _grade_batched(
+        self, sampler: SamplerBase
+    ) -> list[tuple[SingleEvalResult, bool | None]]:
+        # Rows sharing a conversation and completion are graded in one request;
+        # repeats of the same row go to separate requests.
+        groups: dict[tuple, list[int]] = defaultdict(list)
+        for i, row in enumerate(self.examples):
+            key = (
+                i // self.num_unique_examples,
+                json.dumps(row["prompt"], sort_keys=True),
+                row["completion"],
             )
-            convo = actual_queried_grader_convo + [
-                dict(content=response_text, role="assistant")
+            groups[key].append(i)
+
+        def fn(indices: list[int]) -> list[tuple[SingleEvalResult, bool | None]]:
+            rows = [self.examples[i] for i in indices]
+            convo_with_response = rows[0]["prompt"] + [
+                dict(content=rows[0]["completion"], role="assistant")
             ]
-            return (
-                SingleEvalResult(html=html, score=score, convo=convo, metrics=metrics),
-                grader_label,
+            rubrics = [row["rubric"] for row in rows]
+            grades, _ = grade_rubric_items_batched(
+                sampler, convo_with_response, rubrics, self.grader_prompt_layout
+            )
+            grader_convo = batch_grader_messages(
+                convo_with_response, rubrics, self.grader_prompt_layout
             )
+            return [
+                self._row_result(row, grade, grader_convo, json.dumps(grade, indent=2))
+                for row, grade in zip(rows, grades)
+            ]
 
+        group_indices = list(groups.values())
+        group_outputs = common.map_with_progress(fn, group_indices, self.n_threads)
+        all_outputs: list = [None] * len(self.examples)
+        for indices, outputs in zip(group_indices, group_outputs):
+            for i, output in zip(indices, outputs):
+                all_outputs[i] = output
+        return all_outputs
+
+    def __call__(self, sampler: SamplerBase) -> EvalResult:
         # Run evaluation and collect results
-        all_outputs = common.map_with_progress(fn, self.examples, self.n_threads)
+        if self.grading_mode == "batched":
+            all_outputs = self._grade_batched(sampler)
+        else:
+            all_outputs = self._grade_per_item(sampler)
         results: list[SingleEvalResult]
         grader_labels: list[bool]
         results, grader_labels = zip(*all_outputs)
 
+        grading_mode_agreement = None
+        if self.grading_mode == "batched" and self.compare_per_item:
+            _, per_item_labels = zip(*self._grade_per_item(sampler))
+            grading_mode_agreement = compute_grading_mode_agreement(
+                batched_labels=grader_labels,
+                per_item_labels=per_item_labels,
+                physician_labels_list=[x["binary_labels"] for x in self.examples],
+                cluster_list=[x["category"] for x in self.examples],
+            )
+            print(f"Batched vs per-item grading: {grading_mode_agreement['summary']}")
+
         # model pairwise agreement metrics
         model_agreement_metrics = compute_metrics_for_rater_by_class(
             self_pred_list=grader_labels,
@@ -185,9 +265,62 @@ class HealthBenchMetaEval(Eval):
             "model_agreement_metrics": model_agreement_metrics,
             "physician_agreement_metric_lists": physician_agreement_metric_lists,
         }
+        if grading_mode_agreement is not None:
+            final_metrics.metrics.update(grading_mode_agreement["summary"])
+            final_metrics.metadata["grading_mode_agreement"] = grading_mode_agreement
         return final_metrics
 
 
+def cohen_kappa(labels_a: list[bool], labels_b: list[bool]) -> float | None:
+    n = len(labels_a)
+    if n == 0:
+        return None
+    observed = sum(a == b for a, b in zip(labels_a, labels_b, strict=True)) / n
+    pos_a = sum(labels_a) / n
+    pos_b = sum(labels_b) / n
+    expected = pos_a * pos_b + (1 - pos_a) * (1 - pos_b)
+    if expected == 1:
+        return 1.0 if observed == 1 else None
+    return (observed - expected) / (1 - expected)
+
+
+def compute_grading_mode_agreement(
+    batched_labels: list[bool],
+    per_item_labels: list[bool],
+    physician_labels_list: list[list[bool]],
+    cluster_list: list[str],
+) -> dict:
+    """
+    How closely batched grading reproduces per-item grading: label agreement
+    and Cohen's kappa between the two modes, and each mode's balanced F1
+    against physicians.
+    """
+    n = len(batched_labels)
+    agreement = (
+        sum(b == p for b, p in zip(batched_labels, per_item_labels, strict=True)) / n
+        if n > 0
+        else None
+    )
+    per_item_model_agreement_metrics = compute_metrics_for_rater_by_class(
+        self_pred_list=per_item_labels,
+        other_preds_list=physician_labels_list,
+        cluster_list=cluster_list,
+        model_or_physician="model",
+    )
+    summary = {
+        "batched_vs_per_item_agreement": agreement,
+        "batched_vs_per_item_kappa": cohen_kappa(batched_labels, per_item_labels),
+        "batched_vs_per_item_n": n,
+        "per_item_pairwise_model_f1_balanced": per_item_model_agreement_metrics.get(
+            "pairwise_model_f1_balanced", {}
+        ).get("value"),
+    }
+    return {
+        "summary": {k: v for k, v in summary.items() if v is not None},
+        "per_item_model_agreement_metrics": per_item_model_agreement_metrics,
+    }
+
+
 def compute_metrics_for_rater_by_class(
     self_pred_list: list[bool],
     other_preds_list: list[list[bool]],
@@ -36,7 +36,9 @@ class MathEval(Eval):
         split: Literal["math_test", "math_500_test"] = "math_test",
     ):
         df = pandas.read_csv(
-            f"https://openaipublic.blob.core.windows.net/simple-evals/{split}.csv"
+            common.cached_dataset_path(
+                f"https://openaipublic.blob.core.windows.net/simple-evals/{split}.csv"
+            )
         )
         examples = [row.to_dict() for _, row in df.iterrows()]
         if num_examples:
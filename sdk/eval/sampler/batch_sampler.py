@@ -0,0 +1,356 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import PendingBatchRequest
+from eval_types import MessageList, SamplerBase, SamplerResponse
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+RESPONSES_ENDPOINT = "/v1/responses"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# A request that errors this many times fails the run instead of being resubmitted
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _response_text(endpoint: str, body: dict) -> str | None:
+    if endpoint == RESPONSES_ENDPOINT:
+        texts = [
+            part.get("text", "")
+            for item in body.get("output", [])
+            if item.get("type") == "message"
+            for part in item.get("content", [])
+            if part.get("type") == "output_text"
+        ]
+        return "".join(texts) if texts else None
+    choices = body.get("choices") or [{}]
+    return choices[0].get("message", {}).get("content")
+
+
+class BatchClient:
+    """
+    A provider batch API. Request files use the OpenAI batch JSONL format
+    ({"custom_id", "method", "url", "body"} per line) and results come back
+    as its output lines ({"custom_id", "response": {"status_code", "body"},
+    "error"}).
+    """
+
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        """Upload the request file and start a batch; returns the batch id"""
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        """Output and error lines of a finished batch"""
+        raise NotImplementedError
+
+
+class OpenAIBatchClient(BatchClient):
+    def __init__(self, client=None, completion_window: str = "24h"):
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI()
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        with open(requests_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=endpoint,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchClient(BatchClient):
+    """
+    Stand-in for a provider batch API, for tests and dry runs. Each request
+    is answered by respond(endpoint, body) -> response body; the output is
+    written next to the request file, so batches survive a restart.
+    """
+
+    def __init__(self, respond: Callable[[str, dict], dict], polls_until_done: int = 0):
+        self.respond = respond
+        self.polls_until_done = polls_until_done
+        self._polls: dict[str, int] = {}
+
+    @staticmethod
+    def _output_path(batch_id: str) -> str:
+        return batch_id.removeprefix("local:") + ".output.jsonl"
+
+    def submit(self, requests_path: str, endpoint: str) -> str:
+        output_lines = []
+        with open(requests_path) as f:
+            for line in f:
+                request = json.loads(line)
+                try:
+                    body = self.respond(endpoint, request["body"])
+                    output = {"status_code": 200, "body": body}
+                    error = None
+                except Exception as e:
+                    output, error = None, {"message": str(e)}
+                output_lines.append(
+                    json.dumps(
+                        {"custom_id": request["custom_id"], "response": output, "error": error}
+                    )
+                )
+        batch_id = f"local:{requests_path}"
+        _write_atomic(self._output_path(batch_id), "".join(f"{line}\n" for line in output_lines))
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        self._polls[batch_id] = self._polls.get(batch_id, 0) + 1
+        if self._polls[batch_id] <= self.polls_until_done:
+            return "in_progress"
+        return "completed" if os.path.exists(self._output_path(batch_id)) else "failed"
+
+    def results(self, batch_id: str) -> Iterator[dict]:
+        with open(self._output_path(batch_id)) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class BatchStore:
+    """
+    On-disk state of a batched eval run, kept in one directory:
+    - requests-*.jsonl: request files as submitted
+    - batches.json: batches submitted but not collected yet
+    - results.jsonl: one line per received result, failure or discard
+
+    Results are appended before a batch is marked collected, so a restarted
+    run picks up every finished result and waits on the batches in flight.
+    """
+
+    def __init__(self, directory: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_attempts = max_attempts
+        self.results: dict[str, dict] = {}
+        self.attempts: dict[str, int] = {}
+        self.last_error: dict[str, str] = {}
+        self.pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        self._results_path = os.path.join(directory, "results.jsonl")
+        self._batches_path = os.path.join(directory, "batches.json")
+        self.batches: list[dict] = []
+        if os.path.exists(self._batches_path):
+            with open(self._batches_path) as f:
+                self.batches = json.load(f)
+        if os.path.exists(self._results_path):
+            with open(self._results_path) as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _apply(self, record: dict) -> None:
+        custom_id = record["custom_id"]
+        if record.get("discarded"):
+            self.results.pop(custom_id, None)
+        elif "error" in record:
+            self.attempts[custom_id] = self.attempts.get(custom_id, 0) + 1
+            self.last_error[custom_id] = record["error"]
+        else:
+            self.results[custom_id] = record
+
+    def _append(self, records: list[dict]) -> None:
+        with open(self._results_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for record in records:
+            self._apply(record)
+
+    def get(self, custom_id: str) -> dict | None:
+        return self.results.get(custom_id)
+
+    def add_pending(self, custom_id: str, endpoint: str, body: dict) -> None:
+        with self._lock:
+            if self.attempts.get(custom_id, 0) >= self.max_attempts:
+                raise RuntimeError(
+                    f"Batch request {custom_id} failed {self.attempts[custom_id]} times: "
+                    f"{self.last_error.get(custom_id)}"
+                )
+            self.pending[custom_id] = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": endpoint,
+                "body": body,
+            }
+
+    def discard(self, custom_id: str) -> None:
+        with self._lock:
+            if custom_id in self.results:
+                self._append([{"custom_id": custom_id, "discarded": True}])
+
+    def submit(self, client: BatchClient) -> None:
+        """Submit the pending requests, one batch per endpoint"""
+        with self._lock:
+            by_endpoint: dict[str, list[dict]] = {}
+            for request in self.pending.values():
+                by_endpoint.setdefault(request["url"], []).append(request)
+            for endpoint, requests in by_endpoint.items():
+                text = "".join(json.dumps(r) + "\n" for r in requests)
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+                name = f"requests-{time.strftime('%Y%m%d_%H%M%S')}-{digest}.jsonl"
+                requests_path = os.path.join(self.directory, name)
+                _write_atomic(requests_path, text)
+                batch_id = client.submit(requests_path, endpoint)
+                self.batches.append(
+                    {
+                        "id": batch_id,
+                        "endpoint": endpoint,
+                        "requests_path": requests_path,
+                        "submitted_at": time.time(),
+                    }
+                )
+                _write_atomic(self._batches_path, json.dumps(self.batches, indent=2))
+                print(f"Submitted batch {batch_id}: {len(requests)} requests to {endpoint}")
+            self.pending.clear()
+
+    def collect(self, client: BatchClient, poll_interval: float = 30.0) -> None:
+        """Wait for every batch in flight and store its results"""
+        while self.batches:
+            batch = self.batches[0]
+            while (status := client.status(batch["id"])) not in TERMINAL_STATUSES:
+                print(f"Batch {batch['id']} is {status}; checking again in {poll_interval:.0f}s")
+                time.sleep(poll_interval)
+            self._ingest(client, batch, status)
+            self.batches.pop(0)
+            _write_atomic(self._batches_path, json.dumps(self.batches, indent=2))
+
+    def _ingest(self, client: BatchClient, batch: dict, status: str) -> None:
+        with open(batch["requests_path"]) as f:
+            requested = {json.loads(line)["custom_id"] for line in f if line.strip()}
+        records = []
+        for line in client.results(batch["id"]) if status != "failed" else []:
+            custom_id = line["custom_id"]
+            response = line.get("response") or {}
+            status_code = response.get("status_code")
+            body = response.get("body") or {}
+            requested.discard(custom_id)
+            if status_code == 400:
+                # Same as the samplers: a rejected prompt scores as an empty response
+                records.append({"custom_id": custom_id, "response_text": "", "usage": None})
+                continue
+            text = _response_text(batch["endpoint"], body) if status_code == 200 else None
+            if text is None:
+                error = line.get("error") or body.get("error") or f"status {status_code}"
+                records.append({"custom_id": custom_id, "error": json.dumps(error)})
+            else:
+                records.append(
+                    {"custom_id": custom_id, "response_text": text, "usage": body.get("usage")}
+                )
+        # Requests the batch never answered (failed or expired batch) count as errors
+        records.extend(
+            {"custom_id": custom_id, "error": f"batch {status}"} for custom_id in requested
+        )
+        with self._lock:
+            self._append(records)
+        failed = sum("error" in record for record in records)
+        print(f"Collected batch {batch['id']} ({status}): {len(records) - failed} results, {failed} failed")
+
+
+class BatchSampler(SamplerBase):
+    """
+    Sends an OpenAI sampler's requests through a batch API instead of calling
+    it directly. Requests without a stored result raise PendingBatchRequest;
+    run_in_batches submits them and replays the eval once results are in.
+    Identical requests share one result.
+    """
+
+    def __init__(self, sampler: SamplerBase, store: BatchStore):
+        create_kwargs = getattr(sampler, "_create_kwargs", None)
+        if create_kwargs is None or not isinstance(create_kwargs([]), dict):
+            raise ValueError(f"{type(sampler).__name__} does not support batch mode")
+        self.sampler = sampler
+        self.store = store
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not set on the wrapper itself
+        return getattr(self.__dict__["sampler"], name)
+
+    def _request(self, message_list: MessageList) -> tuple[str, str, dict, MessageList]:
+        prepare = getattr(self.sampler, "_prepare_messages", None)
+        messages = prepare(message_list) if prepare is not None else message_list
+        kwargs = self.sampler._create_kwargs(messages)
+        endpoint = CHAT_COMPLETIONS_ENDPOINT if "messages" in kwargs else RESPONSES_ENDPOINT
+        body = {name: value for name, value in kwargs.items() if value is not None}
+        payload = json.dumps({"url": endpoint, "body": body}, sort_keys=True)
+        custom_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return custom_id, endpoint, body, messages
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        custom_id, endpoint, body, messages = self._request(message_list)
+        record = self.store.get(custom_id)
+        if record is None:
+            self.store.add_pending(custom_id, endpoint, body)
+            raise PendingBatchRequest(custom_id)
+        return SamplerResponse(
+            response_text=record["response_text"],
+            response_metadata={"usage": record["usage"], "batched": True},
+            actual_queried_message_list=messages,
+        )
+
+    def discard(self, message_list: MessageList) -> None:
+        self.store.discard(self._request(message_list)[0])
+
+
+def run_in_batches(
+    run: Callable[[], Any],
+    store: BatchStore,
+    client: BatchClient,
+    poll_interval: float = 30.0,
+) -> Any:
+    """
+    Run an eval whose samplers are BatchSamplers, in rounds. Each round
+    replays the eval against the results stored so far and submits every
+    request still missing; the eval's result is returned from the first
+    round that needs no new request. Batches left in flight by an earlier
+    process are collected before the first round.
+    """
+    round_index = 0
+    while True:
+        store.collect(client, poll_interval)
+        round_index += 1
+        try:
+            return run()
+        except PendingBatchRequest:
+            pass
+        if not store.pending:
+            raise RuntimeError("Eval is waiting on batch results but made no new requests")
+        print(f"Batch round {round_index}: {len(store.pending)} requests to submit")
+        store.submit(client)
@@ -0,0 +1,91 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common
+from eval_types import SamplerBase
+from sampler.batch_sampler import (
+    BatchSampler,
+    BatchStore,
+    LocalBatchClient,
+    run_in_batches,
+)
+
+
+class FakeChatSampler(SamplerBase):
+    def __init__(self, model: str):
+        self.model = model
+
+    def _create_kwargs(self, message_list):
+        return dict(model=self.model, messages=message_list, temperature=0.0)
+
+
+def respond(endpoint, body):
+    text = body["messages"][-1]["content"]
+    answer = text.upper() if body["model"] == "model" else f"graded {text}"
+    return {
+        "choices": [{"message": {"role": "assistant", "content": answer}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+    }
+
+
+def run_eval(model, grader):
+    def fn(x):
+        response = model([dict(role="user", content=x)]).response_text
+        return grader([dict(role="user", content=response)]).response_text
+
+    return common.map_with_progress(fn, ["a", "b", "c"], pbar=False)
+
+
+def test_run_in_batches_rounds_and_resume():
+    with tempfile.TemporaryDirectory() as directory:
+        store = BatchStore(directory)
+        client = LocalBatchClient(respond, polls_until_done=1)
+        model = BatchSampler(FakeChatSampler("model"), store)
+        grader = BatchSampler(FakeChatSampler("grader"), store)
+
+        # model responses in the first batch, grades in the second
+        results = run_in_batches(
+            lambda: run_eval(model, grader), store, client, poll_interval=0
+        )
+        assert results == ["graded A", "graded B", "graded C"]
+        assert len(os.listdir(directory)) == 2 + 2 * 2  # state files + 2 batches
+
+        # a restarted run replays from disk without submitting anything
+        store = BatchStore(directory)
+        model = BatchSampler(FakeChatSampler("model"), store)
+        grader = BatchSampler(FakeChatSampler("grader"), store)
+        submitted = []
+        client.submit = lambda *args: submitted.append(args)
+        assert run_in_batches(
+            lambda: run_eval(model, grader), store, client, poll_interval=0
+        ) == results
+        assert submitted == []
+    print("test_run_in_batches_rounds_and_resume passed")
+
+
+def test_batch_in_flight_is_collected_after_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        store = BatchStore(directory)
+        client = LocalBatchClient(respond, polls_until_done=2)
+        model = BatchSampler(FakeChatSampler("model"), store)
+        try:
+            model([dict(role="user", content="x")])
+        except common.PendingBatchRequest:
+            pass
+        store.submit(client)
+
+        # process stops here; a new one finds the batch and waits for it
+        store = BatchStore(directory)
+        assert len(store.batches) == 1
+        store.collect(client, poll_interval=0)
+        model = BatchSampler(FakeChatSampler("model"), store)
+        assert model([dict(role="user", content="x")]).response_text == "X"
+        assert store.batches == []
+    print("test_batch_in_flight_is_collected_after_restart passed")
+
+
+if __name__ == "__main__":
+    test_run_in_batches_rounds_and_resume()
+    test_batch_in_flight_is_collected_after_restart()
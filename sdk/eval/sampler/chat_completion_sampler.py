@@ -1,13 +1,14 @@
-import time
 from typing import Any
 
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from eval_types import MessageList, SamplerBase, SamplerResponse
+import common
+from sampler.rate_limiter import estimate_tokens, get_rate_limiter
 
 OPENAI_SYSTEM_MESSAGE_API = "You are a helpful assistant."
 OPENAI_SYSTEM_MESSAGE_CHATGPT = (
@@ -16,6 +17,22 @@ OPENAI_SYSTEM_MESSAGE_CHATGPT = (
 )
 
 
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    AsyncOpenAI client shared by all OpenAI samplers on the running event loop
+    """
+    return common.get_async_client(
+        "openai",
+        lambda: AsyncOpenAI(
+            # Retries and 429 backoff are handled by the sampler's rate limiter
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=common.async_http_limits()
+            )
+        ),
+    )
+
+
 class ChatCompletionSampler(SamplerBase):
     """
     Sample from OpenAI's chat completion API
@@ -29,9 +46,10 @@ class ChatCompletionSampler(SamplerBase):
         max_tokens: int = 1024,
     ):
         self.api_key_name = "OPENAI_API_KEY"
-        self.client = OpenAI()
+        self.client = OpenAI(max_retries=0)
         # using api_key=os.environ.get("OPENAI_API_KEY")  # please set your API_KEY
         self.model = model
+        self.rate_limiter = get_rate_limiter("openai", model)
         self.system_message = system_message
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -58,42 +76,71 @@ class ChatCompletionSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any):
         return {"role": str(role), "content": content}
 
-    def __call__(self, message_list: MessageList) -> SamplerResponse:
+    def _prepare_messages(self, message_list: MessageList) -> MessageList:
         if self.system_message:
             message_list = [
                 self._pack_message("system", self.system_message)
             ] + message_list
-        trial = 0
-        while True:
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=message_list,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                )
-                content = response.choices[0].message.content
-                if content is None:
-                    raise ValueError("OpenAI API returned empty response; retrying")
-                return SamplerResponse(
-                    response_text=content,
-                    response_metadata={"usage": response.usage},
-                    actual_queried_message_list=message_list,
-                )
-            # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
-            except openai.BadRequestError as e:
-                print("Bad Request Error", e)
-                return SamplerResponse(
-                    response_text="No response (bad request).",
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
-                )
-            except Exception as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
-                )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+        return message_list
+
+    def _create_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        return dict(
+            model=self.model,
+            messages=message_list,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+
+    def _to_sampler_response(self, response, message_list: MessageList) -> SamplerResponse:
+        content = response.choices[0].message.content
+        if content is None:
+            raise ValueError("OpenAI API returned empty response; retrying")
+        return SamplerResponse(
+            response_text=content,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=message_list,
+        )
+
+    def _bad_request_response(self, message_list: MessageList) -> SamplerResponse:
+        return SamplerResponse(
+            response_text="No response (bad request).",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._prepare_messages(message_list)
+        kwargs = self._create_kwargs(message_list)
+
+        def send():
+            raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return self.rate_limiter.call(
+                send,
+                tokens=estimate_tokens(message_list, self.max_tokens),
+                give_up_on=(openai.BadRequestError,),
+            )
+        # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._prepare_messages(message_list)
+        kwargs = self._create_kwargs(message_list)
+
+        async def send():
+            raw = await get_async_openai_client().chat.completions.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return await self.rate_limiter.acall(
+                send,
+                tokens=estimate_tokens(message_list, self.max_tokens),
+                give_up_on=(openai.BadRequestError,),
+            )
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
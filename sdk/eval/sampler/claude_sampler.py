@@ -1,4 +1,3 @@
-import time
 import os
 
 import sys
@@ -9,6 +8,7 @@ import anthropic
 
 from eval_types import MessageList, SamplerBase, SamplerResponse
 import common
+from sampler.rate_limiter import estimate_tokens, get_rate_limiter
 
 CLAUDE_SYSTEM_MESSAGE_LMSYS = (
     "The assistant is Claude, created by Anthropic. The current date is "
@@ -28,6 +28,22 @@ CLAUDE_SYSTEM_MESSAGE_LMSYS = (
 # reference: https://github.com/lm-sys/FastChat/blob/7899355ebe32117fdae83985cf8ee476d2f4243f/fastchat/conversation.py#L894
 
 
+def get_async_anthropic_client() -> anthropic.AsyncAnthropic:
+    """
+    AsyncAnthropic client shared by all Claude samplers on the running event loop
+    """
+    return common.get_async_client(
+        "anthropic",
+        lambda: anthropic.AsyncAnthropic(
+            # Retries and 429 backoff are handled by the sampler's rate limiter
+            max_retries=0,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=common.async_http_limits()
+            )
+        ),
+    )
+
+
 class ClaudeCompletionSampler(SamplerBase):
 
     def __init__(
@@ -37,9 +53,10 @@ class ClaudeCompletionSampler(SamplerBase):
         temperature: float = 0.0,  # default in Anthropic example
         max_tokens: int = 4096,
     ):
-        self.client = anthropic.Anthropic()
+        self.client = anthropic.Anthropic(max_retries=0)
         self.api_key = os.environ.get("ANTHROPIC_API_KEY")  # please set your API_KEY
         self.model = model
+        self.rate_limiter = get_rate_limiter("anthropic", model)
         self.system_message = system_message
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -68,41 +85,56 @@ class ClaudeCompletionSampler(SamplerBase):
     def _pack_message(self, role, content):
         return {"role": str(role), "content": content}
 
+    def _create_kwargs(self, message_list: MessageList) -> tuple[dict, MessageList]:
+        """
+        Request kwargs and the message list as actually queried
+        """
+        if not common.has_only_user_assistant_messages(message_list):
+            raise ValueError(f"Claude sampler only supports user and assistant messages, got {message_list}")
+        kwargs = dict(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            messages=message_list,
+        )
+        if self.system_message:
+            kwargs["system"] = self.system_message
+            claude_input_messages: MessageList = [{"role": "system", "content": self.system_message}] + message_list
+            return kwargs, claude_input_messages
+        return kwargs, message_list
+
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        trial = 0
-        while True:
-            try:
-                if not common.has_only_user_assistant_messages(message_list):
-                    raise ValueError(f"Claude sampler only supports user and assistant messages, got {message_list}")
-                if self.system_message:
-                    response_message = self.client.messages.create(
-                        model=self.model,
-                        system=self.system_message,
-                        max_tokens=self.max_tokens,
-                        temperature=self.temperature,
-                        messages=message_list,
-                    )
-                    claude_input_messages: MessageList = [{"role": "system", "content": self.system_message}] + message_list
-                else:
-                    response_message = self.client.messages.create(
-                        model=self.model,
-                        max_tokens=self.max_tokens,
-                        temperature=self.temperature,
-                        messages=message_list,
-                    )
-                    claude_input_messages = message_list
-                response_text = response_message.content[0].text
-                return SamplerResponse(
-                    response_text=response_text,
-                    response_metadata={},
-                    actual_queried_message_list=claude_input_messages,
-                )
-            except anthropic.RateLimitError as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
-                )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+        kwargs, claude_input_messages = self._create_kwargs(message_list)
+
+        def send():
+            raw = self.client.messages.with_raw_response.create(**kwargs)
+            return raw.parse(), raw.headers
+
+        response_message = self.rate_limiter.call(
+            send,
+            tokens=estimate_tokens(message_list, self.max_tokens),
+            give_up_on=(anthropic.BadRequestError,),
+        )
+        return SamplerResponse(
+            response_text=response_message.content[0].text,
+            response_metadata={"usage": response_message.usage},
+            actual_queried_message_list=claude_input_messages,
+        )
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        kwargs, claude_input_messages = self._create_kwargs(message_list)
+
+        async def send():
+            raw = await get_async_anthropic_client().messages.with_raw_response.create(**kwargs)
+            return raw.parse(), raw.headers
+
+        response_message = await self.rate_limiter.acall(
+            send,
+            tokens=estimate_tokens(message_list, self.max_tokens),
+            give_up_on=(anthropic.BadRequestError,),
+        )
+        return SamplerResponse(
+            response_text=response_message.content[0].text,
+            response_metadata={"usage": response_message.usage},
+            actual_queried_message_list=claude_input_messages,
+        )
@@ -1,4 +1,3 @@
-import time
 from typing import Any
 
 import sys
@@ -9,6 +8,8 @@ import openai
 from openai import OpenAI
 
 from eval_types import MessageList, SamplerBase, SamplerResponse
+from sampler.chat_completion_sampler import get_async_openai_client
+from sampler.rate_limiter import estimate_tokens, get_rate_limiter
 
 
 class OChatCompletionSampler(SamplerBase):
@@ -23,9 +24,10 @@ class OChatCompletionSampler(SamplerBase):
         model: str = "o1-mini",
     ):
         self.api_key_name = "OPENAI_API_KEY"
-        self.client = OpenAI()
+        self.client = OpenAI(max_retries=0)
         # using api_key=os.environ.get("OPENAI_API_KEY")  # please set your API_KEY
         self.model = model
+        self.rate_limiter = get_rate_limiter("openai", model)
         self.image_format = "url"
         self.reasoning_effort = reasoning_effort
 
@@ -50,35 +52,58 @@ class OChatCompletionSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any):
         return {"role": str(role), "content": content}
 
+    def _create_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        return dict(
+            model=self.model,
+            messages=message_list,
+            reasoning_effort=self.reasoning_effort,
+        )
+
+    def _to_sampler_response(self, response, message_list: MessageList) -> SamplerResponse:
+        return SamplerResponse(
+            response_text=response.choices[0].message.content,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=message_list,
+        )
+
+    def _bad_request_response(self, message_list: MessageList) -> SamplerResponse:
+        return SamplerResponse(
+            response_text="",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        trial = 0
-        while True:
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=message_list,
-                    reasoning_effort=self.reasoning_effort,
-                )
-                content = response.choices[0].message.content
-                return SamplerResponse(
-                    response_text=content,
-                    response_metadata={"usage": response.usage},
-                    actual_queried_message_list=message_list,
-                )
-            # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
-            except openai.BadRequestError as e:
-                print("Bad Request Error", e)
-                return SamplerResponse(
-                    response_text="",
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
-                )
-            except Exception as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
-                )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+        kwargs = self._create_kwargs(message_list)
+
+        def send():
+            raw = self.client.chat.completions.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return self.rate_limiter.call(
+                send,
+                tokens=estimate_tokens(message_list, None),
+                give_up_on=(openai.BadRequestError,),
+            )
+        # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        kwargs = self._create_kwargs(message_list)
+
+        async def send():
+            raw = await get_async_openai_client().chat.completions.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return await self.rate_limiter.acall(
+                send,
+                tokens=estimate_tokens(message_list, None),
+                give_up_on=(openai.BadRequestError,),
+            )
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Mapping
+
+DEFAULT_MAX_RETRIES = int(os.getenv("EVAL_MAX_RETRIES", "8"))
+MAX_BACKOFF_SECONDS = 60.0
+
+# AIMD concurrency bounds per (provider, model)
+INITIAL_CONCURRENCY = int(os.getenv("EVAL_INITIAL_CONCURRENCY", "16"))
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.getenv("EVAL_RATE_LIMIT_MAX_CONCURRENCY", "128"))
+DECREASE_FACTOR = 0.5
+# A burst of 429s from requests already in flight counts as one congestion signal
+DECREASE_COOLDOWN_SECONDS = 2.0
+# How often a caller waiting for a free concurrency slot checks again
+SLOT_POLL_SECONDS = 0.02
+
+# Rate limit headers, OpenAI (x-ratelimit-*) and Anthropic (anthropic-ratelimit-*) style
+_HEADER_NAMES = {
+    "requests": (
+        ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+        ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+    ),
+    "tokens": (
+        ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+        ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+    ),
+}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str | None) -> float | None:
+    """
+    Seconds until a rate limit resets, from durations like "6m0s" / "20ms"
+    (OpenAI) or RFC 3339 timestamps (Anthropic).
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, reset_at.timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(headers: Mapping[str, str] | None) -> float | None:
+    """
+    Server-requested wait from retry-after-ms or Retry-After (seconds or HTTP date)
+    """
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(message_list: list, max_tokens: int | None = None) -> int:
+    """
+    Rough token cost of a request as rate limiters count it: prompt
+    characters / 4 plus the completion budget.
+    """
+    prompt_chars = len(json.dumps(message_list, default=str))
+    return prompt_chars // 4 + (max_tokens or 0)
+
+
+def _error_headers(error: BaseException) -> Mapping[str, str]:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+def _describe(error: BaseException) -> str:
+    status = getattr(error, "status_code", None)
+    return f"{type(error).__name__} ({status})" if status else f"{type(error).__name__}: {error}"
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class _TokenBucket:
+    """
+    Bucket mirroring one server-side limit (requests or tokens per minute),
+    re-synced from the remaining count on every response.
+    """
+
+    def __init__(self, capacity: float, refill_seconds: float = 60.0):
+        self.capacity = capacity
+        self.available = capacity
+        self.rate = capacity / refill_seconds
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def sync(self, limit: float, remaining: float, reset_seconds: float | None, now: float) -> None:
+        self.capacity = limit
+        self.available = remaining
+        # The window refills fully by the reset time; fall back to a per-minute limit
+        if reset_seconds and limit > remaining:
+            self.rate = max((limit - remaining) / reset_seconds, limit / 60.0)
+        else:
+            self.rate = limit / 60.0
+        self.updated = now
+
+
+class AdaptiveRateLimiter:
+    """
+    Client-side limiter for one (provider, model).
+
+    Requests and tokens are paced by buckets fed from the x-ratelimit-*
+    response headers, and the number of requests in flight follows AIMD:
+    it grows by about one per round of successes and halves on a 429.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_concurrency: int = INITIAL_CONCURRENCY,
+        min_concurrency: int = MIN_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.name = name
+        self.concurrency = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.buckets: dict[str, _TokenBucket] = {}
+        self.blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "failures": 0}
+
+    def _try_acquire(self, tokens: int) -> float:
+        """
+        Take a slot and bucket capacity and return 0, or return how long to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.concurrency):
+                return SLOT_POLL_SECONDS
+            wait = 0.0
+            needs = {"requests": 1, "tokens": tokens}
+            for kind, bucket in self.buckets.items():
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_for(needs[kind]))
+            if wait > 0:
+                return wait
+            for kind, bucket in self.buckets.items():
+                bucket.available -= min(needs[kind], bucket.capacity)
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            return 0.0
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def acquire(self, tokens: int = 0) -> None:
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def on_success(self, headers: Mapping[str, str] | None) -> None:
+        with self._lock:
+            self._sync_buckets(headers)
+            # Additive increase: about +1 slot per window of successful requests
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+
+    def on_rate_limit(self, headers: Mapping[str, str] | None) -> float | None:
+        """
+        Back off after a 429. Returns the server-requested wait, if any.
+        """
+        retry_after = retry_after_seconds(headers)
+        with self._lock:
+            now = time.monotonic()
+            self.stats["rate_limited"] += 1
+            self._sync_buckets(headers)
+            if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                self.concurrency = max(self.min_concurrency, self.concurrency * DECREASE_FACTOR)
+                self._last_decrease = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+        return retry_after
+
+    def _sync_buckets(self, headers: Mapping[str, str] | None) -> None:
+        if not headers:
+            return
+        now = time.monotonic()
+        for kind, variants in _HEADER_NAMES.items():
+            for limit_name, remaining_name, reset_name in variants:
+                limit, remaining = headers.get(limit_name), headers.get(remaining_name)
+                if limit is None or remaining is None:
+                    continue
+                try:
+                    limit, remaining = float(limit), float(remaining)
+                except ValueError:
+                    continue
+                if limit <= 0:
+                    continue
+                bucket = self.buckets.get(kind)
+                if bucket is None:
+                    bucket = self.buckets[kind] = _TokenBucket(limit)
+                bucket.sync(limit, remaining, parse_reset(headers.get(reset_name)), now)
+                break
+
+    def _retry_delay(self, error: BaseException, trial: int) -> float:
+        if _is_rate_limit(error):
+            retry_after = self.on_rate_limit(_error_headers(error))
+            if retry_after is not None:
+                return retry_after
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, 2**trial))
+
+    def call(
+        self,
+        send: Callable[[], tuple[Any, Mapping[str, str]]],
+        tokens: int = 0,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        give_up_on: tuple[type[BaseException], ...] = (),
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+    ) -> Any:
+        """
+        Run send() under the limiter, retrying up to max_retries times.
+        send returns (result, response headers).
+        """
+        for trial in range(max_retries + 1):
+            self.acquire(tokens)
+            try:
+                result, headers = send()
+            except give_up_on:
+                raise
+            except retry_on as e:
+                delay = self._retry_delay(e, trial)
+                if trial == max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                print(f"[{self.name}] {_describe(e)}; retry {trial + 1}/{max_retries} in {delay:.1f}s")
+            else:
+                self.on_success(headers)
+                return result
+            finally:
+                self.release()
+            time.sleep(delay)
+
+    async def acall(
+        self,
+        send: Callable[[], Awaitable[tuple[Any, Mapping[str, str]]]],
+        tokens: int = 0,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        give_up_on: tuple[type[BaseException], ...] = (),
+        retry_on: tuple[type[BaseException], ...] = (Exception,),
+    ) -> Any:
+        """
+        Async call(): send is a coroutine function returning (result, response headers).
+        """
+        for trial in range(max_retries + 1):
+            await self.acquire_async(tokens)
+            try:
+                result, headers = await send()
+            except give_up_on:
+                raise
+            except retry_on as e:
+                delay = self._retry_delay(e, trial)
+                if trial == max_retries:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                print(f"[{self.name}] {_describe(e)}; retry {trial + 1}/{max_retries} in {delay:.1f}s")
+            else:
+                self.on_success(headers)
+                return result
+            finally:
+                self.release()
+            await asyncio.sleep(delay)
+
+
+_limiters: dict[tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: str) -> AdaptiveRateLimiter:
+    """
+    Process-wide limiter shared by every sampler calling `model` at `provider`
+    """
+    with _limiters_lock:
+        key = (provider, model)
+        if key not in _limiters:
+            _limiters[key] = AdaptiveRateLimiter(f"{provider}/{model}")
+        return _limiters[key]
@@ -0,0 +1,107 @@
+import sys
+import os
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sampler.rate_limiter as rate_limiter
+from sampler.rate_limiter import (
+    AdaptiveRateLimiter,
+    parse_reset,
+    retry_after_seconds,
+)
+
+
+@contextmanager
+def no_backoff():
+    backoff, rate_limiter.MAX_BACKOFF_SECONDS = rate_limiter.MAX_BACKOFF_SECONDS, 0.0
+    try:
+        yield
+    finally:
+        rate_limiter.MAX_BACKOFF_SECONDS = backoff
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FakeBadRequest(FakeAPIError):
+    def __init__(self):
+        super().__init__(400)
+
+
+def test_parse_rate_limit_headers():
+    assert parse_reset("6m0s") == 360
+    assert parse_reset("20ms") == 0.02
+    assert parse_reset("1.5") == 1.5
+    assert parse_reset(None) is None
+    assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({"retry-after": "3"}) == 3
+    assert retry_after_seconds({}) is None
+    print("test_parse_rate_limit_headers passed")
+
+
+def test_call_backs_off_on_429_and_gives_up_on_bad_request():
+    limiter = AdaptiveRateLimiter("test/model", initial_concurrency=8)
+    outcomes = [
+        FakeAPIError(429, {"retry-after-ms": "1"}),
+        FakeAPIError(529),
+        ("ok", {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "99"}),
+    ]
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with no_backoff():
+        assert limiter.call(send, max_retries=3) == "ok"
+    assert limiter.stats == {"requests": 3, "rate_limited": 1, "retries": 2, "failures": 0}
+    assert limiter.concurrency < 8  # halved on the 429, then +1/concurrency
+    assert limiter.buckets["requests"].capacity == 100
+    assert limiter.in_flight == 0
+
+    def bad_request():
+        raise FakeBadRequest()
+
+    try:
+        limiter.call(bad_request, give_up_on=(FakeBadRequest,))
+        assert False, "BadRequest was retried"
+    except FakeBadRequest:
+        pass
+    assert limiter.stats["requests"] == 4 and limiter.stats["retries"] == 2
+    print("test_call_backs_off_on_429_and_gives_up_on_bad_request passed")
+
+
+def test_concurrent_stats_are_exact():
+    limiter = AdaptiveRateLimiter("test/model", initial_concurrency=4)
+
+    async def send():
+        await asyncio.sleep(0)
+        raise FakeAPIError(500)
+
+    async def run_all():
+        async def one():
+            try:
+                await limiter.acall(send, max_retries=1)
+            except FakeAPIError:
+                pass
+
+        await asyncio.gather(*(one() for _ in range(20)))
+
+    with no_backoff():
+        asyncio.run(run_all())
+    assert limiter.stats == {"requests": 40, "rate_limited": 0, "retries": 20, "failures": 20}
+    assert limiter.in_flight == 0
+    print("test_concurrent_stats_are_exact passed")
+
+
+if __name__ == "__main__":
+    test_parse_rate_limit_headers()
+    test_call_backs_off_on_429_and_gives_up_on_bad_request()
+    test_concurrent_stats_are_exact()
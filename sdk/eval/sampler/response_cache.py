@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eval_types import MessageList, SamplerBase, SamplerResponse
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "EVAL_RESPONSE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "simple-evals", "responses.sqlite")
+)
+DEFAULT_MAX_BYTES = int(os.getenv("EVAL_RESPONSE_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# Evict down to this fraction of the cap, so eviction runs in batches
+EVICT_TO_FRACTION = 0.9
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache of sampler responses in SQLite.
+
+    Entries are keyed by a hash of (sampler, model and sampling params,
+    messages) and evicted least-recently-used once the stored size exceeds
+    max_bytes. Safe to share between threads and samplers.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self.total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(sampler_name: str, params: dict[str, Any], message_list: MessageList) -> str:
+        payload = json.dumps(
+            {"sampler": sampler_name, "params": params, "messages": message_list},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> SamplerResponse | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self.stats["hits"] += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, response: SamplerResponse) -> None:
+        value = pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self.total_bytes += len(value) - (previous[0] if previous else 0)
+            self.stats["writes"] += 1
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.total_bytes -= row[0]
+
+    def _evict(self) -> None:
+        target = self.max_bytes * EVICT_TO_FRACTION
+        while self.total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+            self.total_bytes -= sum(size for _, size in rows)
+            self.stats["evictions"] += len(rows)
+
+    def summary(self) -> dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else None,
+            "size_mb": round(self.total_bytes / (1024 * 1024), 2),
+            "path": self.path,
+        }
+
+
+def _sampler_params(sampler: SamplerBase) -> dict[str, Any]:
+    """
+    Scalar settings that change what a sampler returns (model, temperature,
+    max tokens, system message, ...). Clients and credentials are skipped.
+    """
+    return {
+        name: value
+        for name, value in sorted(vars(sampler).items())
+        if isinstance(value, (str, int, float, bool, type(None)))
+        and not name.startswith("_")
+        and "key" not in name
+    }
+
+
+def _mark_hit(response: SamplerResponse) -> SamplerResponse:
+    # Freshly unpickled, so safe to mark for usage and latency accounting
+    response.response_metadata["response_cache_hit"] = True
+    return response
+
+
+class CachedSampler(SamplerBase):
+    """
+    Read-through / write-through cache around any sampler.
+
+    With deterministic_only (the default) only temperature-0 samplers are
+    cached, so repeated sampling of a stochastic model is unaffected.
+    """
+
+    def __init__(
+        self,
+        sampler: SamplerBase,
+        cache: ResponseCache,
+        deterministic_only: bool = True,
+    ):
+        self.sampler = sampler
+        self.cache = cache
+        self.enabled = not deterministic_only or getattr(sampler, "temperature", None) == 0
+        self._name = type(sampler).__name__
+        self._params = _sampler_params(sampler)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not set on the wrapper itself
+        return getattr(self.__dict__["sampler"], name)
+
+    def _key(self, message_list: MessageList) -> str | None:
+        if not self.enabled:
+            return None
+        return ResponseCache.make_key(self._name, self._params, message_list)
+
+    def _store(self, key: str | None, response: SamplerResponse) -> None:
+        if key is not None and response.response_text:
+            self.cache.put(key, response)
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        key = self._key(message_list)
+        if key is not None and (cached := self.cache.get(key)) is not None:
+            return _mark_hit(cached)
+        response = self.sampler(message_list)
+        self._store(key, response)
+        return response
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        key = self._key(message_list)
+        if key is not None and (cached := self.cache.get(key)) is not None:
+            return _mark_hit(cached)
+        response = await self.sampler.acall(message_list)
+        self._store(key, response)
+        return response
+
+    def discard(self, message_list: MessageList) -> None:
+        key = self._key(message_list)
+        if key is not None:
+            self.cache.delete(key)
+        discard_cached(self.sampler, message_list)
+
+
+def discard_cached(sampler: SamplerBase, message_list: MessageList) -> None:
+    """
+    Drop a cached response the caller rejected (e.g. unparseable grader JSON),
+    so that retrying the same messages reaches the model again. Also works
+    through wrappers that delegate attributes to a CachedSampler.
+    """
+    discard = getattr(sampler, "discard", None)
+    if discard is not None:
+        discard(message_list)
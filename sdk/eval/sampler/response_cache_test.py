@@ -0,0 +1,83 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eval_types import SamplerBase, SamplerResponse
+from sampler.response_cache import CachedSampler, ResponseCache, discard_cached
+
+
+class CountingSampler(SamplerBase):
+    def __init__(self, model: str, temperature: float = 0.0, api_key: str = "secret"):
+        self.model = model
+        self.temperature = temperature
+        self.api_key = api_key
+        self.calls = 0
+
+    def __call__(self, message_list):
+        self.calls += 1
+        return SamplerResponse(
+            response_text=f"{self.model} answer {self.calls}",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
+
+class DelegatingWrapper(SamplerBase):
+    """Stands in for wrappers such as GraderUsageTracker that forward attributes"""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["sampler"], name)
+
+    def __call__(self, message_list):
+        return self.sampler(message_list)
+
+
+MESSAGES = [dict(role="user", content="hello")]
+
+
+def test_cache_key_covers_sampling_params_only():
+    key = CachedSampler(CountingSampler("m"), cache=None)._key(MESSAGES)
+    assert key == CachedSampler(CountingSampler("m", api_key="other"), cache=None)._key(MESSAGES)
+    assert key != CachedSampler(CountingSampler("other-model"), cache=None)._key(MESSAGES)
+    assert key != CachedSampler(CountingSampler("m"), cache=None)._key([dict(role="user", content="bye")])
+    sampled = CountingSampler("m", temperature=0.5)
+    assert key != CachedSampler(sampled, cache=None, deterministic_only=False)._key(MESSAGES)
+    print("test_cache_key_covers_sampling_params_only passed")
+
+
+def test_deterministic_only_and_discard():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResponseCache(os.path.join(directory, "responses.sqlite"))
+
+        sampled = CountingSampler("m", temperature=0.5)
+        cached_sampled = CachedSampler(sampled, cache)
+        cached_sampled(MESSAGES)
+        cached_sampled(MESSAGES)
+        assert sampled.calls == 2 and cache.stats["writes"] == 0
+
+        inner = CountingSampler("m")
+        sampler = DelegatingWrapper(CachedSampler(inner, cache))
+        first = sampler(MESSAGES)
+        hit = sampler(MESSAGES)
+        assert inner.calls == 1
+        assert hit.response_text == first.response_text
+        assert hit.response_metadata["response_cache_hit"]
+
+        # A rejected response is dropped through the wrapper and fetched again
+        discard_cached(sampler, MESSAGES)
+        assert sampler(MESSAGES).response_text == "m answer 2"
+
+        # Entries persist across cache instances
+        reopened = CachedSampler(CountingSampler("m"), ResponseCache(cache.path))
+        assert reopened(MESSAGES).response_text == "m answer 2"
+        assert reopened.sampler.calls == 0
+    print("test_deterministic_only_and_discard passed")
+
+
+if __name__ == "__main__":
+    test_cache_key_covers_sampling_params_only()
+    test_deterministic_only_and_discard()
@@ -1,5 +1,4 @@
 import os
-import time
 from typing import Any
 
 import sys
@@ -10,6 +9,8 @@ import openai
 from openai import OpenAI
 
 from eval_types import MessageList, SamplerBase, SamplerResponse
+from sampler.chat_completion_sampler import get_async_openai_client
+from sampler.rate_limiter import estimate_tokens, get_rate_limiter
 
 
 class ResponsesSampler(SamplerBase):
@@ -28,8 +29,9 @@ class ResponsesSampler(SamplerBase):
     ):
         self.api_key_name = "OPENAI_API_KEY"
         assert os.environ.get("OPENAI_API_KEY"), "Please set OPENAI_API_KEY"
-        self.client = OpenAI()
+        self.client = OpenAI(max_retries=0)
         self.model = model
+        self.rate_limiter = get_rate_limiter("openai", model)
         self.system_message = system_message
         self.temperature = temperature
         self.max_tokens = max_tokens
@@ -56,50 +58,79 @@ class ResponsesSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any) -> dict[str, Any]:
         return {"role": role, "content": content}
 
-    def __call__(self, message_list: MessageList) -> SamplerResponse:
+    def _prepare_messages(self, message_list: MessageList) -> MessageList:
         if self.system_message:
             message_list = [
                 self._pack_message("developer", self.system_message)
             ] + message_list
-        trial = 0
-        while True:
-            try:
-                if self.reasoning_model:
-                    reasoning = (
-                        {"effort": self.reasoning_effort}
-                        if self.reasoning_effort
-                        else None
-                    )
-                    response = self.client.responses.create(
-                        model=self.model,
-                        input=message_list,
-                        reasoning=reasoning,
-                    )
-                else:
-                    response = self.client.responses.create(
-                        model=self.model,
-                        input=message_list,
-                        temperature=self.temperature,
-                        max_output_tokens=self.max_tokens,
-                    )
-                return SamplerResponse(
-                    response_text=response.output_text,
-                    response_metadata={"usage": response.usage},
-                    actual_queried_message_list=message_list,
-                )
-            except openai.BadRequestError as e:
-                print("Bad Request Error", e)
-                return SamplerResponse(
-                    response_text="",
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
-                )
-            except Exception as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
-                )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+        return message_list
+
+    def _create_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        if self.reasoning_model:
+            reasoning = (
+                {"effort": self.reasoning_effort}
+                if self.reasoning_effort
+                else None
+            )
+            return dict(
+                model=self.model,
+                input=message_list,
+                reasoning=reasoning,
+            )
+        return dict(
+            model=self.model,
+            input=message_list,
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens,
+        )
+
+    def _to_sampler_response(self, response, message_list: MessageList) -> SamplerResponse:
+        return SamplerResponse(
+            response_text=response.output_text,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=message_list,
+        )
+
+    def _bad_request_response(self, message_list: MessageList) -> SamplerResponse:
+        return SamplerResponse(
+            response_text="",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._prepare_messages(message_list)
+        kwargs = self._create_kwargs(message_list)
+
+        def send():
+            raw = self.client.responses.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return self.rate_limiter.call(
+                send,
+                tokens=estimate_tokens(message_list, self.max_tokens),
+                give_up_on=(openai.BadRequestError,),
+            )
+        # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._prepare_messages(message_list)
+        kwargs = self._create_kwargs(message_list)
+
+        async def send():
+            raw = await get_async_openai_client().responses.with_raw_response.create(**kwargs)
+            return self._to_sampler_response(raw.parse(), message_list), raw.headers
+
+        try:
+            return await self.rate_limiter.acall(
+                send,
+                tokens=estimate_tokens(message_list, self.max_tokens),
+                give_up_on=(openai.BadRequestError,),
+            )
+        except openai.BadRequestError as e:
+            print("Bad Request Error", e)
+            return self._bad_request_response(message_list)
@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import json
 import subprocess
 from datetime import datetime
@@ -27,6 +28,13 @@ from sampler.chat_completion_sampler import (
 from sampler.claude_sampler import ClaudeCompletionSampler, CLAUDE_SYSTEM_MESSAGE_LMSYS
 from sampler.o_chat_completion_sampler import OChatCompletionSampler
 from sampler.responses_sampler import ResponsesSampler
+from sampler.batch_sampler import (
+    BatchSampler,
+    BatchStore,
+    OpenAIBatchClient,
+    run_in_batches,
+)
+from sampler.response_cache import CachedSampler, ResponseCache
 from simpleqa_eval import SimpleQAEval
 
 
@@ -60,11 +68,85 @@ def main():
         help="Number of threads to run. Only supported for HealthBench and HealthBenchMeta.",
     )
     parser.add_argument("--debug", action="store_true", help="Run in debug mode")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run evals on one event loop with async samplers instead of threads.",
+    )
+    parser.add_argument(
+        "--dataset-cache-dir",
+        type=str,
+        help="Directory of the shared dataset cache (default: $EVAL_DATASET_CACHE_DIR or ~/.cache/simple-evals/datasets).",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Load datasets from the dataset cache only, without network access.",
+    )
+    parser.add_argument(
+        "--batch-dir",
+        type=str,
+        help="Send requests through the OpenAI Batch API, keeping run state in this directory; rerun with the same directory to resume.",
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=60.0,
+        help="Seconds between batch status checks with --batch-dir.",
+    )
+    parser.add_argument(
+        "--grading-mode",
+        choices=["per_item", "batched"],
+        default="per_item",
+        help="HealthBench grading: one grader request per rubric item, or one per example.",
+    )
+    parser.add_argument(
+        "--compare-per-item",
+        action="store_true",
+        help="With --grading-mode batched, also grade the meta-eval per item and report agreement (doubles grader cost).",
+    )
+    parser.add_argument(
+        "--grader-prompt-layout",
+        choices=["default", "prefix_cached"],
+        default="default",
+        help="HealthBench grader prompt layout; prefix_cached puts the rubric item last so requests share a cached prefix.",
+    )
+    parser.add_argument(
+        "--bootstrap-ci",
+        action="store_true",
+        help="Also report 95%% bootstrap confidence intervals for HealthBench metrics.",
+    )
     parser.add_argument(
         "--examples", type=int, help="Number of examples to use (overrides default)"
     )
+    parser.add_argument(
+        "--response-cache",
+        type=str,
+        help=(
+            "SQLite file caching temperature-0 sampler and grader responses across runs. "
+            "Sampled (temperature > 0) responses are never cached unless --cache-sampled-graders is set."
+        ),
+    )
+    parser.add_argument(
+        "--cache-sampled-graders",
+        action="store_true",
+        help=(
+            "With --response-cache, also cache grader responses at temperature > 0. "
+            "Grades are then frozen across runs instead of resampled."
+        ),
+    )
+    parser.add_argument(
+        "--response-cache-max-mb",
+        type=int,
+        default=2048,
+        help="Size cap for --response-cache; least recently used responses are evicted.",
+    )
 
     args = parser.parse_args()
+    common.set_dataset_cache(
+        cache_dir=args.dataset_cache_dir, offline=True if args.offline else None
+    )
 
     models = {
         # Reasoning Models
@@ -263,6 +345,33 @@ def main():
     equality_checker = ChatCompletionSampler(model="gpt-4-turbo-preview")
     # ^^^ used for fuzzy matching, just for math
 
+    batch_store = None
+    if args.batch_dir:
+        if args.use_async:
+            print("Error: --batch-dir and --async can't be combined.")
+            return
+        batch_store = BatchStore(args.batch_dir)
+        grading_sampler = BatchSampler(grading_sampler, batch_store)
+        equality_checker = BatchSampler(equality_checker, batch_store)
+        models = {
+            model_name: BatchSampler(sampler, batch_store)
+            for model_name, sampler in models.items()
+        }
+
+    response_cache = None
+    if args.response_cache:
+        response_cache = ResponseCache(
+            args.response_cache, max_bytes=args.response_cache_max_mb * 1024 * 1024
+        )
+        # Sampled grades are only frozen across runs when asked for
+        deterministic_only = not args.cache_sampled_graders
+        grading_sampler = CachedSampler(grading_sampler, response_cache, deterministic_only=deterministic_only)
+        equality_checker = CachedSampler(equality_checker, response_cache, deterministic_only=deterministic_only)
+        models = {
+            model_name: CachedSampler(sampler, response_cache)
+            for model_name, sampler in models.items()
+        }
+
     def get_evals(eval_name, debug_mode):
         num_examples = (
             args.examples if args.examples is not None else (5 if debug_mode else None)
@@ -310,6 +419,9 @@ def main():
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
                     subset_name=None,
+                    grading_mode=args.grading_mode,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    confidence_intervals=args.bootstrap_ci,
                 )
             case "healthbench_hard":
                 return HealthBenchEval(
@@ -318,6 +430,9 @@ def main():
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
                     subset_name="hard",
+                    grading_mode=args.grading_mode,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    confidence_intervals=args.bootstrap_ci,
                 )
             case "healthbench_consensus":
                 return HealthBenchEval(
@@ -326,6 +441,9 @@ def main():
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
                     subset_name="consensus",
+                    grading_mode=args.grading_mode,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    confidence_intervals=args.bootstrap_ci,
                 )
             case "healthbench_meta":
                 return HealthBenchMetaEval(
@@ -333,6 +451,9 @@ def main():
                     num_examples=10 if debug_mode else num_examples,
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
+                    grading_mode=args.grading_mode,
+                    compare_per_item=args.compare_per_item,
+                    grader_prompt_layout=args.grader_prompt_layout,
                 )
             case _:
                 raise Exception(f"Unrecognized eval type: {eval_name}")
@@ -376,7 +497,17 @@ def main():
     date_str = now.strftime("%Y%m%d_%H%M%S")
     for model_name, sampler in models.items():
         for eval_name, eval_obj in evals.items():
-            result = eval_obj(sampler)
+            if args.use_async:
+                result = asyncio.run(eval_obj.acall(sampler))
+            elif batch_store is not None:
+                result = run_in_batches(
+                    lambda: eval_obj(sampler),
+                    batch_store,
+                    OpenAIBatchClient(),
+                    poll_interval=args.batch_poll_interval,
+                )
+            else:
+                result = eval_obj(sampler)
             # ^^^ how to use a sampler
             file_stem = f"{eval_name}_{model_name}"
             # file stem should also include the year, month, day, and time in hours and minutes
@@ -426,6 +557,8 @@ def main():
     )
     print("\nAll results: ")
     print(merge_metrics_df.to_markdown())
+    if response_cache is not None:
+        print(f"\nResponse cache: {response_cache.summary()}")
     return merge_metrics
 
 
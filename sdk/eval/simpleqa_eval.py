@@ -103,7 +103,9 @@ CHOICE_LETTER_TO_STRING = dict(zip(CHOICE_LETTERS, CHOICE_STRINGS))
 class SimpleQAEval(Eval):
     def __init__(self, grader_model: SamplerBase, num_examples: int | None = None, n_repeats: int = 1):
         df = pandas.read_csv(
-            "https://openaipublic.blob.core.windows.net/simple-evals/simple_qa_test_set.csv"
+            common.cached_dataset_path(
+                "https://openaipublic.blob.core.windows.net/simple-evals/simple_qa_test_set.csv"
+            )
         )
         examples = [row.to_dict() for _, row in df.iterrows()]
         if num_examples:
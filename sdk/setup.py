@@ -36,5 +36,9 @@ setup(
         "aiohttp>=3.8.0",
         "python-dotenv>=1.0.0",
     ],
+    extras_require={
+        # Vectorized batch costing and the repricing CLI (whispey.batch_pricing)
+        "batch": ["numpy"],
+    },
     keywords="voice analytics, AI agents, conversation intelligence, whispey"
 )
\ No newline at end of file
@@ -5,13 +5,34 @@ __version__ = "2.1.1"
 __author__ = "Whispey AI Voice Analytics"
 
 import re
+import json
+import hashlib
 import logging
 from typing import List, Optional, AsyncIterable, Any, Union, Dict
-from .whispey import observe_session, send_session_to_whispey, send_call_started_to_whispey
+from .whispey import observe_session, send_session_to_whispey, send_call_started_to_whispey, get_session_cost
+from .span_capture import (
+    SpanBuffer, CapturePolicy, DEFAULT_SPAN_BUFFER_SIZE, DEFAULT_EXPORT_QUEUE_SIZE,
+    install_tracer_provider, register_session, release_session, create_otlp_processor
+)
 import time
 
 logger = logging.getLogger("whispey-sdk")
 
+
+def _content_ref(prefix: str, value: Any) -> str:
+    """Short content hash used to intern prompt parts"""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return f"{prefix}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]}"
+
+
+def _intern_prompt_part(table: Dict[str, Any], prefix: str, value: Any) -> Optional[str]:
+    """Store value in table under its content hash and return the reference"""
+    if value is None:
+        return None
+    ref = _content_ref(prefix, value)
+    table.setdefault(ref, value)
+    return ref
+
 # Professional wrapper class
 class LivekitObserve:
     def __init__(
@@ -22,16 +43,31 @@ class LivekitObserve:
         bug_reports_enable=False,
         bug_reports_config: Dict[str, Any] = {},
         enable_otel: bool = True,
+        payload_budget_bytes: Optional[int] = None,
+        payload_mode: str = "full",
+        span_buffer_size: int = DEFAULT_SPAN_BUFFER_SIZE,
+        otel_endpoint: Optional[str] = None,
+        otel_headers: Optional[Dict[str, str]] = None,
+        otel_export_only: bool = False,
+        otel_export_queue_size: int = DEFAULT_EXPORT_QUEUE_SIZE,
+        capture_policy: Optional[CapturePolicy] = None,
     ):
         self.agent_id = agent_id
         self.apikey = apikey
         self.host_url = host_url
         self.enable_otel = enable_otel
-        self.spans_data = []  
-        self._current_turn_context = {
-            'turn_id': None,
-            'turn_sequence': 0
-        }
+        self.payload_budget_bytes = payload_budget_bytes
+        self.payload_mode = payload_mode
+        self.span_buffer_size = span_buffer_size
+        self.otel_endpoint = otel_endpoint
+        self.otel_headers = otel_headers
+        self.otel_export_only = otel_export_only
+        self.otel_export_queue_size = otel_export_queue_size
+        self.capture_policy = capture_policy
+        # OTLP batch processors by endpoint, shared by this instance's sessions
+        self._export_processors = {}
+        # Span buffers of the sessions started through this instance, by session ID
+        self._span_buffers: Dict[str, SpanBuffer] = {}
         
         if bug_reports_enable:
             self.enable_bug_reports = True
@@ -83,12 +119,18 @@ class LivekitObserve:
 
         self.bug_report_debug = config.get('debug', False)
 
-    def _update_turn_context(self, turn_id, sequence=None):
-        """Update the current turn context"""
-        self._current_turn_context = {
-            'turn_id': turn_id,
-            'turn_sequence': sequence or (self._current_turn_context.get('turn_sequence', 0) + 1)
-        }
+    @property
+    def spans_data(self):
+        """Captured spans of every live session on this instance"""
+        return [span for session_id in list(self._span_buffers) for span in self.get_session_spans(session_id)]
+
+    def _update_turn_context(self, turn_id, sequence=None, session_id=None):
+        """Update the turn context stamped on a session's spans"""
+        buffer = self._span_buffers.get(session_id)
+        if buffer is None and session_id is None and len(self._span_buffers) == 1:
+            buffer = next(iter(self._span_buffers.values()))
+        if buffer is not None:
+            buffer.set_turn(turn_id, sequence or (buffer.turn_sequence + 1))
 
     def _debug_log(self, message: str):
         """Debug logging for bug reports when enabled"""
@@ -96,213 +138,55 @@ class LivekitObserve:
             print(f"🐛 BUG DEBUG: {message}")
             logger.debug(f"BUG DEBUG: {message}")
 
-    def _setup_telemetry(self, session_id):
+    def _setup_telemetry(self, session_id, otel_endpoint=None):
+        """Install the process-wide tracer provider and open a span buffer for the session"""
         if not self.enable_otel:
             return None
-        
-        from opentelemetry.sdk.trace import TracerProvider, SpanProcessor
-        import time
-        import uuid
-        # Do NOT re-import logging or re-assign logger here; use the module-level logger
-        # to avoid 'cannot access local variable' scoping errors.
-        
-        tracer_provider = TracerProvider()
-
-        class WhispeySpanCollector(SpanProcessor):
-            """Custom span processor that only collects spans without exporting them"""
-            
-            def __init__(self, whispey_instance):
-                self.whispey = whispey_instance
-
-            def on_start(self, span, parent_context=None):
-                pass
-
-            def on_end(self, span):
-                # Enhanced request_id extraction
-                request_id = self._extract_request_id_comprehensive(span)
-                
-                duration_ns = (span.end_time - span.start_time) if span.start_time and span.end_time else 0
-                duration_ms = duration_ns / 1_000_000
-                
-                comprehensive_span_data = {
-                    'name': span.name,
-                    'start_time_ns': span.start_time,
-                    'end_time_ns': span.end_time, 
-                    'duration_ns': duration_ns,
-                    'duration_ms': duration_ms,
-                    'duration_seconds': duration_ms / 1000,
-                    
-                    'status': {
-                        'code': span.status.status_code.value if span.status else 0,
-                        'name': span.status.status_code.name if span.status else 'UNSET',
-                        'description': getattr(span.status, 'description', None) if span.status else None
-                    },
-                    
-                    'attributes': dict(span.attributes) if span.attributes else {},
-                    
-                    'events': [
-                        {
-                            'name': event.name,
-                            'timestamp': getattr(event, 'timestamp', None),
-                            'attributes': dict(event.attributes) if event.attributes else {}
-                        }
-                        for event in span.events
-                    ] if span.events else [],
-                    
-                    'context': {
-                        'trace_id': hex(span.get_span_context().trace_id) if hasattr(span, 'get_span_context') else None,
-                        'span_id': hex(span.get_span_context().span_id) if hasattr(span, 'get_span_context') else None,
-                        'trace_flags': int(span.get_span_context().trace_flags) if hasattr(span, 'get_span_context') and hasattr(span.get_span_context(), 'trace_flags') else None
-                    } if hasattr(span, 'get_span_context') else {},
-                    
-                    'parent_span_id': hex(span.parent.span_id) if span.parent and hasattr(span.parent, 'span_id') else None,
-                    'resource': dict(span.resource.attributes) if hasattr(span, 'resource') and span.resource and span.resource.attributes else {},
-                    
-                    'links': [
-                        {
-                            'context': {
-                                'trace_id': hex(link.context.trace_id) if hasattr(link.context, 'trace_id') else None,
-                                'span_id': hex(link.context.span_id) if hasattr(link.context, 'span_id') else None
-                            },
-                            'attributes': dict(link.attributes) if link.attributes else {}
-                        }
-                        for link in span.links
-                    ] if hasattr(span, 'links') and span.links else [],
-                    
-                    'instrumentation_scope': {
-                        'name': span.instrumentation_scope.name if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None,
-                        'version': getattr(span.instrumentation_scope, 'version', None) if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None,
-                        'schema_url': getattr(span.instrumentation_scope, 'schema_url', None) if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None
-                    },
-                    
-                    'kind': span.kind.name if hasattr(span, 'kind') and span.kind else 'INTERNAL',
-                    
-                    'exceptions': [
-                        {
-                            'type': event.attributes.get('exception.type'),
-                            'message': event.attributes.get('exception.message'),
-                            'stacktrace': event.attributes.get('exception.stacktrace'),
-                            'timestamp': getattr(event, 'timestamp', None)
-                        }
-                        for event in (span.events or [])
-                        if event.name == 'exception' and event.attributes
-                    ],
-                    
-                    'request_id': request_id,
-                    'request_id_source': self._get_request_id_source(span, request_id),
-                    'captured_at': time.time(),
-                    'sdk_version': '2.1.1',
-                    'conversation_turn_id': self._get_current_turn_id(),
-                    'turn_sequence': self._get_turn_sequence_number(),
-                }
-                
-                self.whispey.spans_data.append(comprehensive_span_data)
 
-            def shutdown(self):
-                pass
+        install_tracer_provider()
 
-            def force_flush(self, timeout_millis=30000):
-                return True
+        if session_id not in self._span_buffers:
+            endpoint = otel_endpoint or self.otel_endpoint
+            export_processor = None
+            if endpoint:
+                if endpoint not in self._export_processors:
+                    self._export_processors[endpoint] = create_otlp_processor(
+                        endpoint, self.otel_headers, self.otel_export_queue_size
+                    )
+                export_processor = self._export_processors[endpoint]
 
-            def _get_current_turn_id(self):
-                if hasattr(self.whispey, '_current_turn_context'):
-                    return self.whispey._current_turn_context.get('turn_id')
-                return 'unknown_turn'
+            self._span_buffers[session_id] = SpanBuffer(
+                self.span_buffer_size,
+                export_processor=export_processor,
+                embed=not (export_processor and self.otel_export_only),
+                policy=self.capture_policy
+            )
+        register_session(session_id, self._span_buffers[session_id])
 
-            def _get_turn_sequence_number(self):
-                if hasattr(self.whispey, '_current_turn_context'):
-                    return self.whispey._current_turn_context.get('turn_sequence', 0)
-                return 0
+    def _release_session(self, session_id):
+        """Stop collecting spans for a session and free its buffer"""
+        release_session(session_id)
+        self._span_buffers.pop(session_id, None)
 
-            def _extract_request_id_comprehensive(self, span):
-                span_attrs = span.attributes or {}
-                
-                # Method 1: Direct request_id attributes
-                direct_keys = ['request_id', 'lk.request_id', 'gen_ai.request.id', 'gen_ai.request_id']
-                for key in direct_keys:
-                    if span_attrs.get(key):
-                        return str(span_attrs[key])
-                
-                # Method 2: Extract from nested JSON in attributes
-                json_keys = ['lk.llm_metrics', 'lk.tts_metrics', 'lk.stt_metrics']
-                for key in json_keys:
-                    if key in span_attrs:
-                        try:
-                            import json
-                            metrics_data = json.loads(str(span_attrs[key]))
-                            if isinstance(metrics_data, dict) and metrics_data.get('request_id'):
-                                return str(metrics_data['request_id'])
-                        except:
-                            continue
-                
-                # Method 3: Extract from events
-                events = span.events or []
-                for event in events:
-                    event_attrs = event.attributes or {}
-                    for key in direct_keys:
-                        if event_attrs.get(key):
-                            return str(event_attrs[key])
-                
-                # Method 4: Generate deterministic ID from span characteristics
-                span_name = span.name or 'unknown'
-                start_time = span.start_time or 0
-                
-                if span_name and start_time:
-                    import hashlib
-                    context = span.get_span_context() if hasattr(span, 'get_span_context') else None
-                    span_id = hex(context.span_id) if context else str(start_time)
-                    content = f"{span_name}_{start_time}_{span_id}"
-                    synthetic_id = hashlib.md5(content.encode()).hexdigest()[:16]
-                    return synthetic_id
-                
-                return None
+    def get_session_spans(self, session_id):
+        """Captured spans for one session, converting any still queued"""
+        buffer = self._span_buffers.get(session_id)
+        return buffer.drain() if buffer else []
 
-            def _get_request_id_source(self, span, request_id):
-                if not request_id:
-                    return 'none'
-                
-                span_attrs = span.attributes or {}
-                direct_keys = ['request_id', 'lk.request_id', 'gen_ai.request.id', 'gen_ai.request_id']
-                
-                if any(span_attrs.get(key) for key in direct_keys):
-                    return 'direct_attribute'
-                
-                json_keys = ['lk.llm_metrics', 'lk.tts_metrics', 'lk.stt_metrics']
-                for key in json_keys:
-                    if key in span_attrs:
-                        try:
-                            import json
-                            metrics_data = json.loads(str(span_attrs[key]))
-                            if isinstance(metrics_data, dict) and metrics_data.get('request_id'):
-                                return 'nested_json'
-                        except:
-                            continue
-                
-                events = span.events or []
-                for event in events:
-                    event_attrs = event.attributes or {}
-                    if any(event_attrs.get(key) for key in direct_keys):
-                        return 'event_attribute'
-                
-                return 'synthetic'
-        
-        tracer_provider.add_span_processor(WhispeySpanCollector(self))
+    def get_session_capture_summary(self, session_id):
+        """Shared span tables and capture counters, or None without a capture policy"""
+        buffer = self._span_buffers.get(session_id)
+        if not buffer or buffer.policy is None:
+            return None
+        return buffer.capture_summary()
 
-        from livekit.agents.telemetry import set_tracer_provider
-        try:
-            set_tracer_provider(tracer_provider, metadata={'session_id': session_id})
-        except TypeError:
-            # Fallback for older versions that don't support metadata
-            set_tracer_provider(tracer_provider)
+    def get_session_cost(self, session_id):
+        """Running cost and usage for a session, updated on every metrics event"""
+        return get_session_cost(session_id)
 
     
     def start_session(self, session, room=None, **kwargs):
-        """Start session with earlier telemetry setup"""
-        # Setup telemetry BEFORE observe_session if enabled
-        temp_session_id = f"temp_{int(time.time())}"
-        if self.enable_otel:
-            self._setup_telemetry(temp_session_id)
-        
+        """Start session with telemetry routed to this session's span buffer"""
         # Add call_ended_reason to kwargs if not already provided (default to "completed")
         if 'call_ended_reason' not in kwargs:
             kwargs['call_ended_reason'] = 'completed'
@@ -319,14 +203,13 @@ class LivekitObserve:
             host_url=self.host_url, 
             bug_detector=bug_detector,
             enable_otel=self.enable_otel,
+            otel_endpoint=self.otel_endpoint,
             telemetry_instance=self,
+            payload_budget_bytes=self.payload_budget_bytes,
+            payload_mode=self.payload_mode,
             **kwargs
         )
         
-        # Re-setup telemetry with actual session_id if different
-        if self.enable_otel and session_id != temp_session_id:
-            self._setup_telemetry(session_id)
-        
         # Only setup prompt capture and bug reports if session is provided
         if session is not None:
             self._setup_prompt_capture(session, session_id)
@@ -375,39 +258,46 @@ class LivekitObserve:
             session_info = _session_data_store[session_id]
             session_data = session_info.get('session_data', {})
             
-            conversation_history = []
+            # Messages, instructions and tool lists are stored once per session;
+            # each capture only records what changed since the previous one.
+            prompt_context = session_data.setdefault('prompt_context', {
+                'messages': {},
+                'instructions': {},
+                'tools': {},
+                'captures': []
+            })
+            known_messages = prompt_context['messages']
 
+            chat_items = []
+            item_source = None
             if hasattr(chat_ctx, 'messages'):
                 # messages may be a regular method (needs calling) or a property (returns a list directly)
                 _messages_attr = chat_ctx.messages
-                _messages_list = _messages_attr() if callable(_messages_attr) else _messages_attr
-                if _messages_list:
-                    for msg in _messages_list:
-                        conversation_history.append({
-                            'role': str(msg.role),
-                            'content': str(msg.content) if msg.content else None,
-                            'id': getattr(msg, 'id', None),
-                            'name': getattr(msg, 'name', None),
-                            'timestamp': getattr(msg, 'timestamp', None)
-                        })
+                chat_items = (_messages_attr() if callable(_messages_attr) else _messages_attr) or []
+                item_source = 'messages'
             
             # Method 2: Try items if messages doesn't exist
             elif hasattr(chat_ctx, 'items') and chat_ctx.items:
-                for item in chat_ctx.items:
-                    conversation_history.append({
-                        'role': str(item.role) if hasattr(item, 'role') else 'unknown',
-                        'content': str(item.content) if hasattr(item, 'content') and item.content else str(item.text_content) if hasattr(item, 'text_content') else None,
-                        'id': getattr(item, 'id', None)
-                    })
+                chat_items = chat_ctx.items
+                item_source = 'items'
             
             # Method 3: Try to access via _items or other internal attributes
             elif hasattr(chat_ctx, '_items') and chat_ctx._items:
-                for item in chat_ctx._items:
-                    conversation_history.append({
-                        'role': str(getattr(item, 'role', 'unknown')),
-                        'content': str(getattr(item, 'content', None) or getattr(item, 'text_content', None) or ''),
-                        'id': getattr(item, 'id', None)
-                    })
+                chat_items = chat_ctx._items
+                item_source = '_items'
+
+            message_ids = []
+            for item in chat_items:
+                message_id = getattr(item, 'id', None)
+                if message_id and message_id in known_messages:
+                    message_ids.append(message_id)
+                    continue
+
+                message = self._prompt_message_entry(item, item_source)
+                if not message_id:
+                    message_id = _content_ref('msg', message)
+                known_messages.setdefault(message_id, message)
+                message_ids.append(message_id)
             
             # Get system instructions from agent
             system_instructions = getattr(agent, 'instructions', None) or getattr(agent, '_instructions', None)
@@ -461,21 +351,26 @@ class LivekitObserve:
                     'tool_type': type(tool).__name__
                 })
             
-            # Store prompt data
+            # Store prompt data as a delta against the previous capture
+            captures = prompt_context['captures']
             prompt_data = {
-                'system_instructions': system_instructions,
-                'conversation_history': conversation_history,
-                'available_tools': available_tools,
+                'instructions_ref': _intern_prompt_part(prompt_context['instructions'], 'ins', system_instructions),
+                'tools_ref': _intern_prompt_part(prompt_context['tools'], 'tools', available_tools),
                 'timestamp': time.time(),
-                'context_length': len(conversation_history),
+                'context_length': len(message_ids),
                 'tools_count': len(available_tools)
             }
-            
-            # Add to session data
-            if 'prompt_captures' not in session_data:
-                session_data['prompt_captures'] = []
-            
-            session_data['prompt_captures'].append(prompt_data)
+
+            previous_ids = session_data.get('_prompt_message_ids') or []
+            if captures and message_ids[:len(previous_ids)] == previous_ids:
+                prompt_data['base_capture'] = len(captures) - 1
+                prompt_data['appended_message_ids'] = message_ids[len(previous_ids):]
+            else:
+                # Context was truncated or rewritten - record the full ID list
+                prompt_data['message_ids'] = message_ids
+            session_data['_prompt_message_ids'] = message_ids
+
+            captures.append(prompt_data)
             
 
             
@@ -484,6 +379,28 @@ class LivekitObserve:
             import traceback
             traceback.print_exc()
 
+    def _prompt_message_entry(self, item, item_source):
+        """Build the stored representation of one chat context item"""
+        if item_source == 'messages':
+            return {
+                'role': str(item.role),
+                'content': str(item.content) if item.content else None,
+                'id': getattr(item, 'id', None),
+                'name': getattr(item, 'name', None),
+                'timestamp': getattr(item, 'timestamp', None)
+            }
+        if item_source == 'items':
+            return {
+                'role': str(item.role) if hasattr(item, 'role') else 'unknown',
+                'content': str(item.content) if hasattr(item, 'content') and item.content else str(item.text_content) if hasattr(item, 'text_content') else None,
+                'id': getattr(item, 'id', None)
+            }
+        return {
+            'role': str(getattr(item, 'role', 'unknown')),
+            'content': str(getattr(item, 'content', None) or getattr(item, 'text_content', None) or ''),
+            'id': getattr(item, 'id', None)
+        }
+
     def _convert_to_regex(self, patterns: List[str]) -> List[str]:
         """Convert simple strings to regex patterns with Hindi support and case-insensitive English"""
         regex_patterns = []
@@ -816,8 +733,9 @@ class LivekitObserve:
         
         # Add telemetry spans to the export if available
         extra_data = {}
-        if hasattr(self, 'spans_data') and self.spans_data:
-            extra_data['telemetry_spans'] = self.spans_data
+        spans = self.get_session_spans(session_id)
+        if spans:
+            extra_data['telemetry_spans'] = spans
         
         return await send_session_to_whispey(
             session_id, 
@@ -826,4 +744,4 @@ class LivekitObserve:
             api_url=self.host_url,
         )
 
-__all__ = ['LivekitObserve', 'observe_session', 'send_session_to_whispey', 'send_call_started_to_whispey']
\ No newline at end of file
+__all__ = ['LivekitObserve', 'CapturePolicy', 'observe_session', 'send_session_to_whispey', 'send_call_started_to_whispey']
\ No newline at end of file
@@ -0,0 +1,321 @@
+# sdk/whispey/batch_pricing.py
+"""
+Vectorized cost computation for whole sessions and backfills.
+
+Usage (reprice exported call logs after a price change):
+    python -m whispey.batch_pricing sessions.jsonl -o repriced.jsonl
+
+Requires numpy, installed with the ``batch`` extra: pip install 'Whispey[batch]'
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from whispey.pricing_calculator import ModelPricingCalculator, get_pricing_calculator
+
+logger = logging.getLogger("whispey-sdk")
+
+OPERATIONS = ('llm', 'tts', 'stt')
+
+# Turn metrics dict holding each operation's usage, as built by the transcript collector
+TURN_METRICS_KEYS = {'llm': 'llm_metrics', 'tts': 'tts_metrics', 'stt': 'stt_metrics'}
+
+
+def _import_numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("Batch costing requires numpy: pip install 'Whispey[batch]'") from e
+    return np
+
+
+def build_price_table(models: Sequence[str], calculator: Optional[ModelPricingCalculator] = None) -> Dict[str, Any]:
+    """
+    Resolve each distinct model once into per-unit rate arrays.
+
+    Rates follow the calculate_*_cost rules: a model whose pricing type does
+    not match the operation is charged the fallback rate for that operation.
+
+    Returns:
+        Dict with 'models', the 'pricing_version' used, one float array per
+        rate (per token, per char, per second) plus a boolean 'fallback'
+        array per operation
+    """
+    np = _import_numpy()
+    calculator = calculator or get_pricing_calculator()
+    # A single snapshot, so a reload mid-table can't mix price versions
+    snapshot = calculator.snapshot
+    fallback = snapshot.fallback_pricing
+
+    size = len(models)
+    table = {
+        'models': list(models),
+        'pricing_version': snapshot.version,
+        'llm_input': np.empty(size), 'llm_output': np.empty(size),
+        'tts_char': np.empty(size), 'stt_second': np.empty(size),
+        'llm_fallback': np.zeros(size, dtype=bool),
+        'tts_fallback': np.zeros(size, dtype=bool),
+        'stt_fallback': np.zeros(size, dtype=bool),
+    }
+
+    for i, model in enumerate(models):
+        info = calculator.get_model_info(model, snapshot) or {}
+        model_type = info.get('type')
+
+        llm = info if model_type == 'llm' else fallback['llm']
+        table['llm_input'][i] = llm['input_cost_per_1m'] / 1_000_000
+        table['llm_output'][i] = llm['output_cost_per_1m'] / 1_000_000
+        table['llm_fallback'][i] = model_type != 'llm'
+
+        tts = info if model_type == 'tts' else fallback['tts']
+        table['tts_char'][i] = tts['cost_per_1m_chars'] / 1_000_000
+        table['tts_fallback'][i] = model_type != 'tts'
+
+        stt = info if model_type == 'stt' else fallback['stt']
+        table['stt_second'][i] = stt['cost_per_hour'] / 3600
+        table['stt_fallback'][i] = model_type != 'stt'
+
+    return table
+
+
+def build_provider_rate_table(pairs: Sequence[Tuple[str, str]], calculator: Optional[ModelPricingCalculator] = None) -> Dict[str, Any]:
+    """
+    Resolve each distinct (provider, model) pair once into per-unit rate arrays.
+
+    Rates come from PricingSnapshot.provider_rate, the same lookup the metrics
+    handlers use for live turn costs, so unchanged prices reprice a session to
+    the costs it was recorded with.
+
+    Returns:
+        Same layout as build_price_table, with 'pairs' instead of 'models';
+        'fallback' marks pairs charged the operation's default rate
+    """
+    np = _import_numpy()
+    calculator = calculator or get_pricing_calculator()
+    snapshot = calculator.snapshot
+
+    size = len(pairs)
+    table = {
+        'pairs': list(pairs),
+        'pricing_version': snapshot.version,
+        'llm_input': np.empty(size), 'llm_output': np.empty(size),
+        'tts_char': np.empty(size), 'stt_second': np.empty(size),
+        'llm_fallback': np.zeros(size, dtype=bool),
+        'tts_fallback': np.zeros(size, dtype=bool),
+        'stt_fallback': np.zeros(size, dtype=bool),
+    }
+
+    for i, (provider, model) in enumerate(pairs):
+        llm = snapshot.provider_rate('llm', provider, model)
+        table['llm_input'][i] = llm['input']
+        table['llm_output'][i] = llm['output']
+        table['tts_char'][i] = snapshot.provider_rate('tts', provider, model)
+        table['stt_second'][i] = snapshot.provider_rate('stt', provider, model)
+        for operation in OPERATIONS:
+            listed = snapshot.provider_rates.get(operation, {}).get(provider, {}).get(model)
+            table[f'{operation}_fallback'][i] = listed is None
+
+    return table
+
+
+def _apply_rate_table(np, operations, index, table, prompt_tokens, completion_tokens, characters, audio_seconds) -> Dict[str, Any]:
+    """Cost rows whose rates are table entries ``index``"""
+    n = len(operations)
+
+    def column(values):
+        if values is None:
+            return np.zeros(n)
+        return np.nan_to_num(np.asarray(values, dtype=float))
+
+    ops = np.asarray(operations, dtype=object)
+    is_llm, is_tts, is_stt = ops == 'llm', ops == 'tts', ops == 'stt'
+
+    llm_cost = column(prompt_tokens) * table['llm_input'][index] + column(completion_tokens) * table['llm_output'][index]
+    tts_cost = column(characters) * table['tts_char'][index]
+    stt_cost = column(audio_seconds) * table['stt_second'][index]
+
+    cost = np.select([is_llm, is_tts, is_stt], [llm_cost, tts_cost, stt_cost], default=0.0)
+    fallback = np.select(
+        [is_llm, is_tts, is_stt],
+        [table['llm_fallback'][index], table['tts_fallback'][index], table['stt_fallback'][index]],
+        default=False
+    ).astype(bool)
+
+    return {'cost': cost, 'fallback': fallback, 'pricing_version': table['pricing_version']}
+
+
+def compute_costs_batch(
+    operations: Sequence[str],
+    models: Sequence[str],
+    prompt_tokens: Sequence[float] = None,
+    completion_tokens: Sequence[float] = None,
+    characters: Sequence[float] = None,
+    audio_seconds: Sequence[float] = None,
+    calculator: Optional[ModelPricingCalculator] = None,
+) -> Dict[str, Any]:
+    """
+    Cost a batch of usage rows in one NumPy pass.
+
+    Row i is priced as ``operations[i]`` ('llm', 'tts' or 'stt') on
+    ``models[i]``; usage columns that don't apply to a row are ignored.
+    Model names are resolved once per distinct name.
+
+    Returns:
+        Dict with 'cost' (float array, USD), 'fallback' (bool array, True
+        where fallback pricing was used) and 'pricing_version'
+    """
+    np = _import_numpy()
+    unique_models, model_index = np.unique(np.asarray([m or 'unknown' for m in models], dtype=object), return_inverse=True)
+    table = build_price_table(list(unique_models), calculator)
+    return _apply_rate_table(np, operations, model_index, table, prompt_tokens, completion_tokens, characters, audio_seconds)
+
+
+def compute_provider_costs_batch(
+    operations: Sequence[str],
+    providers: Sequence[str],
+    models: Sequence[str],
+    prompt_tokens: Sequence[float] = None,
+    completion_tokens: Sequence[float] = None,
+    characters: Sequence[float] = None,
+    audio_seconds: Sequence[float] = None,
+    calculator: Optional[ModelPricingCalculator] = None,
+) -> Dict[str, Any]:
+    """
+    Cost a batch of usage rows at the provider rates used for live turn costs.
+
+    Like compute_costs_batch, but row i is priced by
+    ``provider_rate(operations[i], providers[i], models[i])``, with each
+    distinct (provider, model) pair resolved once.
+    """
+    np = _import_numpy()
+    pair_ids: Dict[Tuple[str, str], int] = {}
+    pair_index = np.fromiter(
+        (pair_ids.setdefault((provider or 'unknown', model or 'unknown'), len(pair_ids)) for provider, model in zip(providers, models)),
+        dtype=np.intp, count=len(operations)
+    )
+    table = build_provider_rate_table(list(pair_ids), calculator)
+    return _apply_rate_table(np, operations, pair_index, table, prompt_tokens, completion_tokens, characters, audio_seconds)
+
+
+def _session_usage_rows(session: Dict[str, Any], session_index: int, rows: Dict[str, list]):
+    """Append one row per turn metrics dict in a call log"""
+    for turn_index, turn in enumerate(session.get('transcript_with_metrics') or []):
+        for operation, key in TURN_METRICS_KEYS.items():
+            metrics = turn.get(key)
+            if not metrics:
+                continue
+            rows['ref'].append((session_index, turn_index, key))
+            rows['operation'].append(operation)
+            rows['provider'].append(metrics.get('provider') or 'unknown')
+            rows['model'].append(metrics.get('model_used') or metrics.get('model_name') or 'unknown')
+            rows['prompt_tokens'].append(metrics.get('prompt_tokens') or 0)
+            rows['completion_tokens'].append(metrics.get('completion_tokens') or 0)
+            rows['characters'].append(metrics.get('characters_count') or 0)
+            rows['audio_seconds'].append(metrics.get('audio_duration') or 0)
+
+
+def reprice_sessions(sessions: List[Dict[str, Any]], calculator: Optional[ModelPricingCalculator] = None) -> Dict[str, Any]:
+    """
+    Recompute per-turn and per-session costs of exported call logs in place.
+
+    Costs use the provider rates the metrics handlers price live turns with,
+    so a session repriced against unchanged prices keeps its costs.
+    Each turn metrics dict gets a new ``calculated_cost`` and
+    ``pricing_version``, each turn's
+    ``trace_cost_usd`` becomes the sum of its metrics costs, and
+    ``metadata['repriced']`` records the session total and pricing version.
+
+    Returns:
+        Summary with row/session counts, total cost and fallback count
+    """
+    rows = {key: [] for key in ('ref', 'operation', 'provider', 'model', 'prompt_tokens', 'completion_tokens', 'characters', 'audio_seconds')}
+    for session_index, session in enumerate(sessions):
+        _session_usage_rows(session, session_index, rows)
+
+    if not rows['ref']:
+        return {'sessions': len(sessions), 'rows': 0, 'total_cost': 0.0, 'fallback_rows': 0}
+
+    result = compute_provider_costs_batch(
+        rows['operation'], rows['provider'], rows['model'],
+        rows['prompt_tokens'], rows['completion_tokens'], rows['characters'], rows['audio_seconds'],
+        calculator=calculator
+    )
+    costs = result['cost'].tolist()
+
+    turn_totals: Dict[Tuple[int, int], float] = {}
+    session_totals: Dict[int, float] = {}
+    for (session_index, turn_index, key), cost in zip(rows['ref'], costs):
+        metrics = sessions[session_index]['transcript_with_metrics'][turn_index][key]
+        metrics['calculated_cost'] = cost
+        metrics['pricing_version'] = result['pricing_version']
+        turn_totals[(session_index, turn_index)] = turn_totals.get((session_index, turn_index), 0.0) + cost
+        session_totals[session_index] = session_totals.get(session_index, 0.0) + cost
+
+    for (session_index, turn_index), total in turn_totals.items():
+        sessions[session_index]['transcript_with_metrics'][turn_index]['trace_cost_usd'] = total
+
+    repriced_at = time.time()
+    for session_index, total in session_totals.items():
+        metadata = sessions[session_index].setdefault('metadata', {})
+        metadata['repriced'] = {
+            'total_cost_usd': total,
+            'repriced_at': repriced_at,
+            'pricing_version': result['pricing_version']
+        }
+
+    return {
+        'sessions': len(sessions),
+        'rows': len(costs),
+        'total_cost': float(result['cost'].sum()),
+        'fallback_rows': int(result['fallback'].sum())
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprice exported Whispey call logs (JSONL, one session per line)")
+    parser.add_argument("input", help="Input JSONL file, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Sessions costed per vectorized pass")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    totals = {'sessions': 0, 'rows': 0, 'total_cost': 0.0, 'fallback_rows': 0}
+    started = time.time()
+
+    def flush(chunk):
+        summary = reprice_sessions(chunk)
+        for key in totals:
+            totals[key] += summary[key]
+        sink.writelines(json.dumps(session) + "\n" for session in chunk)
+
+    try:
+        chunk = []
+        for line in source:
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= args.chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.time() - started
+    print(
+        f"Repriced {totals['sessions']} sessions ({totals['rows']} usage rows, "
+        f"{totals['fallback_rows']} at fallback prices): ${totals['total_cost']:.4f} in {elapsed:.2f}s",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
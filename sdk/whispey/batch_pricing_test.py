@@ -0,0 +1,77 @@
+import math
+from types import SimpleNamespace
+
+from whispey.batch_pricing import compute_costs_batch, reprice_sessions
+from whispey.event_handlers import CorrectedTranscriptCollector
+from whispey.pricing_calculator import ModelPricingCalculator
+
+
+def recorded_session(calculator):
+    """A call log whose turn costs were computed the way the metrics handlers do"""
+    collector = CorrectedTranscriptCollector()
+    pricing = calculator.snapshot
+    usage = [
+        ('stt', 'sarvam', 'saarika:v2.5', SimpleNamespace(audio_duration=4.5)),
+        ('llm', 'openai', 'gpt-4.1-mini', SimpleNamespace(prompt_tokens=1200, completion_tokens=80)),
+        ('tts', 'elevenlabs', 'eleven_flash_v2_5', SimpleNamespace(characters_count=240)),
+        # Not in the provider rates, so charged the default TTS rate
+        ('tts', 'cartesia', 'sonic-2', SimpleNamespace(characters_count=50)),
+    ]
+    turns = [{}, {}]
+    for i, (operation, provider, model, metrics) in enumerate(usage):
+        calculate = getattr(collector, f'_calculate_{operation}_cost_with_provider')
+        turns[i // 3][f'{operation}_metrics'] = {
+            **vars(metrics),
+            'model_used': model,
+            'provider': provider,
+            'calculated_cost': calculate(metrics, model, provider, pricing),
+            'pricing_version': 'old-v1',
+        }
+    return {'transcript_with_metrics': turns}
+
+
+def test_reprice_with_unchanged_prices_keeps_costs():
+    calculator = ModelPricingCalculator()
+    session = recorded_session(calculator)
+    recorded = [
+        {key: metrics['calculated_cost'] for key, metrics in turn.items()}
+        for turn in session['transcript_with_metrics']
+    ]
+
+    summary = reprice_sessions([session], calculator)
+
+    assert summary['rows'] == 4
+    assert summary['fallback_rows'] == 1
+    for turn, costs in zip(session['transcript_with_metrics'], recorded):
+        for key, cost in costs.items():
+            assert turn[key]['calculated_cost'] == cost, key
+            assert turn[key]['pricing_version'] == calculator.pricing_version
+        assert turn['trace_cost_usd'] == sum(costs.values())
+    print("test_reprice_with_unchanged_prices_keeps_costs passed")
+
+
+def test_compute_costs_batch_matches_scalar_calculator():
+    calculator = ModelPricingCalculator()
+    result = compute_costs_batch(
+        ['llm', 'tts', 'stt', 'llm'],
+        ['gpt-4o-mini', 'tts-1', 'whisper-1', 'unknown-model'],
+        prompt_tokens=[1000, 0, 0, 500],
+        completion_tokens=[100, 0, 0, 50],
+        characters=[0, 300, 0, 0],
+        audio_seconds=[0, 0, 90, 0],
+        calculator=calculator,
+    )
+    expected = [
+        calculator.calculate_llm_cost('gpt-4o-mini', 1000, 100)[0],
+        calculator.calculate_tts_cost('tts-1', 300)[0],
+        calculator.calculate_stt_cost('whisper-1', 90)[0],
+        calculator.calculate_llm_cost('unknown-model', 500, 50)[0],
+    ]
+    assert all(math.isclose(cost, want) for cost, want in zip(result['cost'].tolist(), expected))
+    assert result['fallback'].tolist() == [False, False, False, True]
+    print("test_compute_costs_batch_matches_scalar_calculator passed")
+
+
+if __name__ == "__main__":
+    test_reprice_with_unchanged_prices_keeps_costs()
+    test_compute_costs_batch_matches_scalar_calculator()
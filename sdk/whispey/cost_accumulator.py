@@ -0,0 +1,79 @@
+# sdk/whispey/cost_accumulator.py
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Usage counters kept per (operation, provider, model) line
+USAGE_FIELDS = ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'characters', 'audio_seconds')
+
+
+class SessionCostAccumulator:
+    """
+    Running cost and usage totals for one session.
+
+    Each metrics event updates one (operation, provider, model) line and the
+    session totals in O(1), so the current spend can be read at any point in
+    the call (e.g. for budget checks) and exported without re-summing turns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lines: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._by_operation: Dict[str, float] = {}
+        self.total_cost_usd = 0.0
+        self.events = 0
+        self.pricing_versions = set()
+
+    def record(self, operation: str, provider: Optional[str], model: Optional[str], cost: Optional[float],
+               pricing_version: Optional[str] = None, **usage):
+        """
+        Add one metrics event.
+
+        Args:
+            operation: 'llm', 'tts' or 'stt'
+            provider: Provider name, 'unknown' when not detected
+            model: Model name, 'unknown' when not detected
+            cost: Cost of the event in USD
+            pricing_version: Version of the pricing snapshot the cost came from
+            **usage: Any of USAGE_FIELDS
+        """
+        cost = float(cost or 0.0)
+        key = (operation, provider or 'unknown', model or 'unknown')
+        with self._lock:
+            line = self._lines.get(key)
+            if line is None:
+                line = self._lines[key] = {'events': 0, 'cost_usd': 0.0, **{name: 0 for name in USAGE_FIELDS}}
+            line['events'] += 1
+            line['cost_usd'] += cost
+            for name, value in usage.items():
+                if name in line and value:
+                    line[name] += value
+            self._by_operation[operation] = self._by_operation.get(operation, 0.0) + cost
+            self.total_cost_usd += cost
+            self.events += 1
+            if pricing_version:
+                self.pricing_versions.add(pricing_version)
+
+    def cost_for(self, operation: str) -> float:
+        """Running cost of one operation type in USD"""
+        return self._by_operation.get(operation, 0.0)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, per-operation costs and one entry per provider/model/operation line"""
+        with self._lock:
+            lines = [
+                {
+                    'operation': operation,
+                    'provider': provider,
+                    'model': model,
+                    **{name: value for name, value in line.items() if name != 'cost_usd'},
+                    'cost_usd': round(line['cost_usd'], 6),
+                }
+                for (operation, provider, model), line in self._lines.items()
+            ]
+            return {
+                'total_cost_usd': round(self.total_cost_usd, 6),
+                'by_operation': {operation: round(cost, 6) for operation, cost in self._by_operation.items()},
+                'breakdown': lines,
+                'events': self.events,
+                'pricing_versions': sorted(self.pricing_versions),
+            }
@@ -0,0 +1,186 @@
+# sdk/whispey/critical_path.py
+import bisect
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger("whispey-sdk")
+
+# Root span LiveKit opens for each agent response
+TURN_SPAN_NAME = 'agent_turn'
+
+BREAKDOWN_CATEGORIES = ('eou', 'stt', 'llm', 'tool', 'tts', 'other')
+
+
+def latency_category(span_name: str) -> str:
+    """Bucket a span name into the categories latency is attributed to"""
+    name_lower = (span_name or '').lower()
+    if 'eou' in name_lower or 'end_of_turn' in name_lower or 'end_of_utterance' in name_lower:
+        return 'eou'
+    if 'function_tool' in name_lower or 'tool' in name_lower:
+        return 'tool'
+    if 'llm' in name_lower:
+        return 'llm'
+    if 'tts' in name_lower:
+        return 'tts'
+    if 'stt' in name_lower:
+        return 'stt'
+    return 'other'
+
+
+def _span_id(span: Dict[str, Any]) -> Optional[str]:
+    return (span.get('context') or {}).get('span_id')
+
+
+def _bounds(span: Dict[str, Any]) -> Tuple[int, int]:
+    return span.get('start_time_ns') or 0, span.get('end_time_ns') or 0
+
+
+def _build_children(spans: List[Dict[str, Any]]) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    """Children by parent span ID, each list sorted by end time, latest first"""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        children.setdefault(span.get('parent_span_id'), []).append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: _bounds(s)[1], reverse=True)
+    return children
+
+
+def _blocking_chain(node: Dict[str, Any], end_ns: int, children, segments: List[Tuple[Dict[str, Any], int, int]]):
+    """
+    Append the (span, start_ns, end_ns) segments of the chain that determined
+    when ``node`` finished, walking backwards from ``end_ns``.
+
+    At each step the child that finished last before the cursor is the one the
+    parent was waiting on; time not covered by such a child is the node's own.
+    """
+    start_ns = _bounds(node)[0]
+    cursor = end_ns
+    for child in children.get(_span_id(node), ()):
+        child_start, child_end = _bounds(child)
+        if child_start >= cursor:
+            continue
+        child_end = min(child_end, cursor)
+        if child_end <= start_ns:
+            # Siblings are sorted by end time, so none of the rest can block
+            break
+        if cursor > child_end:
+            segments.append((node, child_end, cursor))
+        _blocking_chain(child, child_end, children, segments)
+        cursor = max(child_start, start_ns)
+        if cursor <= start_ns:
+            break
+    if cursor > start_ns:
+        segments.append((node, start_ns, cursor))
+
+
+def _turn_roots(spans: List[Dict[str, Any]], children) -> List[Dict[str, Any]]:
+    """
+    agent_turn spans, or one virtual root per conversation turn when the tree
+    has none. EOU spans stay out of the virtual groups; they are prepended to
+    the turn they preceded instead.
+    """
+    roots = [span for span in spans if span.get('name') == TURN_SPAN_NAME]
+    if roots:
+        return roots
+
+    known_ids = {_span_id(span) for span in spans}
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for span in spans:
+        if span.get('parent_span_id') not in known_ids and latency_category(span.get('name')) != 'eou':
+            groups.setdefault(span.get('conversation_turn_id'), []).append(span)
+
+    virtual_roots = []
+    for turn_id, group in groups.items():
+        virtual_id = f"turn:{turn_id}"
+        children[virtual_id] = sorted(group, key=lambda s: _bounds(s)[1], reverse=True)
+        virtual_roots.append({
+            'name': 'turn',
+            'context': {'span_id': virtual_id},
+            'conversation_turn_id': turn_id,
+            'start_time_ns': min(_bounds(s)[0] for s in group),
+            'end_time_ns': max(_bounds(s)[1] for s in group),
+            'virtual': True,
+        })
+    return virtual_roots
+
+
+def analyze_critical_paths(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Per-turn critical path and latency breakdown over the span parent/child tree.
+
+    For each agent turn the blocking chain is computed under its root span, and
+    the end-of-utterance wait that preceded it (the latest EOU span starting
+    before the turn) is prepended. Runs in O(n log n) for n spans.
+
+    Args:
+        spans: Captured span dicts with context.span_id, parent_span_id and ns timestamps
+
+    Returns:
+        One entry per turn, in start order, with latency_ms, breakdown_ms by
+        category and the critical_path segments in chronological order
+    """
+    spans = [span for span in spans if span.get('start_time_ns') is not None and span.get('end_time_ns') is not None]
+    if not spans:
+        return []
+
+    children = _build_children(spans)
+
+    eou_spans = sorted(
+        (span for span in spans if latency_category(span.get('name')) == 'eou'),
+        key=lambda s: _bounds(s)[0]
+    )
+    eou_starts = [_bounds(span)[0] for span in eou_spans]
+    eou_index = {id(span): index for index, span in enumerate(eou_spans)}
+    used_eou = set()
+    previous_end = None
+
+    turns = []
+    for root in sorted(_turn_roots(spans, children), key=lambda s: _bounds(s)[0]):
+        root_start, root_end = _bounds(root)
+        segments: List[Tuple[Dict[str, Any], int, int]] = []
+        _blocking_chain(root, root_end, children, segments)
+        segments.reverse()
+        used_eou.update(eou_index[id(span)] for span, _, _ in segments if id(span) in eou_index)
+
+        # The user waited for end-of-utterance detection before this turn began;
+        # an EOU that ended before the previous turn did belongs to an earlier turn
+        index = bisect.bisect_right(eou_starts, root_start) - 1
+        if index >= 0 and index not in used_eou:
+            eou_start, eou_end = _bounds(eou_spans[index])
+            if min(eou_end, root_start) > eou_start and (previous_end is None or eou_end >= previous_end):
+                used_eou.add(index)
+                segments.insert(0, (eou_spans[index], eou_start, min(eou_end, root_start)))
+        previous_end = root_end if previous_end is None else max(previous_end, root_end)
+
+        breakdown = {category: 0.0 for category in BREAKDOWN_CATEGORIES}
+        path = []
+        for span, start_ns, end_ns in segments:
+            duration_ms = (end_ns - start_ns) / 1_000_000
+            category = latency_category(span.get('name'))
+            breakdown[category] += duration_ms
+            if path and path[-1]['span_id'] == _span_id(span) and path[-1]['end_time_ns'] == start_ns:
+                # Merge consecutive self-time slices of the same span
+                path[-1]['duration_ms'] += duration_ms
+                path[-1]['end_time_ns'] = end_ns
+                continue
+            path.append({
+                'name': span.get('name', 'unknown'),
+                'span_id': _span_id(span),
+                'operation_type': span.get('operation_type') or category,
+                'latency_category': category,
+                'start_time': start_ns,
+                'end_time_ns': end_ns,
+                'duration_ms': duration_ms,
+            })
+
+        turns.append({
+            'turn_span_id': None if root.get('virtual') else _span_id(root),
+            'conversation_turn_id': root.get('conversation_turn_id'),
+            'start_time_ns': root_start,
+            'end_time_ns': root_end,
+            'latency_ms': round(sum(breakdown.values()), 3),
+            'breakdown_ms': {category: round(value, 3) for category, value in breakdown.items()},
+            'critical_path': path,
+        })
+
+    return turns
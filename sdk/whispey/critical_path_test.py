@@ -0,0 +1,68 @@
+from whispey.critical_path import analyze_critical_paths
+
+MS = 1_000_000
+
+
+def span(name, span_id, start_ms, end_ms, parent=None, turn_id=None):
+    return {
+        'name': name,
+        'context': {'span_id': span_id},
+        'parent_span_id': parent,
+        'conversation_turn_id': turn_id,
+        'start_time_ns': start_ms * MS,
+        'end_time_ns': end_ms * MS,
+    }
+
+
+def test_agent_turn_roots():
+    spans = [
+        span('eou_detection', 'e1', 0, 100),
+        span('agent_turn', 't1', 100, 600),
+        span('llm_request', 'l1', 150, 400, parent='t1'),
+        span('tts_request', 's1', 350, 600, parent='t1'),
+        span('eou_detection', 'e2', 500, 550),  # user spoke over the agent
+        span('agent_turn', 't2', 1000, 1300),
+        span('llm_request', 'l2', 1000, 1300, parent='t2'),
+    ]
+    first, second = analyze_critical_paths(spans)
+
+    assert first['turn_span_id'] == 't1'
+    assert first['latency_ms'] == 600
+    assert first['breakdown_ms']['eou'] == 100
+    assert first['breakdown_ms']['llm'] == 200  # 150-350, until tts took over
+    assert first['breakdown_ms']['tts'] == 250
+    assert [step['span_id'] for step in first['critical_path']] == ['e1', 't1', 'l1', 's1']
+
+    # The second turn has no EOU of its own; e1 is taken and e2 ended during turn 1
+    assert second['latency_ms'] == 300
+    assert second['breakdown_ms']['eou'] == 0
+    print("test_agent_turn_roots passed")
+
+
+def test_virtual_roots_per_conversation_turn():
+    spans = [
+        span('eou_detection', 'e1', 0, 100, turn_id=1),
+        span('llm_request', 'l1', 100, 300, turn_id=1),
+        span('llm_request', 'l2', 1000, 1300, turn_id=2),
+        span('tts_request', 's2', 1300, 1300, parent='l2', turn_id=2),
+    ]
+    first, second = analyze_critical_paths(spans)
+
+    assert first['turn_span_id'] is None
+    assert first['latency_ms'] == 300
+    assert first['breakdown_ms']['eou'] == 100
+    assert second['latency_ms'] == 300
+    assert second['breakdown_ms']['eou'] == 0
+    print("test_virtual_roots_per_conversation_turn passed")
+
+
+def test_spans_starting_at_zero_are_kept():
+    turns = analyze_critical_paths([span('agent_turn', 't1', 0, 50)])
+    assert len(turns) == 1 and turns[0]['latency_ms'] == 50
+    print("test_spans_starting_at_zero_are_kept passed")
+
+
+if __name__ == "__main__":
+    test_agent_turn_roots()
+    test_virtual_roots_per_conversation_turn()
+    test_spans_starting_at_zero_are_kept()
@@ -8,6 +8,10 @@ from livekit.agents.metrics import STTMetrics, LLMMetrics, TTSMetrics, EOUMetric
 import re
 import uuid
 import json
+import hashlib
+from whispey.latency import SessionLatencyStats
+from whispey.cost_accumulator import SessionCostAccumulator
+from whispey.pricing_calculator import get_pricing_calculator
 import time 
 
 logger = logging.getLogger("whispey-sdk")
@@ -27,6 +31,7 @@ class ConversationTurn:
     bug_report: bool = False
     agent_turn_complete: bool = False
     turn_configuration: Optional[Dict[str, Any]] = None
+    config_ref: Optional[str] = None
     
     
     # Trace fields
@@ -61,7 +66,8 @@ class ConversationTurn:
             'tool_calls': self.tool_calls,
             'trace_duration_ms': self.trace_duration_ms,
             'trace_cost_usd': self.trace_cost_usd,
-            'turn_configuration': self.turn_configuration
+            'turn_configuration': self.turn_configuration,
+            'config_ref': self.config_ref
         }
         
         # Add enhanced fields only if they have data
@@ -316,11 +322,11 @@ class CorrectedTranscriptCollector:
             logger.info(f"🆕 Created new turn: {self.current_turn.turn_id}")
             self._ensure_trace_id(self.current_turn)
             
-            # Inject complete configuration into the turn
+            # Reference the session's configuration table instead of copying the config
             if hasattr(self, '_session_data') and self._session_data:
                 config = self._session_data.get('complete_configuration')
                 if config:
-                    self.current_turn.turn_configuration = config
+                    self.current_turn.config_ref = intern_configuration(self._session_data, config)
 
         if not hasattr(event.item, 'role'):
             return
@@ -449,17 +455,24 @@ class CorrectedTranscriptCollector:
                     if telemetry_instance:
                         telemetry_instance._update_turn_context(
                             self.current_turn.turn_id, 
-                            self.turn_counter
+                            self.turn_counter,
+                            session_id=self._session_data.get('session_id')
                         )
             
             self.current_turn.agent_response = event.item.text_content
             self.current_turn.agent_turn_complete = True
             
-            # Associate prompt data
+            # Associate prompt data - a reference into the session's prompt_context
             if hasattr(self, '_session_data') and self._session_data:
-                prompt_captures = self._session_data.get('prompt_captures', [])
+                prompt_captures = self._session_data.get('prompt_context', {}).get('captures', [])
                 if prompt_captures:
-                    self.current_turn.prompt_data = prompt_captures[-1]
+                    latest = prompt_captures[-1]
+                    self.current_turn.prompt_data = {
+                        'capture_index': len(prompt_captures) - 1,
+                        'timestamp': latest.get('timestamp'),
+                        'context_length': latest.get('context_length'),
+                        'tools_count': latest.get('tools_count')
+                    }
             
             # Apply pending metrics
             if self.pending_metrics['llm']:
@@ -594,6 +607,12 @@ class CorrectedTranscriptCollector:
         if not hasattr(self, '_pending_metrics_for_spans'):
             self._pending_metrics_for_spans = []
         self._pending_metrics_for_spans.append(metrics_data)
+
+        # Streaming latency histograms; percentiles are exported without rescanning spans
+        self._record_latency_metrics(metrics_obj)
+
+        # One pricing snapshot per event, so a concurrent reload can't mix versions
+        pricing = get_pricing_calculator().snapshot
         
         if isinstance(metrics_obj, STTMetrics):
             # First extract enhanced metrics to get provider and model info
@@ -607,7 +626,7 @@ class CorrectedTranscriptCollector:
             provider = enhanced_data.get('provider', 'unknown') if enhanced_data else 'unknown'
             
             # Calculate cost using enhanced data
-            cost = self._calculate_stt_cost_with_provider(metrics_obj, model_name, provider)
+            cost = self._calculate_stt_cost_with_provider(metrics_obj, model_name, provider, pricing)
             
             # Log in structured format
             audio_duration = getattr(metrics_obj, 'audio_duration', 'N/A')
@@ -622,8 +641,11 @@ class CorrectedTranscriptCollector:
                 'request_id': metrics_obj.request_id,
                 'model_used': model_name,
                 'provider': provider,
-                'calculated_cost': cost
+                'calculated_cost': cost,
+                'pricing_version': pricing.version
             }
+            self._record_cost('stt', provider, model_name, cost, pricing.version,
+                              audio_seconds=metrics_obj.audio_duration)
             
             if self.current_turn and self.current_turn.user_transcript and not self.current_turn.stt_metrics:
                 self.current_turn.stt_metrics = stt_data
@@ -643,7 +665,7 @@ class CorrectedTranscriptCollector:
             provider = enhanced_data.get('provider', 'unknown') if enhanced_data else 'unknown'
             
             # Calculate cost using enhanced data
-            cost = self._calculate_llm_cost_with_provider(metrics_obj, model_name, provider)
+            cost = self._calculate_llm_cost_with_provider(metrics_obj, model_name, provider, pricing)
             
             llm_data = {
                 'prompt_tokens': metrics_obj.prompt_tokens,
@@ -654,8 +676,13 @@ class CorrectedTranscriptCollector:
                 'request_id': metrics_obj.request_id,
                 'model_used': model_name,
                 'provider': provider,
-                'calculated_cost': cost
+                'calculated_cost': cost,
+                'pricing_version': pricing.version
             }
+            self._record_cost('llm', provider, model_name, cost, pricing.version,
+                              prompt_tokens=metrics_obj.prompt_tokens,
+                              completion_tokens=metrics_obj.completion_tokens,
+                              cached_tokens=getattr(metrics_obj, 'prompt_cached_tokens', 0))
             
             if self.current_turn and not self.current_turn.llm_metrics:
                 self.current_turn.llm_metrics = llm_data
@@ -672,7 +699,7 @@ class CorrectedTranscriptCollector:
             provider = enhanced_data.get('provider', 'unknown') if enhanced_data else 'unknown'
             
             # Calculate cost using enhanced data
-            cost = self._calculate_tts_cost_with_provider(metrics_obj, model_name, provider)
+            cost = self._calculate_tts_cost_with_provider(metrics_obj, model_name, provider, pricing)
             
             
             tts_data = {
@@ -683,8 +710,11 @@ class CorrectedTranscriptCollector:
                 'request_id': metrics_obj.request_id,
                 'model_used': model_name,
                 'provider': provider,
-                'calculated_cost': cost
+                'calculated_cost': cost,
+                'pricing_version': pricing.version
             }
+            self._record_cost('tts', provider, model_name, cost, pricing.version,
+                              characters=metrics_obj.characters_count)
             
             if self.current_turn and self.current_turn.agent_response and not self.current_turn.tts_metrics:
                 self.current_turn.tts_metrics = tts_data
@@ -725,72 +755,89 @@ class CorrectedTranscriptCollector:
             self._vad_events.append(vad_data)
             
             self._extract_enhanced_vad_from_metrics(metrics_obj)
+
+        for turn in (self.current_turn, self.turns[-1] if self.turns else None):
+            if turn:
+                self._record_e2e_latency(turn)
         
 
-    def _calculate_stt_cost_with_provider(self, metrics_obj, model_name, provider):
+    def _calculate_stt_cost_with_provider(self, metrics_obj, model_name, provider, pricing=None):
         """Calculate STT cost using provider and model information"""
         audio_duration = getattr(metrics_obj, 'audio_duration', 0)
-        
-        # Define your cost structure based on provider/model
-        cost_rates = {
-            'sarvam': {
-                'saarika:v2.5': 0.00002,  # per second
-            },
-            'openai': {
-                'whisper-1': 0.006 / 60,  # $0.006 per minute = per second
-            }
-            # Add more providers/models as needed
-        }
-        
-        rate = cost_rates.get(provider, {}).get(model_name, 0.00001)  # default rate
+        pricing = pricing or get_pricing_calculator().snapshot
+        rate = pricing.provider_rate('stt', provider, model_name)  # per second
         return audio_duration * rate
 
-    def _calculate_tts_cost_with_provider(self, metrics_obj, model_name, provider):
+    def _calculate_tts_cost_with_provider(self, metrics_obj, model_name, provider, pricing=None):
         """Calculate TTS cost using provider and model information"""
         characters_count = getattr(metrics_obj, 'characters_count', 0)
-        
-        # Define your cost structure based on provider/model
-        cost_rates = {
-            'elevenlabs': {
-                'eleven_flash_v2_5': 0.0001,  # per 1000 characters
-            },
-            'openai': {
-                'tts-1': 0.015 / 1000,  # $0.015 per 1000 characters
-                'tts-1-hd': 0.030 / 1000,  # $0.030 per 1000 characters
-            }
-            # Add more providers/models as needed
-        }
-        
-        rate = cost_rates.get(provider, {}).get(model_name, 0.00001)  # default rate
+        pricing = pricing or get_pricing_calculator().snapshot
+        rate = pricing.provider_rate('tts', provider, model_name)  # per character
         return characters_count * rate
 
-    def _calculate_llm_cost_with_provider(self, metrics_obj, model_name, provider):
+    def _calculate_llm_cost_with_provider(self, metrics_obj, model_name, provider, pricing=None):
         """Calculate LLM cost using provider and model information"""
         prompt_tokens = getattr(metrics_obj, 'prompt_tokens', 0)
         completion_tokens = getattr(metrics_obj, 'completion_tokens', 0)
-        
-        # Define your cost structure based on provider/model
-        cost_rates = {
-            'openai': {
-                'gpt-4.1-mini': {
-                    'input': 0.15 / 1000000,  # per token
-                    'output': 0.6 / 1000000,  # per token
-                },
-                'gpt-4o': {
-                    'input': 2.5 / 1000000,
-                    'output': 10.0 / 1000000,
-                }
-            }
-            # Add more providers/models as needed
-        }
-        
-        rates = cost_rates.get(provider, {}).get(model_name, {'input': 0.00001, 'output': 0.00001})
+        pricing = pricing or get_pricing_calculator().snapshot
+        rates = pricing.provider_rate('llm', provider, model_name)  # per token
         return (prompt_tokens * rates['input']) + (completion_tokens * rates['output'])
 
+    def _latency_stats(self):
+        """Session latency histograms, created on first use"""
+        session_data = getattr(self, '_session_data', None)
+        if session_data is None:
+            return None
+        if 'latency_stats' not in session_data:
+            session_data['latency_stats'] = SessionLatencyStats()
+        return session_data['latency_stats']
+
+    def _cost_accumulator(self):
+        """Session cost accumulator, created on first use"""
+        session_data = getattr(self, '_session_data', None)
+        if session_data is None:
+            return None
+        if 'cost_accumulator' not in session_data:
+            session_data['cost_accumulator'] = SessionCostAccumulator()
+        return session_data['cost_accumulator']
+
+    def _record_cost(self, operation, provider, model_name, cost, pricing_version, **usage):
+        """Add one costed metrics event to the session's running totals"""
+        accumulator = self._cost_accumulator()
+        if accumulator is not None:
+            accumulator.record(operation, provider, model_name, cost, pricing_version, **usage)
+
+    def _record_latency_metrics(self, metrics_obj):
+        """Feed one LiveKit metrics event into the latency histograms"""
+        stats = self._latency_stats()
+        if stats is None:
+            return
+        if isinstance(metrics_obj, LLMMetrics):
+            stats.record_seconds('llm_ttft', getattr(metrics_obj, 'ttft', None))
+        elif isinstance(metrics_obj, TTSMetrics):
+            stats.record_seconds('tts_ttfb', getattr(metrics_obj, 'ttfb', None))
+        elif isinstance(metrics_obj, STTMetrics):
+            stats.record_seconds('stt_duration', getattr(metrics_obj, 'duration', None))
+        elif isinstance(metrics_obj, EOUMetrics):
+            stats.record_seconds('eou_delay', getattr(metrics_obj, 'end_of_utterance_delay', None))
 
-
-
-
+    def _record_e2e_latency(self, turn: ConversationTurn):
+        """Record a turn's end-to-end latency (EOU delay + LLM TTFT + TTS TTFB) once all three are known"""
+        if not (turn.eou_metrics and turn.llm_metrics and turn.tts_metrics):
+            return
+        if not hasattr(self, '_e2e_recorded_turns'):
+            self._e2e_recorded_turns = set()
+        if turn.turn_id in self._e2e_recorded_turns:
+            return
+        stats = self._latency_stats()
+        if stats is None:
+            return
+        self._e2e_recorded_turns.add(turn.turn_id)
+        stats.record_seconds('e2e_latency', (
+            (turn.eou_metrics.get('end_of_utterance_delay') or 0) +
+            (turn.llm_metrics.get('ttft') or 0) +
+            (turn.tts_metrics.get('ttfb') or 0)
+        ))
 
     def finalize_session(self):
         """Enhanced finalization with comprehensive span assignment"""
@@ -799,7 +846,7 @@ class CorrectedTranscriptCollector:
             self.turns.append(self.current_turn)
             self.current_turn = None
         
-        if self._stored_telemetry_instance and hasattr(self._stored_telemetry_instance, 'spans_data'):
+        if self._stored_telemetry_instance and hasattr(self._stored_telemetry_instance, 'get_session_spans'):
             self._assign_session_spans_to_turns_direct(self._stored_telemetry_instance)
         else:
             logger.error("No stored telemetry instance available for span assignment")
@@ -832,6 +879,7 @@ class CorrectedTranscriptCollector:
         # Finalize trace data for each turn
         for turn in self.turns:
             self._finalize_trace_data(turn)
+            self._record_e2e_latency(turn)
         
 
 
@@ -843,11 +891,11 @@ class CorrectedTranscriptCollector:
             return
             
         telemetry_instance = self._session_data.get('telemetry_instance')
-        if not (telemetry_instance and hasattr(telemetry_instance, 'spans_data')):
+        if not (telemetry_instance and hasattr(telemetry_instance, 'get_session_spans')):
             logger.error("No telemetry instance found for span assignment")
             return
         
-        all_spans = telemetry_instance.spans_data
+        all_spans = self._session_spans(telemetry_instance)
         
         # Filter spans to only those with real request_ids
         real_spans = [span for span in all_spans if span.get('request_id_source') in ['nested_json', 'direct_attribute']]
@@ -914,14 +962,14 @@ class CorrectedTranscriptCollector:
             return matching_spans
             
         telemetry_instance = self._session_data.get('telemetry_instance')
-        if not (telemetry_instance and hasattr(telemetry_instance, 'spans_data')):
+        if not (telemetry_instance and hasattr(telemetry_instance, 'get_session_spans')):
             return matching_spans
 
 
         current_time = time.time()
         recent_threshold = current_time - 30  # 30 seconds window
 
-        for span in telemetry_instance.spans_data:
+        for span in self._session_spans(telemetry_instance):
             span_name = span.get('name', 'unknown')
             span_op_type = self._categorize_span_operation(span_name)
             span_request_id = span.get('request_id')
@@ -997,17 +1045,10 @@ class CorrectedTranscriptCollector:
         if span_attrs.get('gen_ai.request.id') or span_attrs.get('gen_ai.request_id'):
             return span_attrs.get('gen_ai.request.id') or span_attrs.get('gen_ai.request_id')
         
-        # Check in nested JSON metrics
-        for metrics_key in ['lk.llm_metrics', 'lk.tts_metrics', 'lk.stt_metrics']:
-            metrics_attr = span_attrs.get(metrics_key, '')
-            if isinstance(metrics_attr, str) and 'request_id' in metrics_attr:
-                try:
-                    import json
-                    metrics_data = json.loads(metrics_attr)
-                    if metrics_data.get('request_id'):
-                        return metrics_data.get('request_id')
-                except:
-                    pass
+        # Check in nested JSON metrics, parsed once at capture time
+        for metrics_data in (span.get('parsed_metrics') or {}).values():
+            if metrics_data.get('request_id'):
+                return metrics_data.get('request_id')
         
         return None
 
@@ -1366,11 +1407,11 @@ class CorrectedTranscriptCollector:
             return
             
         telemetry_instance = self._session_data.get('telemetry_instance')
-        if not (telemetry_instance and hasattr(telemetry_instance, 'spans_data')):
+        if not (telemetry_instance and hasattr(telemetry_instance, 'get_session_spans')):
             logger.warning("No telemetry instance found for span assignment")
             return
         
-        all_spans = telemetry_instance.spans_data
+        all_spans = self._session_spans(telemetry_instance)
         
         # Track assigned spans to avoid duplicates
         assigned_span_ids = set()
@@ -1476,7 +1517,7 @@ class CorrectedTranscriptCollector:
             telemetry_instance = self._session_data.get('telemetry_instance')
         
         # Assign spans if we have telemetry data
-        if telemetry_instance and hasattr(telemetry_instance, 'spans_data'):
+        if telemetry_instance and hasattr(telemetry_instance, 'get_session_spans'):
             self._assign_session_spans_to_turns_direct(telemetry_instance)
         else:
             logger.error("Cannot assign spans - no telemetry instance available")
@@ -1509,11 +1550,17 @@ class CorrectedTranscriptCollector:
         # Finalize trace data for each turn
         for turn in self.turns:
             self._finalize_trace_data(turn)
+            self._record_e2e_latency(turn)
         
 
+    def _session_spans(self, telemetry_instance):
+        """Captured spans belonging to this tracker's session"""
+        session_id = self._session_data.get('session_id') if getattr(self, '_session_data', None) else None
+        return telemetry_instance.get_session_spans(session_id)
+
     def _assign_session_spans_to_turns_direct(self, telemetry_instance):
         """Direct span assignment with telemetry instance passed in"""
-        all_spans = telemetry_instance.spans_data
+        all_spans = self._session_spans(telemetry_instance)
         
         # Filter spans to only those with real request_ids
         real_spans = [span for span in all_spans if span.get('request_id_source') in ['nested_json', 'direct_attribute']]
@@ -1573,32 +1620,6 @@ class CorrectedTranscriptCollector:
 
 
 
-    def _fallback_cost_calculation(self, turn: ConversationTurn):
-        """Fallback cost calculation if dynamic pricing fails"""
-        total_cost = 0.0
-        
-        for span in turn.otel_spans:
-            metadata = span.get('metadata', {})
-            operation = span.get('operation', '')
-            
-            if operation == 'llm':
-                prompt_tokens = metadata.get('prompt_tokens', 0)
-                completion_tokens = metadata.get('completion_tokens', 0)
-                cost = (prompt_tokens * 1.0 / 1000000) + (completion_tokens * 3.0 / 1000000)
-                total_cost += cost
-            elif operation == 'tts':
-                chars = metadata.get('characters_count', 0)
-                cost = chars * 20.0 / 1000000
-                total_cost += cost
-            elif operation == 'stt':
-                duration = metadata.get('audio_duration', 0)
-                cost = duration * 0.50 / 3600
-                total_cost += cost
-        
-        turn.trace_cost_usd = round(total_cost, 6)
-
-    
-
     def set_session_data_reference(self, session_data):
         """Set reference to session data for model detection"""
         self._session_data = session_data
@@ -1615,7 +1636,7 @@ class CorrectedTranscriptCollector:
             telemetry_instance = session_data.get('telemetry_instance')
             if telemetry_instance:
                 self._stored_telemetry_instance = telemetry_instance
-                logger.info(f"Stored telemetry instance reference with {len(getattr(telemetry_instance, 'spans_data', []))} spans")
+                logger.info("Stored telemetry instance reference")
             else:
                 logger.warning("No telemetry instance found in session data")
 
@@ -2188,6 +2209,34 @@ def extract_complete_session_configuration(session, session_data):
     return complete_config
 
 
+def intern_configuration(session_data, config) -> Optional[str]:
+    """Store a configuration once per session, keyed by content hash, and return its reference.
+
+    Turns carry only the returned ``config_ref``; the full configs live in
+    ``session_data['configurations']``. Replacing ``complete_configuration``
+    mid-call (e.g. re-extracting after a handoff) yields a new entry.
+    """
+    if not config:
+        return None
+
+    # Same object as last time - skip re-hashing on every turn
+    cached = session_data.get('_configuration_ref')
+    if cached and cached[0] is config:
+        return cached[1]
+
+    # The extraction timestamp differs between otherwise identical configs
+    content = {k: v for k, v in config.items() if k != 'timestamp'}
+    digest = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    config_ref = f"cfg_{digest[:12]}"
+
+    configurations = session_data.setdefault('configurations', {})
+    if config_ref not in configurations:
+        configurations[config_ref] = config
+    session_data['_configuration_ref'] = (config, config_ref)
+
+    return config_ref
+
+
 def setup_instrumentation_when_ready():
     """Check if instrumentation setup is ready - currently returns False to use fallback"""
     return False
@@ -0,0 +1,97 @@
+# sdk/whispey/latency.py
+import math
+from typing import Dict, Any, Optional
+
+# Relative bucket width; reported percentiles are within about 1% of the true value
+DEFAULT_PRECISION = 0.01
+
+PERCENTILES = (50, 90, 99)
+
+
+class LatencyHistogram:
+    """
+    Streaming log-bucketed latency histogram (HDR style).
+
+    Each value lands in a bucket whose width is a fixed fraction of its
+    magnitude, so memory is bounded by the dynamic range rather than the
+    number of samples and quantiles keep a bounded relative error.
+    """
+
+    def __init__(self, precision: float = DEFAULT_PRECISION):
+        self._log_base = math.log1p(precision)
+        self._buckets: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value_ms: float):
+        """Add one latency sample in milliseconds"""
+        if value_ms is None or value_ms < 0 or math.isnan(value_ms):
+            return
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+        if value_ms < 1e-3:
+            self._zero_count += 1
+            return
+        index = math.floor(math.log(value_ms) / self._log_base)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q (0..1), or None when empty"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = self._zero_count
+        if seen >= rank:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                # Bucket midpoint, clamped to the observed range
+                value = math.exp((index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, min/max and p50/p90/p99 in milliseconds"""
+        result = {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 2) if self.count else None,
+            'min_ms': round(self.min, 2) if self.min is not None else None,
+            'max_ms': round(self.max, 2) if self.max is not None else None,
+        }
+        for p in PERCENTILES:
+            value = self.quantile(p / 100)
+            result[f'p{p}_ms'] = round(value, 2) if value is not None else None
+        return result
+
+
+class SessionLatencyStats:
+    """Per-session latency histograms, updated as metrics events arrive"""
+
+    METRICS = ('llm_ttft', 'tts_ttfb', 'stt_duration', 'eou_delay', 'e2e_latency')
+
+    def __init__(self):
+        self.histograms = {name: LatencyHistogram() for name in self.METRICS}
+
+    def record_seconds(self, name: str, value_seconds: Optional[float]):
+        """Record a latency given in seconds, as LiveKit metrics report them"""
+        if value_seconds is None or name not in self.histograms:
+            return
+        try:
+            value_ms = float(value_seconds) * 1000
+        except (TypeError, ValueError):
+            return
+        # LiveKit reports -1 / 0 when a timing was not measured
+        if value_ms <= 0:
+            return
+        self.histograms[name].record(value_ms)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Percentile summary per metric, omitting metrics with no samples"""
+        return {name: histogram.summary() for name, histogram in self.histograms.items() if histogram.count}
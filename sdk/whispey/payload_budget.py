@@ -0,0 +1,190 @@
+# sdk/whispey/payload_budget.py
+import json
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger("whispey-sdk")
+
+# Tool outputs longer than this are cut down to a preview plus a content hash
+TOOL_OUTPUT_PREVIEW_CHARS = 512
+
+# Enhanced per-turn data keys, cheapest-to-lose first
+ENHANCED_FIELDS = ['enhanced_vad_data', 'enhanced_stt_data', 'enhanced_tts_data', 'enhanced_llm_data']
+
+
+def get_payload_size(data) -> int:
+    """Size of the JSON-serialized payload in bytes"""
+    return len(json.dumps(data, default=str).encode('utf-8'))
+
+
+def _truncate_text(value: Any) -> Optional[Dict[str, Any]]:
+    """Return a truncated replacement for a long text value, or None if it fits"""
+    if value is None:
+        return None
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) <= TOOL_OUTPUT_PREVIEW_CHARS:
+        return None
+    return {
+        'preview': text[:TOOL_OUTPUT_PREVIEW_CHARS],
+        'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        'original_length': len(text),
+        'truncated': True
+    }
+
+
+def _trim_tool_outputs(whispey_data: Dict[str, Any]) -> int:
+    """Truncate tool raw_output/result fields, keeping a content hash"""
+    trimmed = 0
+    for turn in whispey_data.get('transcript_with_metrics', []):
+        tool_calls = turn.get('tool_calls') or []
+        new_calls = []
+        for tool_call in tool_calls:
+            tool_call = dict(tool_call)
+            for key in ('raw_output', 'result'):
+                replacement = _truncate_text(tool_call.get(key))
+                if replacement:
+                    tool_call[key] = replacement
+                    trimmed += 1
+            new_calls.append(tool_call)
+        if tool_calls:
+            turn['tool_calls'] = new_calls
+    return trimmed
+
+
+def _trim_span_attributes(whispey_data: Dict[str, Any]) -> int:
+    """Replace raw span attributes with the key attributes used for analysis"""
+    from whispey.whispey import extract_key_attributes
+
+    def trim(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        nonlocal trimmed
+        result = []
+        for span in spans:
+            if span.get('attributes') and not span.get('attributes_trimmed'):
+                span = dict(span)
+                span['attributes'] = extract_key_attributes(span)
+                span['attributes_trimmed'] = True
+                trimmed += 1
+            result.append(span)
+        return result
+
+    trimmed = 0
+    for turn in whispey_data.get('transcript_with_metrics', []):
+        if turn.get('otel_spans'):
+            turn['otel_spans'] = trim(turn['otel_spans'])
+
+    telemetry_data = whispey_data.get('telemetry_data') or {}
+    if telemetry_data.get('session_traces'):
+        telemetry_data['session_traces'] = trim(telemetry_data['session_traces'])
+
+    return trimmed
+
+
+def _summarize_prompt_context(whispey_data: Dict[str, Any]) -> int:
+    """Replace the prompt tables with counts and per-capture sizes"""
+    prompt_context = whispey_data.get('prompt_context')
+    if not prompt_context or prompt_context.get('summarized'):
+        return 0
+
+    captures = prompt_context.get('captures', [])
+    whispey_data['prompt_context'] = {
+        'summarized': True,
+        'message_count': len(prompt_context.get('messages', {})),
+        'instructions_count': len(prompt_context.get('instructions', {})),
+        'tool_sets_count': len(prompt_context.get('tools', {})),
+        'captures': [
+            {
+                'timestamp': capture.get('timestamp'),
+                'context_length': capture.get('context_length'),
+                'tools_count': capture.get('tools_count')
+            }
+            for capture in captures
+        ]
+    }
+    return len(captures)
+
+
+def _drop_enhanced_data(whispey_data: Dict[str, Any]) -> int:
+    """Drop the enhanced_* per-turn data"""
+    dropped = 0
+    for turn in whispey_data.get('transcript_with_metrics', []):
+        for key in ENHANCED_FIELDS:
+            if turn.pop(key, None) is not None:
+                dropped += 1
+    return dropped
+
+
+# Degradation steps, applied in order until the payload fits
+DEGRADATION_STEPS = [
+    ('tool_outputs', _trim_tool_outputs),
+    ('span_attributes', _trim_span_attributes),
+    ('prompt_context', _summarize_prompt_context),
+    ('enhanced_data', _drop_enhanced_data),
+]
+
+
+def _measure_with_report(whispey_data: Dict[str, Any], report: Dict[str, Any]) -> int:
+    """
+    Serialized payload size with the report in place, after setting the
+    report's own final_bytes/within_budget to agree with that size
+    """
+    size = report.get('final_bytes') or 0
+    for _ in range(5):
+        report['final_bytes'] = size
+        report['within_budget'] = size <= report['budget_bytes']
+        measured = get_payload_size(whispey_data)
+        if measured == size:
+            break
+        size = measured
+    return size
+
+
+def apply_payload_budget(whispey_data: Dict[str, Any], budget_bytes: int) -> Dict[str, Any]:
+    """
+    Degrade low-priority payload fields until the payload fits the byte budget.
+
+    Steps run in DEGRADATION_STEPS order and stop as soon as the payload fits.
+    What was trimmed is recorded in ``metadata['payload_budget']``; calling this
+    again (e.g. after telemetry is attached) extends the same report. Sizes
+    are measured with the report in place, so its own bytes count against
+    the budget.
+
+    Args:
+        whispey_data: Payload built by generate_whispey_data (modified in place)
+        budget_bytes: Maximum serialized payload size in bytes
+
+    Returns:
+        The budget report
+    """
+    metadata = whispey_data.setdefault('metadata', {})
+    report = metadata.get('payload_budget') or {
+        'budget_bytes': budget_bytes,
+        'original_bytes': None,
+        'trimmed': []
+    }
+    report['budget_bytes'] = budget_bytes
+    metadata['payload_budget'] = report
+
+    size = _measure_with_report(whispey_data, report)
+    if report['original_bytes'] is None:
+        report['original_bytes'] = size
+        size = _measure_with_report(whispey_data, report)
+
+    for step_name, step in DEGRADATION_STEPS:
+        if size <= budget_bytes:
+            break
+        fields = step(whispey_data)
+        if not fields:
+            continue
+        trimmed_size = get_payload_size(whispey_data)
+        report['trimmed'].append({
+            'step': step_name,
+            'fields': fields,
+            'bytes_saved': size - trimmed_size
+        })
+        size = _measure_with_report(whispey_data, report)
+
+    if not report['within_budget']:
+        logger.warning(f"Payload is {size} bytes after all degradation steps (budget {budget_bytes})")
+
+    return report
@@ -0,0 +1,34 @@
+from whispey.payload_budget import apply_payload_budget, get_payload_size
+
+
+def payload():
+    return {
+        'metadata': {},
+        'transcript_with_metrics': [
+            {'tool_calls': [{'raw_output': 'x' * 2000}], 'enhanced_llm_data': {'notes': 'y' * 200}}
+            for _ in range(10)
+        ],
+    }
+
+
+def test_report_bytes_count_against_the_budget():
+    # A budget the payload only fits without its report
+    budget = get_payload_size(payload()) + 10
+    data = payload()
+    report = apply_payload_budget(data, budget)
+
+    assert report['original_bytes'] > budget
+    assert report['trimmed'] and report['trimmed'][0]['step'] == 'tool_outputs'
+    assert report['final_bytes'] == get_payload_size(data)
+    assert report['within_budget'] and report['final_bytes'] <= budget
+
+    # Nothing fits a tiny budget, and the report says so
+    data = payload()
+    report = apply_payload_budget(data, 100)
+    assert report['final_bytes'] == get_payload_size(data)
+    assert not report['within_budget']
+    print("test_report_bytes_count_against_the_budget passed")
+
+
+if __name__ == "__main__":
+    test_report_bytes_count_against_the_budget()
@@ -1,15 +1,353 @@
 # sdk/whispey/pricing_calculator.py
+import os
+import json
+import time
+import hashlib
 import logging
-from typing import Dict, Optional, Tuple, Any
+import threading
+from types import MappingProxyType
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Any, Mapping
 
 logger = logging.getLogger("whispey-sdk")
 
+# Resolved model names kept per calculator
+RESOLVE_CACHE_SIZE = 1024
+
+# Alternative spellings that don't share a prefix with the canonical model name
+MODEL_ALIASES = {
+    'claude-3-5-sonnet': 'claude-3-5-sonnet-20241022',
+    'claude-3-5-sonnet-latest': 'claude-3-5-sonnet-20241022',
+    'claude-3-5-haiku': 'claude-3-5-haiku-20241022',
+    'claude-3-5-haiku-latest': 'claude-3-5-haiku-20241022',
+    'claude-3-opus': 'claude-3-opus-20240229',
+    'claude-3-opus-latest': 'claude-3-opus-20240229',
+    'nova-2': 'deepgram-nova-2',
+    'sonic': 'cartesia-sonic',
+    'whisper': 'whisper-1',
+}
+
+# Names too generic to stand for one provider's model once the provider is stripped
+GENERIC_MODEL_NAMES = {'stt', 'tts', 'llm'}
+MIN_STRIPPED_NAME_LENGTH = 4
+
+# Provider defaults used when nothing else matches
+PROVIDER_FALLBACKS = {
+    'gpt': 'gpt-4o-mini',  # Default OpenAI fallback
+    'claude': 'claude-3-5-haiku-20241022',  # Default Anthropic fallback
+    'gemini': 'gemini-1.5-flash',  # Default Google fallback
+}
+
+
+def normalize_model_name(model_name: str) -> str:
+    """Lower-case, drop any 'provider/' path prefix and unify '_' with '-'"""
+    name = model_name.strip().lower()
+    if '/' in name:
+        name = name.rsplit('/', 1)[-1]
+    return name.replace('_', '-')
+
+
+def _contains_token(name: str, part: str) -> bool:
+    """True when ``part`` occurs in ``name`` bounded by '-' or the string ends"""
+    start = name.find(part)
+    while start != -1:
+        end = start + len(part)
+        if (start == 0 or name[start - 1] == '-') and (end == len(name) or name[end] == '-'):
+            return True
+        start = name.find(part, start + 1)
+    return False
+
+
+class _PrefixTrie:
+    """Character trie answering 'longest indexed key that prefixes this name'"""
+
+    _END = object()
+
+    def __init__(self):
+        self._root: Dict[Any, Any] = {}
+
+    def insert(self, key: str, value: str):
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[self._END] = value
+
+    def longest_prefix(self, name: str) -> Optional[str]:
+        node = self._root
+        match = node.get(self._END)
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(self._END, match)
+        return match
+
+
+class PricingResolver:
+    """
+    Maps raw model strings to pricing database keys.
+
+    Names are normalized and indexed once (exact table, alias table, prefix
+    trie) and results are memoized in a bounded LRU, so metrics events for
+    e.g. ``gpt-4o-mini-2024-07-18`` cost a dict hit after the first lookup.
+    Substring matches only count on '-' boundaries, so 'google-stt' doesn't
+    borrow azure-stt's price.
+    """
+
+    def __init__(self, pricing_database: Dict[str, Dict], aliases: Dict[str, str] = None,
+                 cache_size: int = RESOLVE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._warned = set()
+        self._exact: Dict[str, str] = {}
+        self._trie = _PrefixTrie()
+        # Database keys in their original order, for names that only part of a key matches
+        self._keys = [(normalize_model_name(key), key) for key in pricing_database]
+
+        for normalized, key in self._keys:
+            self._exact[normalized] = key
+            self._trie.insert(normalized, key)
+
+        # Keys that embed the provider (e.g. deepgram-nova-2) also match without it,
+        # unless what's left is a bare type like the 'stt' of azure-stt
+        for key, info in pricing_database.items():
+            provider = normalize_model_name(info.get('provider', ''))
+            normalized = normalize_model_name(key)
+            if provider and normalized.startswith(provider + '-'):
+                stripped = normalized[len(provider) + 1:]
+                if stripped not in GENERIC_MODEL_NAMES and len(stripped) >= MIN_STRIPPED_NAME_LENGTH:
+                    self._exact.setdefault(stripped, key)
+
+        for alias, key in (aliases or {}).items():
+            if key in pricing_database:
+                self._exact.setdefault(normalize_model_name(alias), key)
+
+        # Longest keys first for the substring fallback
+        self._by_length = sorted(self._exact.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def resolve(self, model_name: str) -> Optional[str]:
+        """Pricing database key for a model string, or None"""
+        if not model_name:
+            return None
+        if model_name in self._cache:
+            self._cache.move_to_end(model_name)
+            return self._cache[model_name]
+
+        key = self._resolve_uncached(model_name)
+
+        self._cache[model_name] = key
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return key
+
+    def _resolve_uncached(self, model_name: str) -> Optional[str]:
+        normalized = normalize_model_name(model_name)
+
+        key = self._exact.get(normalized) or self._trie.longest_prefix(normalized)
+        if key:
+            return key
+
+        # Indexed name appearing inside a decorated one (e.g. 'azure-gpt-4o')
+        for indexed, key in self._by_length:
+            if _contains_token(normalized, indexed):
+                return key
+
+        # Shortened name that is part of a database key (e.g. 'tts' → 'tts-1')
+        for indexed, key in self._keys:
+            if _contains_token(indexed, normalized):
+                return key
+
+        for provider_key, default_model in PROVIDER_FALLBACKS.items():
+            if provider_key in normalized and default_model in self._exact.values():
+                self.warn_once(('provider', model_name), f"💰 Using provider fallback: '{model_name}' → '{default_model}'")
+                return default_model
+
+        return None
+
+    def warn_once(self, key, message: str):
+        """Log a warning the first time ``key`` is seen"""
+        if key not in self._warned:
+            self._warned.add(key)
+            logger.warning(message)
+
+
+# Per-unit rates used for turn costs in the metrics handlers, by provider and model:
+# STT per audio second, TTS per character, LLM per token
+DEFAULT_PROVIDER_RATES = {
+    'stt': {
+        'sarvam': {
+            'saarika:v2.5': 0.00002,  # per second
+        },
+        'openai': {
+            'whisper-1': 0.006 / 60,  # $0.006 per minute = per second
+        }
+    },
+    'tts': {
+        'elevenlabs': {
+            'eleven_flash_v2_5': 0.0001,  # per 1000 characters
+        },
+        'openai': {
+            'tts-1': 0.015 / 1000,  # $0.015 per 1000 characters
+            'tts-1-hd': 0.030 / 1000,  # $0.030 per 1000 characters
+        }
+    },
+    'llm': {
+        'openai': {
+            'gpt-4.1-mini': {
+                'input': 0.15 / 1000000,  # per token
+                'output': 0.6 / 1000000,  # per token
+            },
+            'gpt-4o': {
+                'input': 2.5 / 1000000,
+                'output': 10.0 / 1000000,
+            }
+        }
+    },
+    # Rates for provider/model pairs not listed above
+    'default': {
+        'stt': 0.00001,
+        'tts': 0.00001,
+        'llm': {'input': 0.00001, 'output': 0.00001}
+    }
+}
+
+PRICING_FILE_ENV = 'WHISPEY_PRICING_FILE'
+
+
+def _freeze(value):
+    """Recursively wrap dicts in read-only mappings and lists in tuples"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    """Mutable deep copy of a frozen pricing structure"""
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class PricingSnapshot:
+    """
+    Immutable, versioned pricing tables.
+
+    A snapshot is never modified after construction; changes build a new one
+    that replaces the calculator's reference in a single assignment, so
+    readers take one snapshot and use it without locking. ``version`` is the
+    file-provided label or a content hash, and is stamped on computed costs.
+    """
+
+    def __init__(self, models: Dict[str, Dict], fallback_pricing: Dict[str, Dict],
+                 provider_rates: Dict[str, Any], version: Optional[str] = None, source: str = 'builtin'):
+        content = json.dumps(
+            {'models': models, 'fallback_pricing': fallback_pricing, 'provider_rates': provider_rates},
+            sort_keys=True, default=str
+        )
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+
+        self.models = _freeze(models)
+        self.fallback_pricing = _freeze(fallback_pricing)
+        self.provider_rates = _freeze(provider_rates)
+        self.version = version or f"sha-{content_hash}"
+        self.content_hash = content_hash
+        self.source = source
+        self.loaded_at = time.time()
+        self.resolver = PricingResolver(self.models, MODEL_ALIASES)
+
+    def provider_rate(self, operation: str, provider: str, model_name: str):
+        """Per-unit rate for a provider/model pair, or the default for the operation"""
+        rate = self.provider_rates.get(operation, {}).get(provider, {}).get(model_name)
+        return rate if rate is not None else self.provider_rates['default'][operation]
+
+
+def _validate_models(models: Dict[str, Dict]):
+    """Raise ValueError when a model entry lacks the fields its type needs"""
+    required = {
+        'llm': ('input_cost_per_1m', 'output_cost_per_1m'),
+        'tts': ('cost_per_1m_chars',),
+        'stt': ('cost_per_hour',),
+    }
+    for name, info in models.items():
+        model_type = info.get('type')
+        if model_type not in required:
+            raise ValueError(f"Model '{name}' has unknown pricing type {model_type!r}")
+        missing = [key for key in required[model_type] if not isinstance(info.get(key), (int, float))]
+        if missing:
+            raise ValueError(f"Model '{name}' is missing numeric {', '.join(missing)}")
+
+
+def _deep_merge(base: Dict, override: Dict) -> Dict:
+    """Copy of base with override merged in, recursing into nested dicts"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), Mapping):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _validate_fallback_pricing(fallback: Dict[str, Dict]):
+    """Raise ValueError unless every operation has the numeric fallback rates the calculators read"""
+    required = {
+        'llm': ('input_cost_per_1m', 'output_cost_per_1m'),
+        'tts': ('cost_per_1m_chars',),
+        'stt': ('cost_per_hour',),
+    }
+    for operation, keys in required.items():
+        section = fallback.get(operation)
+        if not isinstance(section, Mapping):
+            raise ValueError(f"Fallback pricing has no '{operation}' section")
+        missing = [key for key in keys if not _is_number(section.get(key))]
+        if missing:
+            raise ValueError(f"Fallback pricing for '{operation}' is missing numeric {', '.join(missing)}")
+
+
+def _validate_llm_rate(rate, where: str):
+    if not isinstance(rate, Mapping) or not (_is_number(rate.get('input')) and _is_number(rate.get('output'))):
+        raise ValueError(f"Provider rate {where} needs numeric 'input' and 'output'")
+
+
+def _validate_provider_rates(rates: Dict[str, Any]):
+    """Raise ValueError unless provider_rate() can price every operation from these tables"""
+    default = rates.get('default')
+    if not isinstance(default, Mapping):
+        raise ValueError("Provider rates have no 'default' section")
+    for operation in ('stt', 'tts'):
+        if not _is_number(default.get(operation)):
+            raise ValueError(f"Default provider rate for '{operation}' must be a number")
+    _validate_llm_rate(default.get('llm'), 'default.llm')
+
+    for operation in ('stt', 'tts', 'llm'):
+        providers = rates.get(operation, {})
+        if not isinstance(providers, Mapping):
+            raise ValueError(f"Provider rates for '{operation}' must map providers to models")
+        for provider, models in providers.items():
+            if not isinstance(models, Mapping):
+                raise ValueError(f"Provider rates for '{operation}.{provider}' must map models to rates")
+            for model, rate in models.items():
+                where = f"{operation}.{provider}.{model}"
+                if operation == 'llm':
+                    _validate_llm_rate(rate, where)
+                elif not _is_number(rate):
+                    raise ValueError(f"Provider rate {where} must be a number")
+
+
 class ModelPricingCalculator:
     """Dynamic pricing calculator for AI models"""
     
-    def __init__(self):
+    def __init__(self, pricing_file: Optional[str] = None):
         # Updated pricing as of January 2025 (per 1M tokens unless specified)
-        self.pricing_database = {
+        pricing_database = {
             # OpenAI Models
             'gpt-5': {
                 'provider': 'openai',
@@ -135,7 +473,7 @@ class ModelPricingCalculator:
         }
         
         # Fallback pricing for unknown models
-        self.fallback_pricing = {
+        fallback_pricing = {
             'llm': {
                 'input_cost_per_1m': 1.00,   # Conservative fallback
                 'output_cost_per_1m': 3.00,
@@ -148,41 +486,115 @@ class ModelPricingCalculator:
             }
         }
 
-    def get_model_info(self, model_name: str) -> Optional[Dict]:
+        # Built-in tables; pricing files are merged over these
+        self._builtin = (pricing_database, fallback_pricing, DEFAULT_PROVIDER_RATES)
+        # Models set through add_custom_model/update_model_pricing, reapplied over every reload
+        self._runtime_models: Dict[str, Dict] = {}
+        self._snapshot = PricingSnapshot(pricing_database, fallback_pricing, DEFAULT_PROVIDER_RATES)
+        # Serializes writers only; readers never take it
+        self._write_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+        if pricing_file:
+            self.load_pricing_file(pricing_file)
+
+    @property
+    def snapshot(self) -> PricingSnapshot:
+        """Current pricing snapshot; hold on to it for a consistent set of prices"""
+        return self._snapshot
+
+    @property
+    def pricing_version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def pricing_database(self) -> Mapping[str, Mapping]:
+        return self._snapshot.models
+
+    @property
+    def fallback_pricing(self) -> Mapping[str, Mapping]:
+        return self._snapshot.fallback_pricing
+
+    @property
+    def resolver(self) -> 'PricingResolver':
+        return self._snapshot.resolver
+
+    def _swap(self, snapshot: PricingSnapshot):
+        """Publish a new snapshot with a single reference assignment"""
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if snapshot.version != previous.version:
+            logger.info(f"💰 Pricing updated: {previous.version} → {snapshot.version} ({snapshot.source})")
+
+    def load_pricing_file(self, path: str) -> PricingSnapshot:
+        """
+        Load pricing from a JSON file and swap it in atomically.
+
+        The file may contain ``models``, ``fallback_pricing`` and
+        ``provider_rates`` sections and an optional ``version`` label. Models
+        replace built-in entries by name; fallback pricing and provider rates
+        are merged per operation, provider and model, so a partial section only
+        changes what it lists. Models changed at runtime are applied on top.
+        The merged tables are validated first; on any error the current
+        snapshot stays.
+        """
+        with self._write_lock:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            builtin_models, builtin_fallback, builtin_rates = self._builtin
+            file_models = data.get('models', {})
+            _validate_models(file_models)
+            models = {**_thaw(builtin_models), **file_models, **self._runtime_models}
+            fallback = _deep_merge(_thaw(builtin_fallback), data.get('fallback_pricing', {}))
+            _validate_fallback_pricing(fallback)
+            rates = _deep_merge(_thaw(builtin_rates), data.get('provider_rates', {}))
+            _validate_provider_rates(rates)
+
+            snapshot = PricingSnapshot(models, fallback, rates, version=data.get('version'), source=path)
+            self._swap(snapshot)
+        return snapshot
+
+    def watch_pricing_file(self, path: str, interval_seconds: float = 30.0):
+        """Reload ``path`` in a daemon thread whenever its mtime changes"""
+        self.stop_watching()
+        self._stop_watching = threading.Event()
+        stop = self._stop_watching
+
+        def watch():
+            last_mtime = None
+            while not stop.is_set():
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    if mtime != last_mtime:
+                        # Remember the mtime first so a bad file is reported once, not every poll
+                        first_poll, last_mtime = last_mtime is None, mtime
+                        if not first_poll or self._snapshot.source != path:
+                            self.load_pricing_file(path)
+                except Exception as e:
+                    logger.error(f"💰 Pricing reload failed for {path}, keeping {self._snapshot.version}: {e}")
+                stop.wait(interval_seconds)
+
+        self._watcher = threading.Thread(target=watch, name="whispey-pricing-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the pricing file watcher, if any"""
+        self._stop_watching.set()
+        self._watcher = None
+
+    def get_model_info(self, model_name: str, snapshot: Optional[PricingSnapshot] = None) -> Optional[Mapping]:
         """Get pricing info for a model"""
-        if not model_name:
-            return None
-            
-        # Direct lookup
-        if model_name in self.pricing_database:
-            return self.pricing_database[model_name]
-        
-        # Fuzzy matching for model variants
-        model_lower = model_name.lower()
-        
-        # Try partial matches
-        for db_model, info in self.pricing_database.items():
-            if db_model.lower() in model_lower or model_lower in db_model.lower():
-                return info
-        
-        # Try provider-based matching
-        provider_matches = {
-            'gpt': 'gpt-4o-mini',  # Default OpenAI fallback
-            'claude': 'claude-3-5-haiku-20241022',  # Default Anthropic fallback
-            'gemini': 'gemini-1.5-flash',  # Default Google fallback
-        }
-        
-        for provider_key, default_model in provider_matches.items():
-            if provider_key in model_lower:
-                logger.warning(f"💰 Using provider fallback: '{model_name}' → '{default_model}'")
-                return self.pricing_database.get(default_model)
-        
-        return None
+        snapshot = snapshot or self._snapshot
+        key = snapshot.resolver.resolve(model_name)
+        return snapshot.models.get(key) if key else None
 
     def calculate_llm_cost(self, model_name: str, prompt_tokens: int, completion_tokens: int) -> Tuple[float, str]:
         """Calculate LLM cost based on actual model and tokens"""
         
-        model_info = self.get_model_info(model_name)
+        snapshot = self._snapshot
+        model_info = self.get_model_info(model_name, snapshot)
         
         if model_info and model_info['type'] == 'llm':
             input_cost = (prompt_tokens * model_info['input_cost_per_1m']) / 1_000_000
@@ -193,18 +605,19 @@ class ModelPricingCalculator:
         
         else:
             # Use fallback pricing
-            fallback = self.fallback_pricing['llm']
+            fallback = snapshot.fallback_pricing['llm']
             input_cost = (prompt_tokens * fallback['input_cost_per_1m']) / 1_000_000
             output_cost = (completion_tokens * fallback['output_cost_per_1m']) / 1_000_000
             total_cost = input_cost + output_cost
             
-            logger.warning(f"💰 LLM Cost (FALLBACK for '{model_name}'): ${total_cost:.6f}")
+            snapshot.resolver.warn_once(('llm', model_name), f"💰 LLM Cost (FALLBACK for '{model_name}'): ${total_cost:.6f}")
             return total_cost, f"Fallback pricing used for unknown model: {model_name}"
 
     def calculate_tts_cost(self, model_name: str, character_count: int) -> Tuple[float, str]:
         """Calculate TTS cost based on actual model and character count"""
         
-        model_info = self.get_model_info(model_name)
+        snapshot = self._snapshot
+        model_info = self.get_model_info(model_name, snapshot)
         
         if model_info and model_info['type'] == 'tts':
             cost = (character_count * model_info['cost_per_1m_chars']) / 1_000_000
@@ -213,16 +626,17 @@ class ModelPricingCalculator:
         
         else:
             # Use fallback pricing
-            fallback = self.fallback_pricing['tts']
+            fallback = snapshot.fallback_pricing['tts']
             cost = (character_count * fallback['cost_per_1m_chars']) / 1_000_000
             
-            logger.warning(f"💰 TTS Cost (FALLBACK for '{model_name}'): ${cost:.6f}")
+            snapshot.resolver.warn_once(('tts', model_name), f"💰 TTS Cost (FALLBACK for '{model_name}'): ${cost:.6f}")
             return cost, f"Fallback pricing used for unknown model: {model_name}"
 
     def calculate_stt_cost(self, model_name: str, duration_seconds: float) -> Tuple[float, str]:
         """Calculate STT cost based on actual model and audio duration"""
         
-        model_info = self.get_model_info(model_name)
+        snapshot = self._snapshot
+        model_info = self.get_model_info(model_name, snapshot)
         duration_hours = duration_seconds / 3600
         
         if model_info and model_info['type'] == 'stt':
@@ -232,26 +646,39 @@ class ModelPricingCalculator:
         
         else:
             # Use fallback pricing
-            fallback = self.fallback_pricing['stt']
+            fallback = snapshot.fallback_pricing['stt']
             cost = duration_hours * fallback['cost_per_hour']
             
-            logger.warning(f"💰 STT Cost (FALLBACK for '{model_name}'): ${cost:.6f}")
+            snapshot.resolver.warn_once(('stt', model_name), f"💰 STT Cost (FALLBACK for '{model_name}'): ${cost:.6f}")
             return cost, f"Fallback pricing used for unknown model: {model_name}"
 
     def add_custom_model(self, model_name: str, model_config: Dict):
         """Add custom model pricing"""
-        self.pricing_database[model_name] = model_config
+        self._replace_model(model_name, dict(model_config))
 
     def update_model_pricing(self, model_name: str, new_pricing: Dict):
         """Update existing model pricing"""
-        if model_name in self.pricing_database:
-            self.pricing_database[model_name].update(new_pricing)
+        if model_name in self._snapshot.models:
+            self._replace_model(model_name, new_pricing, merge=True)
         else:
             logger.warning(f"💰 Model {model_name} not found for pricing update")
 
+    def _replace_model(self, model_name: str, model_config: Dict, merge: bool = False):
+        """Copy-on-write: build a snapshot with one model changed and swap it in"""
+        with self._write_lock:
+            current = self._snapshot
+            models = _thaw(current.models)
+            if merge and model_name in models:
+                model_config = {**models[model_name], **model_config}
+            self._runtime_models[model_name] = model_config
+            models[model_name] = model_config
+            self._swap(PricingSnapshot(
+                models, _thaw(current.fallback_pricing), _thaw(current.provider_rates), source='runtime'
+            ))
+
     def get_all_supported_models(self) -> Dict[str, Dict]:
         """Get all supported models and their pricing"""
-        return self.pricing_database.copy()
+        return _thaw(self._snapshot.models)
 
     def debug_pricing_info(self, model_name: str):
         """Debug helper to see what pricing info is available"""
@@ -274,8 +701,14 @@ class ModelPricingCalculator:
                 print("   (No partial matches found)")
 
 
-# Global instance
+# Global instance; WHISPEY_PRICING_FILE points it at a watched JSON pricing file
 _pricing_calculator = ModelPricingCalculator()
+if os.environ.get(PRICING_FILE_ENV):
+    try:
+        _pricing_calculator.load_pricing_file(os.environ[PRICING_FILE_ENV])
+    except Exception as e:
+        logger.error(f"💰 Could not load {os.environ[PRICING_FILE_ENV]}, using built-in pricing: {e}")
+    _pricing_calculator.watch_pricing_file(os.environ[PRICING_FILE_ENV])
 
 def get_pricing_calculator() -> ModelPricingCalculator:
     """Get the global pricing calculator instance"""
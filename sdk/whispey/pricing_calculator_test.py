@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+
+from whispey.pricing_calculator import (
+    PROVIDER_FALLBACKS,
+    ModelPricingCalculator,
+    normalize_model_name,
+)
+
+
+def baseline_resolve(pricing_database, model_name):
+    """The linear-scan lookup PricingResolver replaced"""
+    if model_name in pricing_database:
+        return model_name
+    model_lower = model_name.lower()
+    for db_model in pricing_database:
+        if db_model.lower() in model_lower or model_lower in db_model.lower():
+            return db_model
+    for provider_key, default_model in PROVIDER_FALLBACKS.items():
+        if provider_key in model_lower:
+            return default_model
+    return None
+
+
+def test_resolver_matches_baseline_lookup():
+    calculator = ModelPricingCalculator()
+    database = calculator.pricing_database
+    names = list(database) + list(PROVIDER_FALLBACKS) + list(PROVIDER_FALLBACKS.values())
+    for key, info in database.items():
+        provider = normalize_model_name(info['provider'])
+        if normalize_model_name(key).startswith(provider + '-'):
+            names.append(normalize_model_name(key)[len(provider) + 1:])
+    names += ['stt', 'tts', 'llm', 'google-stt', 'sarvam-stt', 'deepgram-stt', 'assemblyai-stt']
+
+    for name in names:
+        assert calculator.resolver.resolve(name) == baseline_resolve(database, name), name
+
+    assert calculator.resolver.resolve('tts') == 'tts-1'
+    assert calculator.resolver.resolve('google-stt') is None
+    cost, _ = calculator.calculate_stt_cost('google-stt', 3600)
+    assert cost == calculator.fallback_pricing['stt']['cost_per_hour']
+    print("test_resolver_matches_baseline_lookup passed")
+
+
+def test_resolver_substrings_match_on_token_boundaries():
+    resolver = ModelPricingCalculator().resolver
+    assert resolver.resolve('azure-gpt-4o') == 'gpt-4o'
+    assert resolver.resolve('gpt-4o-mini-2024-07-18') == 'gpt-4o-mini'
+    assert resolver.resolve('nova-2-general') == 'deepgram-nova-2'
+    assert resolver.resolve('assemblyai-stt') is None
+    print("test_resolver_substrings_match_on_token_boundaries passed")
+
+
+def test_reload_keeps_runtime_models():
+    calculator = ModelPricingCalculator()
+    calculator.add_custom_model('my-llm', {
+        'provider': 'custom', 'input_cost_per_1m': 1.0, 'output_cost_per_1m': 2.0, 'type': 'llm'
+    })
+    calculator.update_model_pricing('gpt-4o', {'input_cost_per_1m': 2.0})
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pricing.json')
+        with open(path, 'w') as f:
+            json.dump({'version': 'v2', 'models': {'gpt-4o-mini': {
+                'provider': 'openai', 'input_cost_per_1m': 0.2, 'output_cost_per_1m': 0.8, 'type': 'llm'
+            }}}, f)
+        calculator.load_pricing_file(path)
+
+    assert calculator.pricing_version == 'v2'
+    assert calculator.pricing_database['my-llm']['output_cost_per_1m'] == 2.0
+    assert calculator.pricing_database['gpt-4o']['input_cost_per_1m'] == 2.0
+    assert calculator.pricing_database['gpt-4o']['output_cost_per_1m'] == 10.0
+    assert calculator.pricing_database['gpt-4o-mini']['input_cost_per_1m'] == 0.2
+    print("test_reload_keeps_runtime_models passed")
+
+
+def test_partial_pricing_file_is_merged_and_validated():
+    calculator = ModelPricingCalculator()
+    builtin_stt = calculator.snapshot.provider_rate('stt', 'openai', 'whisper-1')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pricing.json')
+        with open(path, 'w') as f:
+            json.dump({'version': 'partial', 'fallback_pricing': {'llm': {'input_cost_per_1m': 2.0}},
+                       'provider_rates': {'stt': {'sarvam': {'saarika:v3': 0.00003}}}}, f)
+        calculator.load_pricing_file(path)
+
+        snapshot = calculator.snapshot
+        assert snapshot.fallback_pricing['llm']['input_cost_per_1m'] == 2.0
+        assert snapshot.fallback_pricing['llm']['output_cost_per_1m'] == 3.0
+        assert snapshot.provider_rate('stt', 'sarvam', 'saarika:v3') == 0.00003
+        assert snapshot.provider_rate('stt', 'sarvam', 'saarika:v2.5') == 0.00002
+        assert snapshot.provider_rate('stt', 'openai', 'whisper-1') == builtin_stt
+        assert calculator.calculate_llm_cost('unknown-model', 1_000_000, 1_000_000)[0] == 5.0
+
+        for broken in (
+            {'fallback_pricing': {'llm': {'output_cost_per_1m': 'free'}}},
+            {'provider_rates': {'llm': {'openai': {'new-model': {'input': 1e-6}}}}},
+            {'provider_rates': {'default': {'stt': None}}},
+        ):
+            with open(path, 'w') as f:
+                json.dump(broken, f)
+            try:
+                calculator.load_pricing_file(path)
+                assert False, f"loaded invalid pricing {broken}"
+            except ValueError:
+                pass
+            assert calculator.pricing_version == 'partial'
+    print("test_partial_pricing_file_is_merged_and_validated passed")
+
+
+if __name__ == "__main__":
+    test_resolver_matches_baseline_lookup()
+    test_resolver_substrings_match_on_token_boundaries()
+    test_reload_keeps_runtime_models()
+    test_partial_pricing_file_is_merged_and_validated()
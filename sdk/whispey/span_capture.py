@@ -0,0 +1,423 @@
+# sdk/whispey/span_capture.py
+import time
+import json
+import hashlib
+import logging
+import atexit
+import threading
+import contextvars
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger("whispey-sdk")
+
+SDK_VERSION = '2.1.1'
+
+# Maximum number of ended spans held before conversion; oldest are dropped first
+DEFAULT_SPAN_BUFFER_SIZE = 10000
+
+# Bounded queue of the OTLP batch exporter; spans beyond it are dropped by the SDK
+DEFAULT_EXPORT_QUEUE_SIZE = 2048
+
+DIRECT_REQUEST_ID_KEYS = ['request_id', 'lk.request_id', 'gen_ai.request.id', 'gen_ai.request_id']
+# Metrics attributes carrying JSON, mapped to the key used in parsed_metrics
+METRICS_JSON_KEYS = {'lk.llm_metrics': 'llm', 'lk.tts_metrics': 'tts', 'lk.stt_metrics': 'stt'}
+
+# Span attributes useful for analysis; also the default capture allowlist
+KEY_ATTRIBUTES = [
+    'session_id', 'lk.user_transcript', 'lk.response.text', 
+    'gen_ai.request.model', 'lk.speech_id', 'lk.interrupted',
+    'gen_ai.usage.input_tokens', 'gen_ai.usage.output_tokens',
+    'lk.tts.streaming', 'lk.input_text', 'model_name',
+    'prompt_tokens', 'completion_tokens', 'characters_count',
+    'audio_duration', 'request_id', 'error'
+]
+
+# Attributes the dashboard rebuilds tool calls from; kept whatever the allowlist says
+ALWAYS_KEPT_ATTRIBUTES = [
+    'lk.function_tool.name', 'lk.function_tool.arguments',
+    'lk.function_tool.output', 'lk.function_tool.is_error',
+]
+
+# Span attribute used to route ended spans back to their session's buffer
+SESSION_ID_ATTRIBUTE = 'whispey.session_id'
+
+# Session whose code is currently running; inherited by tasks the session starts
+current_session_id = contextvars.ContextVar('whispey_session_id', default=None)
+
+# Process-wide routing table and the single tracer provider feeding it
+_session_buffers: Dict[str, 'SpanBuffer'] = {}
+_tracer_provider = None
+_tracer_provider_lock = threading.Lock()
+
+
+@dataclass
+class CapturePolicy:
+    """
+    What to keep from each captured span.
+
+    Attributes:
+        attribute_allowlist: Span attribute keys to keep in addition to
+            ALWAYS_KEPT_ATTRIBUTES; None keeps all of them
+        share_resource: Store resource and instrumentation scope once per session
+            and reference them from each span by ``resource_ref``/``scope_ref``
+        sample_rates: Keep probability per span name, decided from the trace ID
+            so a whole trace is kept or dropped together; unlisted names are kept
+        max_spans: Spans kept per session; later spans are dropped and counted
+    """
+    attribute_allowlist: Optional[List[str]] = field(default_factory=lambda: list(KEY_ATTRIBUTES))
+    share_resource: bool = True
+    sample_rates: Dict[str, float] = field(default_factory=dict)
+    max_spans: Optional[int] = None
+
+    def should_sample(self, span) -> bool:
+        """Head sampling decision for an ended span"""
+        rate = self.sample_rates.get(span.name)
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        context = span.get_span_context() if hasattr(span, 'get_span_context') else None
+        trace_id = context.trace_id if context else hash(span.name)
+        # Low 64 bits of the trace ID are random per W3C trace context
+        return (trace_id & 0xFFFFFFFFFFFFFFFF) < rate * (1 << 64)
+
+
+class SpanBuffer:
+    """
+    Bounded ring buffer of ended spans with deferred conversion.
+
+    ``append`` is called from ``SpanProcessor.on_end`` on whatever thread ended
+    the span, so it only stores the ``ReadableSpan`` reference together with the
+    turn context at that moment. ``deque.append`` is atomic, so no lock is taken.
+    Conversion to the Whispey span dict happens in ``drain`` when the spans are
+    first read (turn assignment, telemetry structuring or export).
+    """
+
+    def __init__(self, max_spans: int = DEFAULT_SPAN_BUFFER_SIZE, export_processor=None, embed: bool = True,
+                 policy: Optional[CapturePolicy] = None):
+        self.max_spans = max_spans
+        self.policy = policy
+        self.accepted = 0
+        self.sampled_out = 0
+        self.capped = 0
+        # Distinct resource / instrumentation scope dicts when the policy shares them
+        self.resources: List[Dict[str, Any]] = []
+        self.scopes: List[Dict[str, Any]] = []
+        # Optional BatchSpanProcessor also receiving this session's spans
+        self.export_processor = export_processor
+        # False when spans are only exported, never kept for the call-log payload
+        self.embed = embed
+        self._pending = deque(maxlen=max_spans)
+        self._converted: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.turn_id = None
+        self.turn_sequence = 0
+
+    def set_turn(self, turn_id, turn_sequence):
+        """Set the turn context stamped on spans appended from now on"""
+        self.turn_id = turn_id
+        self.turn_sequence = turn_sequence
+
+    def append(self, span):
+        """Queue an ended span for later conversion"""
+        if self.export_processor is not None:
+            self.export_processor.on_end(span)
+        if not self.embed:
+            return
+        if self.policy is not None:
+            if not self.policy.should_sample(span):
+                self.sampled_out += 1
+                return
+            if self.policy.max_spans is not None and self.accepted >= self.policy.max_spans:
+                self.capped += 1
+                return
+        self.accepted += 1
+        if len(self._pending) == self.max_spans:
+            self.dropped += 1
+        self._pending.append((span, self.turn_id, self.turn_sequence, time.time()))
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Convert all pending spans and return every converted span so far"""
+        while True:
+            try:
+                span, turn_id, turn_sequence, captured_at = self._pending.popleft()
+            except IndexError:
+                break
+            try:
+                record = convert_span(span, turn_id, turn_sequence, captured_at)
+                if self.policy is not None:
+                    self._apply_policy(record)
+                self._converted.append(record)
+            except Exception as e:
+                logger.debug(f"Failed to convert span {getattr(span, 'name', None)}: {e}")
+
+        if self.dropped:
+            logger.warning(f"Span buffer full ({self.max_spans}); dropped {self.dropped} oldest spans")
+            self.dropped = 0
+
+        return self._converted
+
+    def _apply_policy(self, record: Dict[str, Any]):
+        """Project attributes and move shared resource/scope out of the span record"""
+        allowlist = self.policy.attribute_allowlist
+        if allowlist is not None:
+            attributes = record['attributes']
+            record['attributes'] = {
+                key: attributes[key] for key in (*allowlist, *ALWAYS_KEPT_ATTRIBUTES) if key in attributes
+            }
+
+        if self.policy.share_resource:
+            record['resource_ref'] = _shared_index(self.resources, record.pop('resource'))
+            record['scope_ref'] = _shared_index(self.scopes, record.pop('instrumentation_scope'))
+
+    def capture_summary(self) -> Dict[str, Any]:
+        """Shared resource/scope tables and drop counters for the telemetry payload"""
+        return {
+            'resources': self.resources,
+            'instrumentation_scopes': self.scopes,
+            'spans_kept': self.accepted,
+            'spans_sampled_out': self.sampled_out,
+            'spans_over_cap': self.capped
+        }
+
+    def clear(self):
+        """Discard pending and converted spans"""
+        self._pending.clear()
+        self._converted = []
+
+    def __len__(self):
+        return len(self._pending) + len(self._converted)
+
+
+def _shared_index(table: List[Dict[str, Any]], value: Dict[str, Any]) -> int:
+    """Index of ``value`` in ``table``, appending it if new (tables stay tiny)"""
+    for index, existing in enumerate(table):
+        if existing == value:
+            return index
+    table.append(value)
+    return len(table) - 1
+
+
+def register_session(session_id: str, buffer: SpanBuffer):
+    """Route spans from the current context to ``buffer`` under ``session_id``"""
+    _session_buffers[session_id] = buffer
+    current_session_id.set(session_id)
+
+
+def release_session(session_id: str) -> Optional[SpanBuffer]:
+    """Stop routing spans to a session and return its buffer"""
+    return _session_buffers.pop(session_id, None)
+
+
+def route_span(span):
+    """Append an ended span to the buffer of the session that started it"""
+    session_id = (span.attributes or {}).get(SESSION_ID_ATTRIBUTE)
+    buffer = _session_buffers.get(session_id) if session_id else None
+
+    if buffer is None and len(_session_buffers) == 1:
+        # Span started outside any session context (e.g. before start_session);
+        # with a single live session there is no ambiguity
+        buffer = next(iter(_session_buffers.values()), None)
+
+    if buffer is not None:
+        buffer.append(span)
+
+
+def install_tracer_provider():
+    """Install the Whispey tracer provider for livekit-agents once per process"""
+    global _tracer_provider
+    with _tracer_provider_lock:
+        if _tracer_provider is not None:
+            return _tracer_provider
+
+        from opentelemetry.sdk.trace import TracerProvider, SpanProcessor
+
+        class WhispeySpanCollector(SpanProcessor):
+            """Custom span processor that only collects spans without exporting them"""
+
+            def on_start(self, span, parent_context=None):
+                session_id = current_session_id.get()
+                if session_id:
+                    span.set_attribute(SESSION_ID_ATTRIBUTE, session_id)
+
+            def on_end(self, span):
+                # Only queue the span here; conversion is deferred to SpanBuffer.drain
+                route_span(span)
+
+            def shutdown(self):
+                pass
+
+            def force_flush(self, timeout_millis=30000):
+                return True
+
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(WhispeySpanCollector())
+
+        from livekit.agents.telemetry import set_tracer_provider
+        set_tracer_provider(tracer_provider)
+
+        _tracer_provider = tracer_provider
+        return tracer_provider
+
+
+def create_otlp_processor(endpoint: str, headers: Optional[Dict[str, str]] = None,
+                          max_queue_size: int = DEFAULT_EXPORT_QUEUE_SIZE):
+    """
+    Create a batch processor exporting spans to an OTLP/HTTP collector.
+
+    Args:
+        endpoint: Collector traces URL, e.g. ``http://localhost:4318/v1/traces``
+        headers: Extra HTTP headers (e.g. auth) sent with each export
+        max_queue_size: Spans queued for export before new ones are dropped
+
+    Returns:
+        BatchSpanProcessor, flushed and shut down at interpreter exit
+    """
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    processor = BatchSpanProcessor(
+        OTLPSpanExporter(endpoint=endpoint, headers=headers),
+        max_queue_size=max_queue_size
+    )
+    atexit.register(processor.shutdown)
+    return processor
+
+
+def convert_span(span, turn_id=None, turn_sequence=0, captured_at=None) -> Dict[str, Any]:
+    """Convert an ended OpenTelemetry span to the Whispey span dict"""
+    request_id, request_id_source, parsed_metrics = extract_request_id(span)
+
+    duration_ns = (span.end_time - span.start_time) if span.start_time and span.end_time else 0
+    duration_ms = duration_ns / 1_000_000
+
+    return {
+        'name': span.name,
+        'start_time_ns': span.start_time,
+        'end_time_ns': span.end_time,
+        'duration_ns': duration_ns,
+        'duration_ms': duration_ms,
+        'duration_seconds': duration_ms / 1000,
+
+        'status': {
+            'code': span.status.status_code.value if span.status else 0,
+            'name': span.status.status_code.name if span.status else 'UNSET',
+            'description': getattr(span.status, 'description', None) if span.status else None
+        },
+
+        'attributes': dict(span.attributes) if span.attributes else {},
+
+        'events': [
+            {
+                'name': event.name,
+                'timestamp': getattr(event, 'timestamp', None),
+                'attributes': dict(event.attributes) if event.attributes else {}
+            }
+            for event in span.events
+        ] if span.events else [],
+
+        'context': {
+            'trace_id': hex(span.get_span_context().trace_id) if hasattr(span, 'get_span_context') else None,
+            'span_id': hex(span.get_span_context().span_id) if hasattr(span, 'get_span_context') else None,
+            'trace_flags': int(span.get_span_context().trace_flags) if hasattr(span, 'get_span_context') and hasattr(span.get_span_context(), 'trace_flags') else None
+        } if hasattr(span, 'get_span_context') else {},
+
+        'parent_span_id': hex(span.parent.span_id) if span.parent and hasattr(span.parent, 'span_id') else None,
+        'resource': dict(span.resource.attributes) if hasattr(span, 'resource') and span.resource and span.resource.attributes else {},
+
+        'links': [
+            {
+                'context': {
+                    'trace_id': hex(link.context.trace_id) if hasattr(link.context, 'trace_id') else None,
+                    'span_id': hex(link.context.span_id) if hasattr(link.context, 'span_id') else None
+                },
+                'attributes': dict(link.attributes) if link.attributes else {}
+            }
+            for link in span.links
+        ] if hasattr(span, 'links') and span.links else [],
+
+        'instrumentation_scope': {
+            'name': span.instrumentation_scope.name if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None,
+            'version': getattr(span.instrumentation_scope, 'version', None) if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None,
+            'schema_url': getattr(span.instrumentation_scope, 'schema_url', None) if hasattr(span, 'instrumentation_scope') and span.instrumentation_scope else None
+        },
+
+        'kind': span.kind.name if hasattr(span, 'kind') and span.kind else 'INTERNAL',
+
+        'exceptions': [
+            {
+                'type': event.attributes.get('exception.type'),
+                'message': event.attributes.get('exception.message'),
+                'stacktrace': event.attributes.get('exception.stacktrace'),
+                'timestamp': getattr(event, 'timestamp', None)
+            }
+            for event in (span.events or [])
+            if event.name == 'exception' and event.attributes
+        ],
+
+        'request_id': request_id,
+        'request_id_source': request_id_source,
+        'parsed_metrics': parsed_metrics,
+        'captured_at': captured_at if captured_at is not None else time.time(),
+        'sdk_version': SDK_VERSION,
+        'conversation_turn_id': turn_id,
+        'turn_sequence': turn_sequence,
+    }
+
+
+def extract_request_id(span) -> Tuple[Optional[str], str, Dict[str, Any]]:
+    """
+    Find the provider request_id for a span in a single pass.
+
+    Each ``lk.*_metrics`` attribute is JSON-parsed at most once, and the parsed
+    dicts are returned so they can be cached on the span record.
+
+    Returns:
+        (request_id, source, parsed_metrics) where source is one of
+        'direct_attribute', 'nested_json', 'event_attribute', 'synthetic' or 'none',
+        and parsed_metrics maps 'llm'/'tts'/'stt' to the decoded metrics dict
+    """
+    span_attrs = span.attributes or {}
+    request_id = None
+    source = 'none'
+
+    # Method 1: Direct request_id attributes
+    for key in DIRECT_REQUEST_ID_KEYS:
+        if span_attrs.get(key):
+            request_id, source = str(span_attrs[key]), 'direct_attribute'
+            break
+
+    # Method 2: Nested JSON metrics; always parsed so the result can be cached
+    parsed_metrics = {}
+    for key in METRICS_JSON_KEYS:
+        if key not in span_attrs:
+            continue
+        try:
+            metrics_data = json.loads(str(span_attrs[key]))
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(metrics_data, dict):
+            continue
+        parsed_metrics[METRICS_JSON_KEYS[key]] = metrics_data
+        if request_id is None and metrics_data.get('request_id'):
+            request_id, source = str(metrics_data['request_id']), 'nested_json'
+
+    # Method 3: Extract from events
+    if request_id is None:
+        for event in span.events or []:
+            event_attrs = event.attributes or {}
+            key = next((key for key in DIRECT_REQUEST_ID_KEYS if event_attrs.get(key)), None)
+            if key:
+                request_id, source = str(event_attrs[key]), 'event_attribute'
+                break
+
+    # Method 4: Generate deterministic ID from span characteristics
+    if request_id is None and span.start_time:
+        context = span.get_span_context() if hasattr(span, 'get_span_context') else None
+        span_id = hex(context.span_id) if context else str(span.start_time)
+        content = f"{span.name or 'unknown'}_{span.start_time}_{span_id}"
+        request_id, source = hashlib.md5(content.encode()).hexdigest()[:16], 'synthetic'
+
+    return request_id, source, parsed_metrics
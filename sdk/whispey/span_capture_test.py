@@ -0,0 +1,26 @@
+from whispey.span_capture import CapturePolicy, SpanBuffer
+
+
+def test_default_policy_keeps_tool_call_attributes():
+    buffer = SpanBuffer(policy=CapturePolicy(share_resource=False))
+    record = {'attributes': {
+        'lk.function_tool.name': 'lookup_order',
+        'lk.function_tool.arguments': '{"order_id": 7}',
+        'lk.function_tool.output': 'shipped',
+        'lk.function_tool.is_error': False,
+        'request_id': 'req-1',
+        'lk.chat_ctx': '[...]',
+    }}
+    buffer._apply_policy(record)
+    assert record['attributes'] == {
+        'request_id': 'req-1',
+        'lk.function_tool.name': 'lookup_order',
+        'lk.function_tool.arguments': '{"order_id": 7}',
+        'lk.function_tool.output': 'shipped',
+        'lk.function_tool.is_error': False,
+    }
+    print("test_default_policy_keeps_tool_call_attributes passed")
+
+
+if __name__ == "__main__":
+    test_default_policy_keeps_tool_call_attributes()
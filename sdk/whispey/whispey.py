@@ -4,9 +4,12 @@ import uuid
 import logging
 from datetime import datetime
 from typing import Dict, Any
-from whispey.event_handlers import setup_session_event_handlers, safe_extract_transcript_data
+from whispey.event_handlers import setup_session_event_handlers, safe_extract_transcript_data, intern_configuration
 from whispey.metrics_service import setup_usage_collector, create_session_data
 from whispey.send_log import send_to_whispey, send_to_whispey_sync
+from whispey.payload_budget import apply_payload_budget
+from whispey.span_capture import KEY_ATTRIBUTES
+from whispey.critical_path import analyze_critical_paths
 
 logger = logging.getLogger("observe_session")
 
@@ -215,7 +218,7 @@ def _run_healthbench_evaluation(transcript_data: list, eval_config: Dict[str, An
         }
 
 
-def observe_session(session, agent_id, host_url, room=None, bug_detector=None, enable_otel=False, otel_endpoint=None, telemetry_instance=None, **kwargs):  # CHANGE 1: room=None (optional)
+def observe_session(session, agent_id, host_url, room=None, bug_detector=None, enable_otel=False, otel_endpoint=None, telemetry_instance=None, payload_budget_bytes=None, payload_mode='full', **kwargs):  # CHANGE 1: room=None (optional)
     session_id = str(uuid.uuid4())
     
     try:        
@@ -253,11 +256,18 @@ def observe_session(session, agent_id, host_url, room=None, bug_detector=None, e
             'room_billing_enabled': room is not None,
             'apikey': apikey,
             'api_url': api_url,
+            'payload_budget_bytes': payload_budget_bytes,
+            'payload_mode': payload_mode,
         }
         
         # Setup telemetry if enabled
         if enable_otel and telemetry_instance:
-            telemetry_instance._setup_telemetry(session_id)
+            telemetry_instance._setup_telemetry(session_id, otel_endpoint=otel_endpoint)
+            if otel_endpoint:
+                _session_data_store[session_id]['otel_export'] = {
+                    'endpoint': otel_endpoint,
+                    'embedded': not getattr(telemetry_instance, 'otel_export_only', False)
+                }
         
         # Setup event handlers with session only if session is provided
         if session is not None:
@@ -569,10 +579,10 @@ def generate_whispey_data(session_id: str, status: str = "in_progress", error: s
         enhanced_transcript = []
         for turn in transcript_data:
             # Verify configuration exists
-            if not turn.get('turn_configuration'):
+            if not turn.get('config_ref') and not turn.get('turn_configuration'):
                 logger.warning(f"Turn {turn.get('turn_id', 'unknown')} missing configuration!")
-                # Try to inject from session level as fallback
-                turn['turn_configuration'] = session_data.get('complete_configuration')
+                # Fall back to the session-level configuration, by reference
+                turn['config_ref'] = intern_configuration(session_data, session_data.get('complete_configuration'))
             
             # Add trace fields to each turn if they exist
             tool_calls = turn.get('tool_calls', [])
@@ -591,6 +601,13 @@ def generate_whispey_data(session_id: str, status: str = "in_progress", error: s
         
         whispey_data["transcript_with_metrics"] = enhanced_transcript
         
+        # Configurations referenced by turns via config_ref, stored once per content hash
+        whispey_data["configurations"] = session_data.get('configurations', {})
+        
+        # Delta-encoded prompt captures referenced by turns via prompt_data.capture_index
+        if session_data.get('prompt_context'):
+            whispey_data["prompt_context"] = session_data['prompt_context']
+        
         # Add bill duration to metadata
         whispey_data["billing_duration_seconds"] = bill_duration_seconds
         
@@ -609,6 +626,11 @@ def generate_whispey_data(session_id: str, status: str = "in_progress", error: s
                 whispey_data["transcript_json"] = transcript_json_items
                 logger.info(f"✅ transcript_json populated from transcript_with_metrics: {len(transcript_json_items)} messages")
 
+        # Running cost totals, accumulated as metrics arrived
+        cost_accumulator = session_data.get('cost_accumulator')
+        if cost_accumulator:
+            whispey_data["metadata"]["cost"] = cost_accumulator.summary()
+
         # Add bug report data if available
         if 'bug_reports' in session_data:
             whispey_data["metadata"]["bug_reports"] = session_data['bug_reports']
@@ -715,6 +737,11 @@ def generate_whispey_data(session_id: str, status: str = "in_progress", error: s
                 "error": "No transcript data available for evaluation"
             }
     
+    # Keep the payload within the session's byte budget, if one is configured
+    budget_bytes = session_info.get('payload_budget_bytes')
+    if budget_bytes:
+        apply_payload_budget(whispey_data, budget_bytes)
+    
     return whispey_data
 
 def get_session_whispey_data(session_id: str) -> Dict[str, Any]:
@@ -732,6 +759,14 @@ def get_session_whispey_data(session_id: str) -> Dict[str, Any]:
     # Generate fresh data
     return generate_whispey_data(session_id)
 
+def get_session_cost(session_id: str) -> Dict[str, Any]:
+    """Cost and usage accumulated so far in a live session"""
+    if session_id not in _session_data_store:
+        return {}
+    session_data = _session_data_store[session_id].get('session_data') or {}
+    cost_accumulator = session_data.get('cost_accumulator')
+    return cost_accumulator.summary() if cost_accumulator else {}
+
 def end_session_manually(session_id: str, status: str = "completed", error: str = None):
     """Manually end a session"""
     if session_id not in _session_data_store:
@@ -757,6 +792,9 @@ def end_session_manually(session_id: str, status: str = "completed", error: str
 def cleanup_session(session_id: str):
     """Clean up session data"""
     if session_id in _session_data_store:
+        telemetry_instance = _session_data_store[session_id].get('telemetry_instance')
+        if telemetry_instance and hasattr(telemetry_instance, '_release_session'):
+            telemetry_instance._release_session(session_id)
         del _session_data_store[session_id]
         logger.info(f"🗑️ Cleaned up session {session_id}")
 
@@ -826,16 +864,7 @@ def extract_key_attributes(span) -> dict:
         
         # Extract key attributes that are useful for analysis
         key_attrs = {}
-        important_keys = [
-            'session_id', 'lk.user_transcript', 'lk.response.text', 
-            'gen_ai.request.model', 'lk.speech_id', 'lk.interrupted',
-            'gen_ai.usage.input_tokens', 'gen_ai.usage.output_tokens',
-            'lk.tts.streaming', 'lk.input_text', 'model_name',
-            'prompt_tokens', 'completion_tokens', 'characters_count',
-            'audio_duration', 'request_id', 'error'
-        ]
-        
-        for key in important_keys:
+        for key in KEY_ATTRIBUTES:
             if key in attributes:
                 key_attrs[key] = attributes[key]
         
@@ -873,33 +902,43 @@ def extract_trace_id(span) -> str:
         return None
 
 def build_critical_path(spans) -> list:
-    """Build the critical path of main conversation flow"""
+    """Flattened critical path of every turn, from the span parent/child tree"""
     try:
-        if not spans:
-            return []
-        
-        critical_spans = []
-        
-        # Sort spans by start time
-        sorted_spans = sorted(spans, key=lambda x: x.get('start_time', 0))
-        
-        # Focus on main conversation flow operations
-        for span in sorted_spans:
-            operation_type = span.get('operation_type', 'other')
-            if operation_type in ['user_interaction', 'assistant_interaction', 'llm', 'tts', 'stt', 'tool']:
-                critical_spans.append({
-                    "name": span.get('name', 'unknown'),
-                    "operation_type": operation_type,
-                    "duration_ms": span.get('duration_ms', 0),
-                    "start_time": span.get('start_time', 0)
-                })
-        
-        return critical_spans
+        return [step for turn in analyze_critical_paths(spans) for step in turn['critical_path']]
     except Exception as e:
         logger.error(f"Error building critical path: {e}")
         return []
 
 
+def reconstruct_prompt_data(prompt_context: Dict[str, Any], capture_index: int) -> Dict[str, Any]:
+    """Rebuild the full prompt (instructions, history, tools) sent on one LLM call"""
+    captures = prompt_context.get('captures', [])
+    if capture_index is None or not 0 <= capture_index < len(captures):
+        return {}
+
+    capture = captures[capture_index]
+
+    # Walk back to the nearest capture holding a full ID list, then replay the appends
+    appended = []
+    base = capture
+    while 'message_ids' not in base and base.get('base_capture') is not None:
+        appended.append(base.get('appended_message_ids', []))
+        base = captures[base['base_capture']]
+    message_ids = list(base.get('message_ids', []))
+    for ids in reversed(appended):
+        message_ids.extend(ids)
+
+    messages = prompt_context.get('messages', {})
+    return {
+        'system_instructions': prompt_context.get('instructions', {}).get(capture.get('instructions_ref')),
+        'conversation_history': [messages[mid] for mid in message_ids if mid in messages],
+        'available_tools': prompt_context.get('tools', {}).get(capture.get('tools_ref')) or [],
+        'timestamp': capture.get('timestamp'),
+        'context_length': capture.get('context_length'),
+        'tools_count': capture.get('tools_count')
+    }
+
+
 def structure_telemetry_data(session_id: str) -> Dict[str, Any]:
     """Structure telemetry spans data for better analysis - PRESERVE ALL ORIGINAL DATA"""
     try:
@@ -924,11 +963,26 @@ def structure_telemetry_data(session_id: str) -> Dict[str, Any]:
             
         session_info = _session_data_store[session_id]
         telemetry_instance = session_info.get('telemetry_instance')
+
+        # Percentiles come from histograms updated as metrics arrived, not from spans
+        latency_stats = (session_info.get('session_data') or {}).get('latency_stats')
+        latency_percentiles = latency_stats.summary() if latency_stats else {}
+        telemetry_data["performance_metrics"]["latency_percentiles"] = latency_percentiles
+
+        if session_info.get('otel_export'):
+            # Tells the backend where the spans went when they are not embedded
+            telemetry_data["otel_export"] = session_info['otel_export']
         
-        if not telemetry_instance or not hasattr(telemetry_instance, 'spans_data'):
+        if not telemetry_instance or not hasattr(telemetry_instance, 'get_session_spans'):
             return telemetry_data
             
-        spans = telemetry_instance.spans_data
+        spans = telemetry_instance.get_session_spans(session_id)
+
+        capture_summary = telemetry_instance.get_session_capture_summary(session_id)
+        if capture_summary:
+            # Spans reference these by resource_ref / scope_ref
+            telemetry_data["capture"] = capture_summary
+
         if not spans:
             return telemetry_data
                     
@@ -944,6 +998,8 @@ def structure_telemetry_data(session_id: str) -> Dict[str, Any]:
                 
                 # Keep the entire original span, just add our categorization
                 enhanced_span = dict(span)  # Copy all original data
+                # Parsed lk.*_metrics duplicate the raw attributes; keep them in-process only
+                enhanced_span.pop('parsed_metrics', None)
                 enhanced_span['operation_type'] = operation_type
                 enhanced_span['source'] = 'otel_capture'
                 
@@ -970,14 +1026,17 @@ def structure_telemetry_data(session_id: str) -> Dict[str, Any]:
             "avg_stt_latency": sum(latency_sums["stt"]) / len(latency_sums["stt"]) if latency_sums["stt"] else 0,
             "total_tool_calls": operation_counts.get("tool", 0),
             "total_user_interactions": operation_counts.get("user_interaction", 0),
-            "total_assistant_interactions": operation_counts.get("assistant_interaction", 0)
+            "total_assistant_interactions": operation_counts.get("assistant_interaction", 0),
+            "latency_percentiles": latency_percentiles
         }
         
-        # Build critical path (fix the sorting issue)
+        # Critical path per turn over the span parent/child tree
         try:
-            sorted_spans = [s for s in telemetry_data["session_traces"] if s.get('start_time_ns')]
-            sorted_spans.sort(key=lambda x: x.get('start_time_ns', 0))
-            telemetry_data["span_summary"]["critical_path"] = build_critical_path(sorted_spans)
+            turn_latency = analyze_critical_paths(telemetry_data["session_traces"])
+            telemetry_data["span_summary"]["turn_latency"] = turn_latency
+            telemetry_data["span_summary"]["critical_path"] = [
+                step for turn in turn_latency for step in turn['critical_path']
+            ]
         except Exception as e:
             logger.error(f"Error building critical path: {e}")
             telemetry_data["span_summary"]["critical_path"] = []
@@ -996,6 +1055,53 @@ def structure_telemetry_data(session_id: str) -> Dict[str, Any]:
 
 
 
+def normalize_payload(whispey_data: Dict[str, Any], drop_transcript_json: bool = True) -> Dict[str, Any]:
+    """
+    Remove duplicated data from a payload that already carries telemetry_data.
+
+    Spans captured by OTel are kept once in telemetry_data.session_traces; turns
+    reference them with ``span_ref`` (the span_id) plus their turn-specific
+    request_id and cost metadata. transcript_json is dropped when it was derived
+    from transcript_with_metrics. Everything removed is listed under
+    ``payload_format`` so the backend can rebuild it.
+    """
+    telemetry_data = whispey_data.get('telemetry_data') or {}
+    table_ids = {
+        (span.get('context') or {}).get('span_id')
+        for span in telemetry_data.get('session_traces', [])
+    }
+    table_ids.discard(None)
+
+    span_refs = 0
+    for turn in whispey_data.get('transcript_with_metrics', []):
+        turn_spans = []
+        for span in turn.get('otel_spans') or []:
+            if span.get('span_id') in table_ids:
+                turn_spans.append({
+                    'span_ref': span['span_id'],
+                    'request_id': span.get('request_id'),
+                    'metadata': span.get('metadata', {})
+                })
+                span_refs += 1
+            else:
+                # Spans synthesized by the SDK (e.g. tool calls) have no table entry
+                turn_spans.append(span)
+        turn['otel_spans'] = turn_spans
+
+    derived_views = {}
+    if drop_transcript_json and whispey_data.get('transcript_json'):
+        whispey_data['transcript_json'] = []
+        derived_views['transcript_json'] = 'transcript_with_metrics'
+
+    whispey_data['payload_format'] = {
+        'mode': 'normalized',
+        'span_table': 'telemetry_data.session_traces',
+        'span_refs': span_refs,
+        'derived_views': derived_views
+    }
+    return whispey_data
+
+
 async def send_session_to_whispey(session_id: str, recording_url: str = "", additional_transcript: list = None, force_end: bool = True, apikey: str = None, api_url: str = None, **extra_data) -> dict:
     """
     Send session data to Whispey API
@@ -1030,16 +1136,13 @@ async def send_session_to_whispey(session_id: str, recording_url: str = "", addi
     # Get whispey data
     whispey_data = get_session_whispey_data(session_id)
 
-    # REPLACE the simple telemetry_spans assignment with structured data
-    structured_telemetry = structure_telemetry_data(session_id)
-    whispey_data["telemetry_data"] = structured_telemetry
-
-
-    
-    
     if not whispey_data:
         logger.error(f"No whispey data generated for session {session_id}")
         return {"success": False, "error": "No data available"}
+
+    # REPLACE the simple telemetry_spans assignment with structured data
+    structured_telemetry = structure_telemetry_data(session_id)
+    whispey_data["telemetry_data"] = structured_telemetry
     
     # Update with additional data
     if recording_url:
@@ -1047,6 +1150,14 @@ async def send_session_to_whispey(session_id: str, recording_url: str = "", addi
     
     if additional_transcript:
         whispey_data["transcript_json"] = additional_transcript
+
+    if session_info.get('payload_mode') == 'normalized':
+        normalize_payload(whispey_data, drop_transcript_json=not additional_transcript)
+
+    # Telemetry is attached after the build step, so re-check the budget
+    budget_bytes = session_info.get('payload_budget_bytes')
+    if budget_bytes:
+        apply_payload_budget(whispey_data, budget_bytes)
     
     
     try:
@@ -22,6 +22,32 @@ function decompressData(compressedData: string): any {
   }
 }
 
+// Rebuild a turn's full prompt from the SDK's delta-encoded prompt_context
+function resolvePromptData(promptContext: any, promptData: any): any {
+  if (!promptContext || typeof promptData?.capture_index !== 'number') return promptData;
+  const captures = promptContext.captures || [];
+  const capture = captures[promptData.capture_index];
+  if (!capture) return promptData;
+
+  const appended: string[][] = [];
+  let base = capture;
+  while (base && base.message_ids === undefined && typeof base.base_capture === 'number') {
+    appended.unshift(base.appended_message_ids || []);
+    base = captures[base.base_capture];
+  }
+  const messageIds: string[] = [...(base?.message_ids || []), ...appended.flat()];
+  const messages = promptContext.messages || {};
+
+  return {
+    system_instructions: promptContext.instructions?.[capture.instructions_ref] ?? null,
+    conversation_history: messageIds.map((id) => messages[id]).filter(Boolean),
+    available_tools: promptContext.tools?.[capture.tools_ref] || [],
+    timestamp: capture.timestamp,
+    context_length: capture.context_length,
+    tools_count: capture.tools_count
+  };
+}
+
 // Handle CORS preflight requests
 export async function OPTIONS(request: NextRequest) {
   return new NextResponse(null, {
@@ -101,20 +127,31 @@ export async function POST(request: NextRequest) {
       agent_id,
       call_ended_reason,
       transcript_type,
-      transcript_json,
+      transcript_json: bodyTranscriptJson,
       metadata,
       dynamic_variables,
       call_started_at,
       call_ended_at,
       duration_seconds,
       transcript_with_metrics,
+      configurations,
+      prompt_context,
       recording_url,
       voice_recording_url,
       telemetry_data,
       environment = 'dev',
-      wcall_event: bodyWcallEvent
+      wcall_event: bodyWcallEvent,
+      payload_format
     } = body;
 
+    // Normalized SDK payloads omit transcript_json; rebuild it from the turns
+    const transcript_json = (payload_format?.derived_views?.transcript_json && Array.isArray(transcript_with_metrics))
+      ? transcript_with_metrics.flatMap((turn: any) => [
+          ...(turn.user_transcript?.trim() ? [{ role: 'user', content: turn.user_transcript.trim() }] : []),
+          ...(turn.agent_response?.trim() ? [{ role: 'assistant', content: turn.agent_response.trim() }] : [])
+        ])
+      : bodyTranscriptJson;
+
     const wcall_event = (bodyWcallEvent === 'call_started' || bodyWcallEvent === 'call_ended')
       ? bodyWcallEvent
       : 'call_ended';
@@ -441,7 +478,7 @@ export async function POST(request: NextRequest) {
           'turn_id', 'user_transcript', 'agent_response',
           'stt_metrics', 'llm_metrics', 'tts_metrics', 'eou_metrics',
           'trace_id', 'otel_spans', 'tool_calls', 'trace_duration_ms',
-          'trace_cost_usd', 'timestamp', 'turn_configuration', 'bug_report'
+          'trace_cost_usd', 'timestamp', 'turn_configuration', 'config_ref', 'bug_report'
         ]);
 
         const enhancedData: Record<string, unknown> = {};
@@ -452,6 +489,10 @@ export async function POST(request: NextRequest) {
           }
         });
 
+        if (enhancedData.prompt_data) {
+          enhancedData.prompt_data = resolvePromptData(prompt_context, enhancedData.prompt_data);
+        }
+
         const hasEnhancedData = Object.keys(enhancedData).length > 0;
 
         return {
@@ -473,7 +514,8 @@ export async function POST(request: NextRequest) {
           lesson_completed: (metadata as any)?.lesson_completed || false,
           created_at: new Date().toISOString(),
           unix_timestamp: (turn as any).timestamp as any,
-          turn_configuration: (turn as any).turn_configuration || null,
+          // Newer SDKs send configs once in `configurations` and reference them per turn
+          turn_configuration: (turn as any).turn_configuration || (configurations as any)?.[(turn as any).config_ref] || null,
           bug_report: (turn as any).bug_report || false,
           bug_details: (turn as any).bug_details || null,
           enhanced_data: hasEnhancedData ? enhancedData : null,
@@ -74,6 +74,13 @@ export interface TelemetryPerformanceMetrics {
 export interface TelemetrySpanSummary {
   by_operation?: Record<string, number>;
   critical_path?: Array<{ duration_ms?: number; name?: string; operation_type?: string }>;
+  turn_latency?: Array<{
+    turn_span_id?: string | null;
+    conversation_turn_id?: string | null;
+    latency_ms?: number;
+    breakdown_ms?: Record<string, number>;
+    critical_path?: Array<{ duration_ms?: number; name?: string; operation_type?: string }>;
+  }>;
   [key: string]: any;
 }
 